@@ -66,13 +66,45 @@ document.addEventListener("DOMContentLoaded", () => {
       const v = (a?.value || b?.value || "").trim();
       return v;
     };
-    const a1 = getVal("anime_1", "anime_id_1");
-    const a2 = getVal("anime_2", "anime_id_2");
+    // Si el texto es una sugerencia del autocompletar, mandamos directamente su id
+    const a1 = suggestedIds.get(getVal("anime_1", "anime_id_1")) || getVal("anime_1", "anime_id_1");
+    const a2 = suggestedIds.get(getVal("anime_2", "anime_id_2")) || getVal("anime_2", "anime_id_2");
     const r1 = parseFloat(form.querySelector('[name="rating_1"]')?.value || "");
     const r2 = parseFloat(form.querySelector('[name="rating_2"]')?.value || "");
     return { a1, a2, r1, r2 };
   }
 
+  // --- Autocompletar nombres (/search-anime) ---
+  const datalist = document.getElementById("animeSuggestions");
+  const suggestedIds = new Map(); // nombre sugerido -> id
+  let searchTimer = null;
+
+  async function suggestAnimes(text) {
+    const q = text.trim();
+    if (!datalist || q.length < 2 || /^\d+$/.test(q)) return; // ids: nada que sugerir
+    try {
+      const r = await fetch(`${API_BASE}/search-anime?q=${encodeURIComponent(q)}&limit=8`);
+      if (!r.ok) return;
+      const matches = await r.json().catch(() => []);
+      datalist.innerHTML = "";
+      matches.forEach(m => {
+        suggestedIds.set(m.name, String(m.id));
+        const opt = document.createElement("option");
+        opt.value = m.name;
+        datalist.appendChild(opt);
+      });
+    } catch (err) {
+      console.error(err);
+    }
+  }
+
+  form.querySelectorAll('input[list="animeSuggestions"]').forEach(inp => {
+    inp.addEventListener("input", () => {
+      clearTimeout(searchTimer);
+      searchTimer = setTimeout(() => suggestAnimes(inp.value), 150);
+    });
+  });
+
   function renderConflicts(conflicts) {
     // conflicts: { "textoOriginal": [{id,name}, ...], ... }
     const ul = ensureSuggestionsList();
@@ -191,7 +223,7 @@ document.addEventListener("DOMContentLoaded", () => {
           body: JSON.stringify({ username: user.username, password: pwd })
         });
         const data = await r.json().catch(() => ({}));
-        if (r.ok) setNotice(data.message || "Modelo reentrenado correctamente.", "success");
+        if (r.status === 202 && data.job_id) followRetrain(data.job_id);
         else setNotice(data.error || "No autorizado o error al reentrenar.", "error");
       } catch (err) {
         console.error(err);
@@ -199,4 +231,31 @@ document.addEventListener("DOMContentLoaded", () => {
       }
     });
   }
+
+  // Consulta el estado del reentrenamiento (corre en segundo plano en la API)
+  function followRetrain(jobId) {
+    const timer = setInterval(async () => {
+      try {
+        const r = await fetch(`${API_BASE}/retrain/${jobId}`);
+        const job = await r.json().catch(() => ({}));
+        if (!r.ok) {
+          clearInterval(timer);
+          setNotice(job.error || "No se pudo consultar el reentrenamiento.", "error");
+        } else if (job.status === "done") {
+          clearInterval(timer);
+          setNotice(`Modelo reentrenado correctamente (versión ${job.model_version}).`, "success");
+        } else if (job.status !== "running") {
+          clearInterval(timer);
+          setNotice(`El reentrenamiento ha fallado: ${job.error || job.status}`, "error");
+        } else {
+          const pct = Math.round((job.progress || 0) * 100);
+          setNotice(`Reentrenando modelo... ${job.stage || ""} (${pct}%)`, "info");
+        }
+      } catch (err) {
+        clearInterval(timer);
+        console.error(err);
+        setNotice("No se pudo conectar con la API.", "error");
+      }
+    }, 2000);
+  }
 });
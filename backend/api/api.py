@@ -1,14 +1,23 @@
 import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))  # módulos de api/ (retrain_jobs, ...)
 
-from flask import Flask, jsonify, request, render_template
+from flask import Flask, Response, g, jsonify, request, render_template, stream_with_context
 from flask_cors import CORS
+import json
+import logging
+import threading
+import time
 
-from dao.conexion_bd import Conexion
+from dao.conexion_bd import check_db_config, close_pool, reset_pool
 from dao.dao import AnimatchDAO
-from model.model import get_recommendations, load_model, train_model
-
-import csv
+from model.paths import ANIME_CSV, MODELS_DIR
+from monitoring import REGISTRY, setup_logging
+from name_index import NameIndex
+from rec_cache import cache_from_env
+from retrain_jobs import RetrainJobs
+from scoring_pool import ScoringBusy, pool_from_env
+from user_cache import UserRecCache, ratings_hash
 
 # (no tocar: están ajustadas para cargar el Frontend desde Flask)
 BACKEND_DIR   = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -20,88 +29,252 @@ STATIC        = os.path.join(PROJECT_ROOT, "Frontend")
 app = Flask(__name__, template_folder=TEMPLATES, static_folder=STATIC, static_url_path="/")
 CORS(app)
 
-DATA_DIR  = os.path.join(BACKEND_DIR, "data")
-ANIME_CSV = os.path.join(DATA_DIR, "anime.csv")
+# Logs estructurados (ANIMATCH_LOG_LEVEL, ANIMATCH_LOG_FORMAT=text|json)
+setup_logging()
+log = logging.getLogger("animatch.api")
+
+# Métricas de la API (el resto las registran model.py y el DAO); se exportan en /metrics
+HTTP_SECONDS = REGISTRY.histogram("animatch_http_request_seconds",
+                                  "Duración de las peticiones (sin el envío de las respuestas en streaming)",
+                                  ["endpoint", "method", "status"])
+NAME_RESOLVE_SECONDS = REGISTRY.histogram("animatch_name_resolve_seconds",
+                                          "Tiempo de convertir un nombre de anime en id", ["result"])
+
+
+@app.before_request
+def start_timer():
+    g.t0 = time.perf_counter()
+
+
+@app.after_request
+def record_request(resp):
+    if "t0" in g:
+        # endpoint = nombre de la función de Flask (no la URL, para no crear una serie por anime_id)
+        HTTP_SECONDS.observe(time.perf_counter() - g.t0, endpoint=request.endpoint or "not_found",
+                             method=request.method, status=resp.status_code)
+    return resp
 
-NAME_INDEX = None         # dict, ej: {"naruto": 20}
-NAME_LOOKUP_ROWS = None   # lista de dicts, ej: [{"id": 20, "name": "Naruto"}, ...]
+NAME_INDEX = None   # NameIndex (exacto, trigramas y erratas), se carga al primer uso (o en el warm-up)
+_NAME_INDEX_LOCK = threading.Lock()
 
 def load_name_index():
     """
     Gestionamos nombres a id
     """
-    global NAME_INDEX, NAME_LOOKUP_ROWS
-    if NAME_INDEX is not None:
-        return  # ya estaba cargado
+    global NAME_INDEX
+    if NAME_INDEX is None:
+        with _NAME_INDEX_LOCK:
+            if NAME_INDEX is None:
+                NAME_INDEX = NameIndex.from_csv(ANIME_CSV)
+    return NAME_INDEX
 
-    idx = {}
-    rows = []
 
-    try:
-        with open(ANIME_CSV, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                # anime_id -> int
-                try:
-                    aid = int(row.get("anime_id"))
-                except Exception:
-                    continue
-
-                # nombre normalizado
-                name = (row.get("name") or "").strip()
-                if not name:
-                    continue
-
-                idx[name.lower()] = aid
-                rows.append({"id": aid, "name": name})
-    except FileNotFoundError:
-        # En el caso que no haya CSV, seguimos acceptando ids
-        idx, rows = {}, []
+def resolve_name_to_id(name: str):
+    """
+    Primero busa exacto, despues por contiene y por ultimo con erratas.
+    Intentamos convertir el nombre a id: (id, []) o (None, candidatos).
+    """
+    index = load_name_index()
+    t0 = time.perf_counter()
+    anime_id, candidates = index.resolve(name)
+    result = "found" if anime_id is not None else ("candidates" if candidates else "missing")
+    NAME_RESOLVE_SECONDS.observe(time.perf_counter() - t0, result=result)
+    return anime_id, candidates
 
-    NAME_INDEX = idx
-    NAME_LOOKUP_ROWS = rows
 
+def model_api():
+    """
+    El módulo model.model, importado la primera vez que hace falta: con él llegan
+    pandas, NumPy y SciPy, que /health, /login o /register no necesitan.
+    """
+    from model import model
+    return model
 
-def resolve_name_to_id(name: str):
+
+# El modelo lo guarda MODEL_STORE (compartido con model.py): se carga una sola vez
+def get_model_cached():
+    """Devuelve el modelo cargado (LoadedModel) desde MODEL_STORE."""
+    return model_api().MODEL_STORE.get()
+
+
+
+# Recomendaciones cacheadas por usuario (valoraciones guardadas en la BD)
+USER_RECS = UserRecCache()
+
+# Recomendaciones cacheadas por perfil (LRU + TTL; None si ANIMATCH_REC_CACHE=off)
+REC_CACHE = cache_from_env(MODELS_DIR)
+
+# Hilos para puntuar (CPU), aparte de los que atienden peticiones (ver scoring_pool.py)
+SCORING = pool_from_env()
+
+MAX_RECOMMENDATIONS = 100  # limit/top_n máximo de /obtener-recomendaciones, el lote y /user-recommendations
+BATCH_CHUNK = 256          # perfiles del lote que se puntúan en cada tarea de SCORING
+
+
+def score(perfil, top_n, model, **options):
+    """get_recommendations como lista de dicts, calculada en SCORING (ScoringBusy si no hay hueco).
+    options: offset y filtros de get_recommendations (exclude_genres, types, min_members)."""
+    get_recommendations = model_api().get_recommendations
+    return SCORING.run(lambda: get_recommendations(perfil, top_n=top_n, model=model, **options)
+                       .to_dict(orient="records"))
+
+
+def cached_recommendations(perfil, top_n=10, **options):
+    """get_recommendations como lista de dicts, reutilizando el resultado si el
+    mismo perfil (con la misma página y filtros) ya se pidió con la versión
+    actual del modelo."""
+    model = get_model_cached()
+    compute = lambda: score(perfil, top_n, model, **options)
+    if REC_CACHE is None:
+        return compute()
+    return REC_CACHE.get_or_compute(perfil, top_n, model.version, compute, options)
+
+
+def recommend_options(args):
     """
-    Primero busa exacto y despues por contiene. Intentamos convertir el nombre a id.
+    Paginación y filtros de /obtener-recomendaciones a partir de la query string:
+    limit (10, máximo MAX_RECOMMENDATIONS), offset (0), exclude_genres y type
+    (listas separadas por comas) y min_members.
+    Devuelve (top_n, options) con options listo para get_recommendations
+    (solo lo que viene en la petición, en forma canónica para la caché).
+    ValueError con el mensaje para el 400 si algún valor no es válido.
     """
-    load_name_index()  # miramos que el inidice esta cargado
-    if not NAME_INDEX:
-        return None, []  # no hay índice, osea no hay CSV: seguir por ID
+    def integer(name, default):
+        try:
+            value = int(args.get(name, default))
+        except ValueError:
+            raise ValueError(f"{name} debe ser un entero")
+        if value < 0:
+            raise ValueError(f"{name} no puede ser negativo")
+        return value
+
+    top_n = integer("limit", 10)
+    if not 1 <= top_n <= MAX_RECOMMENDATIONS:
+        raise ValueError(f"limit debe estar entre 1 y {MAX_RECOMMENDATIONS}")
+    options = {}
+    offset = integer("offset", 0)
+    if offset:
+        options["offset"] = offset
+    for param, key in (("exclude_genres", "exclude_genres"), ("type", "types")):
+        values = sorted({v.strip() for v in args.get(param, "").split(",") if v.strip()})
+        if values:
+            options[key] = tuple(values)
+    min_members = integer("min_members", 0)
+    if min_members:
+        options["min_members"] = min_members
+    return top_n, options
+
+
+def reload_model():
+    """Recarga el modelo y descarta las recomendaciones cacheadas con el anterior."""
+    model = model_api().MODEL_STORE.reload()
+    USER_RECS.clear()
+    if REC_CACHE is not None:
+        REC_CACHE.clear()
+    return model
+
+
+def cache_metrics():
+    """Estado de las cachés en el momento de exportar /metrics"""
+    metrics = [("animatch_user_rec_cache_users", "gauge", "Usuarios con recomendaciones cacheadas",
+                [({}, len(USER_RECS))])]
+    if REC_CACHE is not None:
+        stats = REC_CACHE.stats()
+        labels = {"backend": stats["backend"]}
+        metrics += [
+            ("animatch_rec_cache_hits_total", "counter", "Aciertos de la caché de recomendaciones",
+             [(labels, stats["hits"])]),
+            ("animatch_rec_cache_misses_total", "counter", "Fallos de la caché de recomendaciones",
+             [(labels, stats["misses"])]),
+            ("animatch_rec_cache_evictions_total", "counter", "Entradas expulsadas (LRU o TTL)",
+             [(labels, stats["evictions"])]),
+            ("animatch_rec_cache_entries", "gauge", "Entradas en la caché de recomendaciones",
+             [(labels, stats["size"])]),
+        ]
+    if NAME_INDEX is not None:
+        metrics.append(("animatch_name_index_names", "gauge", "Nombres en el índice de búsqueda",
+                        [({}, len(NAME_INDEX))]))
+    return metrics
 
-    q = (name or "").strip().lower()
-    if not q:
-        return None, []
 
-    # 1) miramos si es exacta
-    if q in NAME_INDEX:
-        return NAME_INDEX[q], []
+REGISTRY.add_collector(cache_metrics)
 
-    # 2) miramos si contiene
-    cands = [row for row in NAME_LOOKUP_ROWS if q in row["name"].lower()]
-    if len(cands) == 1:
-        return cands[0]["id"], []
-    if len(cands) > 1:
-        # primeor por nombre cortos despues alfabetico
-        cands.sort(key=lambda r: (len(r["name"]), r["name"].lower()))
-        return None, cands[:10]
 
-    # 3) En caso de no resuktados
-    return None, []
+# Reentrenamientos en segundo plano: al terminar se recarga MODEL_STORE
+RETRAIN_JOBS = RetrainJobs(os.path.join(MODELS_DIR, "jobs"), lambda **kw: model_api().train_model(**kw),
+                           on_done=reload_model)
 
 
-# Asi evitamos cargar el modelo cada vez, re rellena al primer uso
-MODEL_CACHE = None
+# CICLO DE VIDA (servidor de producción: ver wsgi.py y gunicorn.conf.py)
 
-def get_model_cached():
-    """Devuelve la matriz de correlaciones desde caché (o la carga si está vacía)."""
-    global MODEL_CACHE
-    if MODEL_CACHE is None:
-        MODEL_CACHE = load_model()
-    return MODEL_CACHE
+# Warm-up al arrancar (ANIMATCH_WARMUP):
+#   background → se sirve enseguida y el modelo se carga en un hilo (/health/ready da 503 mientras)
+#   sync       → se carga antes de servir (con gunicorn, en el maestro antes del fork)
+#   off        → como antes: se carga con la primera petición que lo necesita
+WARMUP_MODE = os.environ.get("ANIMATCH_WARMUP", "background")
+# status: off (nadie la ha lanzado: carga perezosa) | running | done | error
+WARMUP = {"status": "off", "seconds": None, "model_version": None, "error": None}
+
+
+def preload():
+    """
+    Carga el modelo (índice de vecinos y nombres) y el índice de nombres antes
+    de atender peticiones. Con gunicorn --preload se hace una vez en el proceso
+    maestro y los workers lo comparten copy-on-write tras el fork.
+    Si aún no hay modelo entrenado, la API arranca igual (como hasta ahora).
+    El resultado queda en WARMUP (lo usa /health/ready).
+    """
+    WARMUP.update(status="running", error=None)
+    t0 = time.perf_counter()
+    try:
+        try:
+            model = get_model_cached()
+            WARMUP["model_version"] = model.version
+            log.info("Modelo precargado", extra={"version": model.version, "items": len(model.item_ids)})
+        except FileNotFoundError as e:
+            log.warning("Sin modelo que precargar", extra={"error": str(e)})
+        load_name_index()
+    except Exception as e:
+        WARMUP.update(status="error", error=str(e))
+        log.exception("Fallo en la precarga")
+        return
+    WARMUP.update(status="done", seconds=round(time.perf_counter() - t0, 3))
+    log.info("Precarga completa", extra={"seconds": WARMUP["seconds"]})
+
+
+def start_warmup(mode=None):
+    """Lanza la precarga según ANIMATCH_WARMUP (o mode): en un hilo, en línea o nada."""
+    mode = mode or WARMUP_MODE
+    if mode == "off":
+        WARMUP["status"] = "off"
+    elif mode == "sync":
+        preload()
+    else:
+        WARMUP["status"] = "running"
+        threading.Thread(target=preload, name="warmup", daemon=True).start()
+
+
+def on_worker_start():
+    """
+    Después del fork: el worker no puede usar las conexiones MySQL ni los hilos
+    del proceso maestro, así que abre su propio pool y su propio SCORING.
+    """
+    reset_pool()
+    SCORING.reset()
+    if WARMUP["status"] == "off":
+        start_warmup()  # no se precargó en el maestro (ANIMATCH_WARMUP=background)
+    log.info("Worker listo", extra={"pid": os.getpid()})
 
 
+def on_worker_exit():
+    """Cierre ordenado: acaba las puntuaciones en marcha y devuelve las conexiones."""
+    SCORING.shutdown(wait=True)
+    close_pool()
+    running = RETRAIN_JOBS.running_job()
+    if running is not None and running.get("pid") == os.getpid():
+        log.warning("Se corta un reentrenamiento en curso", extra={"job_id": running["job_id"]})
+    log.info("Worker terminado", extra={"pid": os.getpid()})
+
 
 # Home: servimos la página de login/registro
 @app.route("/")
@@ -111,11 +284,23 @@ def index():
 
 
 @app.get("/health")
+@app.get("/health/live")
 def health():
-    """Endpoint simple para comprobar si la API está viva."""
+    """Liveness: la API está viva (no mira el modelo, responde desde el primer momento)."""
     return jsonify({"status": "ok"}), 200
 
 
+@app.get("/health/ready")
+def ready():
+    """
+    Readiness: 200 cuando la precarga (modelo e índice de nombres) ha terminado,
+    503 mientras se está haciendo o si ha fallado. Sin precarga
+    (ANIMATCH_WARMUP=off) siempre 200: se carga con la primera petición.
+    """
+    is_ready = WARMUP["status"] in ("done", "off")
+    return jsonify({"ready": is_ready, **WARMUP}), (200 if is_ready else 503)
+
+
 # AUTH
 
 @app.post("/register")
@@ -140,15 +325,7 @@ def register():
         return jsonify({"error": "la password debe tener al menos 8 caracteres"}), 400
 
     # Insert en BD
-    conn = Conexion()
-    try:
-        ok = AnimatchDAO.add_user(username, password, conn, role="user")
-    finally:
-        # Cerrar conexión alwayyys
-        try:
-            conn.GetConn().close()
-        except:
-            pass
+    ok = AnimatchDAO.add_user(username, password, role="user")  # conexión prestada del pool
 
     if ok:
         return jsonify({"message": "usuario creado", "username": username, "role": "user"}), 201
@@ -169,14 +346,7 @@ def login():
         return jsonify({"error": "username y password son obligatorios"}), 400
 
     # buscamos le usuario
-    conn = Conexion()
-    try:
-        user = AnimatchDAO.get_user_by_username(username, conn)
-    finally:
-        try:
-            conn.GetConn().close()
-        except:
-            pass
+    user = AnimatchDAO.get_user_by_username(username)
 
     # Ccomporvamos
     if not user or user.get("password") != password:
@@ -187,18 +357,18 @@ def login():
 
 # RECOMENDACIONES
 
-@app.post("/obtener-recomendaciones")
-def obtener_recomendaciones():
+def busy_response(error):
+    """503 cuando SCORING está saturado: el cliente puede reintentar en un momento"""
+    resp = jsonify({"error": f"Servidor ocupado, inténtalo de nuevo ({error})"})
+    resp.headers["Retry-After"] = "1"
+    return resp, 503
+
+
+def parse_profile(data):
     """
-    Genera recomendaciones a partir de un JSON {anime: rating}.
-    - 'anime' puede ser id o nombre.
-    - 'rating' debe ser número del 1 al 10.
-    - Si hay ambigüedad en nombres, devuelve 409 con 'conflicts' para que el front elija.
+    Convierte un JSON {anime: rating} en un perfil {anime_id: rating}.
+    Devuelve (perfil, conflicts, error); error es None o (mensaje, código HTTP).
     """
-    data = request.get_json(silent=True)
-    if not data or not isinstance(data, dict):
-        return jsonify({"error": "Envía un JSON {anime_id|anime_name: rating}"}), 400
-
     perfil = {}      # {anime_id: rating}
     conflicts = {}   # {"texto_original": [{id,name}, ...]}
 
@@ -207,7 +377,7 @@ def obtener_recomendaciones():
         try:
             r = float(rating)
         except (TypeError, ValueError):
-            return jsonify({"error": f"Rating inválido para '{key}'"}), 400
+            return None, None, (f"Rating inválido para '{key}'", 400)
 
         # 2) Tratamos a key como id
         try:
@@ -224,7 +394,32 @@ def obtener_recomendaciones():
         elif cands:
             conflicts[str(key)] = cands  # ambigüedad: devolver lista al front
         else:
-            return jsonify({"error": f"No se encontró ningún anime que coincida con '{key}'"}), 404
+            return None, None, (f"No se encontró ningún anime que coincida con '{key}'", 404)
+
+    return perfil, conflicts, None
+
+@app.post("/obtener-recomendaciones")
+def obtener_recomendaciones():
+    """
+    Genera recomendaciones a partir de un JSON {anime: rating}.
+    - 'anime' puede ser id o nombre.
+    - 'rating' debe ser número del 1 al 10.
+    - Si hay ambigüedad en nombres, devuelve 409 con 'conflicts' para que el front elija.
+    - Query params opcionales (ver recommend_options): limit y offset para paginar,
+      exclude_genres=Horror,Ecchi, type=TV,Movie y min_members=1000 para filtrar.
+      Los filtros se aplican antes de elegir las mejores, así que cada página sale llena.
+    """
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data, dict):
+        return jsonify({"error": "Envía un JSON {anime_id|anime_name: rating}"}), 400
+    try:
+        top_n, options = recommend_options(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    perfil, conflicts, error = parse_profile(data)
+    if error:
+        return jsonify({"error": error[0]}), error[1]
 
     # Si hay nombres ambiguos, devolvemos 409 con candidatos
     if conflicts:
@@ -233,17 +428,268 @@ def obtener_recomendaciones():
     if not perfil:
         return jsonify({"error": "No se proporcionaron pares (anime, rating) válidos"}), 400
 
-    # 4) Llamar al modelo (sin tocar tu get_recommendations)
+    # 4) Llamar al modelo (sin tocar tu get_recommendations), pasando por la caché
     try:
-        recom = get_recommendations(perfil, top_n=10)
-        return jsonify(recom.to_dict(orient="records")), 200
+        return jsonify(cached_recommendations(perfil, top_n=top_n, **options)), 200
     except FileNotFoundError:
         # Modelo no entrenado aún
         return jsonify({"error": "El modelo no está entrenado. Ejecuta train_model() antes."}), 500
+    except ScoringBusy as e:
+        return busy_response(e)
+    except ValueError as e:
+        # Género o tipo desconocido, o modelo sin los datos de anime.csv para filtrar
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": f"Error: {e}"}), 500
 
 
+@app.post("/obtener-recomendaciones-batch")
+def obtener_recomendaciones_batch():
+    """
+    Recomendaciones para muchos perfiles en una sola petición.
+    Espera JSON: {"profiles": {"p1": {anime: rating}, ...} o [{anime: rating}, ...],
+                  "top_n": 10}
+    Responde en streaming (NDJSON): una línea por perfil y en el mismo orden,
+      {"profile": "p1", "recommendations": [{anime_id, name, score}, ...]}
+    o {"profile": "p1", "error": "...", "conflicts": {...}} si ese perfil no es válido
+    (los demás se calculan igualmente).
+    Se puntúa en SCORING por tramos de BATCH_CHUNK perfiles: si no hay hueco para
+    el primero, 503; si falta para uno posterior, sus perfiles llevan "error".
+    """
+    data = request.get_json(silent=True) or {}
+    profiles = data.get("profiles")
+    if isinstance(profiles, list):
+        profiles = dict(enumerate(profiles))
+    if not isinstance(profiles, dict) or not profiles:
+        return jsonify({"error": "Envía 'profiles': {id: {anime_id|anime_name: rating}, ...}"}), 400
+    try:
+        top_n = int(data.get("top_n", 10))
+    except (TypeError, ValueError):
+        return jsonify({"error": "top_n debe ser un entero"}), 400
+    if not 1 <= top_n <= MAX_RECOMMENDATIONS:
+        return jsonify({"error": f"top_n debe estar entre 1 y {MAX_RECOMMENDATIONS}"}), 400
+
+    # Primero validamos todos los perfiles; los errores van en su línea
+    perfiles, errores = [], {}
+    for pid, raw in profiles.items():
+        if not isinstance(raw, dict):
+            errores[pid] = {"error": "El perfil debe ser un JSON {anime: rating}"}
+            continue
+        perfil, conflicts, error = parse_profile(raw)
+        if error:
+            errores[pid] = {"error": error[0]}
+        elif conflicts:
+            errores[pid] = {"error": "Múltiples coincidencias de nombre.", "conflicts": conflicts}
+        elif not perfil:
+            errores[pid] = {"error": "No se proporcionaron pares (anime, rating) válidos"}
+        else:
+            perfiles.append(perfil)
+
+    try:
+        model = get_model_cached()  # misma versión para todo el lote
+    except FileNotFoundError:
+        return jsonify({"error": "El modelo no está entrenado. Ejecuta train_model() antes."}), 500
+
+    iter_batch = model_api().iter_recommendations_batch
+
+    def puntuar(inicio):
+        """Recomendaciones del tramo de `perfiles` que empieza en inicio (ScoringBusy si no hay hueco)."""
+        tramo = perfiles[inicio:inicio + BATCH_CHUNK]
+        return SCORING.run(lambda: list(iter_batch(tramo, top_n=top_n, model=model)))
+
+    try:
+        primero = puntuar(0)
+    except ScoringBusy as e:
+        return busy_response(e)
+
+    def generar():
+        # Las recomendaciones salen en el orden de `perfiles`: se van enviando según se calculan
+        recs, hechos, ocupado = iter(primero), len(primero), None
+        for pid in profiles:
+            if pid in errores:
+                line = {"profile": pid, **errores[pid]}
+            else:
+                rec = next(recs, None)
+                if rec is None and ocupado is None:
+                    try:
+                        tramo = puntuar(hechos)
+                    except ScoringBusy as e:
+                        ocupado = f"Servidor ocupado, inténtalo de nuevo ({e})"
+                    else:
+                        recs, hechos = iter(tramo), hechos + len(tramo)
+                        rec = next(recs)
+                line = {"profile": pid, "error": ocupado} if rec is None else \
+                    {"profile": pid, "recommendations": rec}
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+
+    return Response(stream_with_context(generar()), mimetype="application/x-ndjson")
+
+
+# VALORACIONES GUARDADAS DEL USUARIO
+
+def check_user(data):
+    """Usuario (dict) si username/password del JSON son correctos, si no None."""
+    username = (data.get("username") or "").strip()
+    password = (data.get("password") or "").strip()
+    if not username or not password:
+        return None
+    user = AnimatchDAO.get_user_by_username(username)
+    if not user or user.get("password") != password:
+        return None
+    return user
+
+
+@app.post("/user-ratings")
+def save_user_ratings():
+    """
+    Añade o actualiza valoraciones del usuario en la BD.
+    Espera JSON: {"username": "...", "password": "...", "ratings": {anime: rating}}
+    - 'anime' puede ser id o nombre (como en /obtener-recomendaciones).
+    - 'rating' del 1 al 10.
+    Devuelve todas sus valoraciones guardadas.
+    """
+    data = request.get_json(silent=True) or {}
+    user = check_user(data)
+    if user is None:
+        return jsonify({"error": "credenciales invalidas"}), 401
+
+    raw = data.get("ratings")
+    if not isinstance(raw, dict) or not raw:
+        return jsonify({"error": "Envía 'ratings': {anime_id|anime_name: rating}"}), 400
+    perfil, conflicts, error = parse_profile(raw)
+    if error:
+        return jsonify({"error": error[0]}), error[1]
+    if conflicts:
+        return jsonify({"error": "Múltiples coincidencias de nombre.", "conflicts": conflicts}), 409
+    if not all(1 <= r <= 10 for r in perfil.values()):
+        return jsonify({"error": "Las notas deben estar entre 1 y 10"}), 400
+
+    if not AnimatchDAO.upsert_ratings(user["id"], perfil):
+        return jsonify({"error": "No se pudieron guardar las valoraciones"}), 500
+    USER_RECS.invalidate(user["id"])
+
+    ratings = AnimatchDAO.get_ratings(user["id"]) or {}
+    return jsonify({"message": "valoraciones guardadas", "saved": len(perfil),
+                    "ratings": {str(aid): r for aid, r in ratings.items()}}), 200
+
+
+@app.post("/user-recommendations")
+def user_recommendations():
+    """
+    Recomendaciones a partir de las valoraciones guardadas del usuario.
+    Espera JSON: {"username": "...", "password": "...", "top_n": 10}
+    Si el usuario no ha cambiado sus notas y el modelo es el mismo, se devuelven
+    las recomendaciones ya calculadas (campo "cached": true).
+    """
+    data = request.get_json(silent=True) or {}
+    user = check_user(data)
+    if user is None:
+        return jsonify({"error": "credenciales invalidas"}), 401
+    try:
+        top_n = int(data.get("top_n", 10))
+    except (TypeError, ValueError):
+        return jsonify({"error": "top_n debe ser un entero"}), 400
+    if not 1 <= top_n <= MAX_RECOMMENDATIONS:
+        return jsonify({"error": f"top_n debe estar entre 1 y {MAX_RECOMMENDATIONS}"}), 400
+
+    ratings = AnimatchDAO.get_ratings(user["id"])
+    if ratings is None:
+        return jsonify({"error": "No se pudieron leer las valoraciones"}), 500
+    if not ratings:
+        return jsonify({"error": "Todavía no has guardado valoraciones"}), 404
+
+    try:
+        model = get_model_cached()
+    except FileNotFoundError:
+        return jsonify({"error": "El modelo no está entrenado. Ejecuta train_model() antes."}), 500
+
+    rhash = ratings_hash(ratings)
+    recs = USER_RECS.get(user["id"], model.version, rhash, top_n)
+    cached = recs is not None
+    if not cached:
+        try:
+            recs = score(ratings, top_n, model)
+        except ScoringBusy as e:
+            return busy_response(e)
+        except Exception as e:
+            return jsonify({"error": f"Error: {e}"}), 500
+        USER_RECS.put(user["id"], model.version, rhash, top_n, recs)
+
+    return jsonify({"model_version": model.version, "cached": cached, "recommendations": recs}), 200
+
+
+# AUTOCOMPLETAR
+
+SEARCH_MAX_AGE = 3600  # segundos que el navegador puede reutilizar una búsqueda
+
+@app.get("/search-anime")
+def search_anime():
+    """
+    Autocompletar nombres: /search-anime?q=nar&limit=10
+    Devuelve [{id, name, members}, ...] con los animes que tienen alguna palabra
+    que empieza por q, los más populares primero.
+    La respuesta solo depende de q, limit y anime.csv: se puede cachear (ETag + max-age).
+    """
+    q = request.args.get("q", "")
+    try:
+        limit = min(int(request.args.get("limit", 10)), 50)
+    except ValueError:
+        return jsonify({"error": "limit debe ser un entero"}), 400
+
+    resp = jsonify(load_name_index().search_prefix(q, limit))
+    resp.cache_control.public = True
+    resp.cache_control.max_age = SEARCH_MAX_AGE
+    resp.add_etag()
+    return resp.make_conditional(request)
+
+
+@app.get("/metrics")
+def metrics():
+    """
+    Métricas de este proceso en el formato de texto de Prometheus: latencias
+    (HTTP, recomendaciones, nombres, BD, entrenamiento), tamaño y tiempo de
+    carga del modelo y estado de las cachés.
+    """
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.get("/cache-stats")
+def cache_stats():
+    """Aciertos, fallos y expulsiones de la caché de recomendaciones (de este proceso)."""
+    if REC_CACHE is None:
+        return jsonify({"enabled": False}), 200
+    return jsonify({"enabled": True, **REC_CACHE.stats()}), 200
+
+
+# ANIMES SIMILARES ("más como este")
+
+@app.get("/similar/<int:anime_id>")
+def similar(anime_id):
+    """
+    Los k animes más parecidos a anime_id (índice de similares del modelo).
+    Query params: k (10, de 1 a 100; más de 100 se queda en 100), exact=1 para
+    comparar con todo el catálogo.
+    """
+    try:
+        k = min(int(request.args.get("k", 10)), 100)
+    except ValueError:
+        return jsonify({"error": "k debe ser un entero"}), 400
+    if k < 1:
+        return jsonify({"error": "k debe ser mayor que 0"}), 400
+    exact = request.args.get("exact") in ("1", "true")
+    try:
+        model = get_model_cached()
+        items = model_api().similar_items(anime_id, k=k, model=model, exact=exact)
+    except FileNotFoundError:
+        return jsonify({"error": "El modelo no está entrenado. Ejecuta train_model() antes."}), 500
+    except KeyError:
+        return jsonify({"error": f"El anime {anime_id} no está en el modelo"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify({"anime_id": anime_id, "name": model.names.get(anime_id), "model_version": model.version,
+                    "similar": items.to_dict(orient="records")}), 200
+
+
 # UTILIDAD: comprobar existencia de anime en el modelo
 
 @app.get("/exists-anime/<int:anime_id>")
@@ -252,9 +698,8 @@ def exists_anime(anime_id):
     Devuelve si un anime_id está presente en la matriz de correlación (modelo).
     """
     try:
-        corr = get_model_cached()  # usa caché
-        cols = corr.columns.tolist()
-        exists = int(anime_id) in set(map(int, cols))
+        model = get_model_cached()  # usa caché
+        exists = model.has_item(int(anime_id))
         return jsonify({"anime_id": anime_id, "exists": bool(exists)}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -265,38 +710,91 @@ def exists_anime(anime_id):
 @app.post("/retrain")
 def retrain():
     """
-    Reentrena el modelo (solo admin).
+    Lanza un reentrenamiento del modelo en segundo plano (solo admin).
     Espera JSON: {"username": "...", "password": "..."}
     - Verifica que el usuario tenga role="admin" y password correcta.
-    - Llama a train_model() y recarga la caché con load_model().
+    - Devuelve 202 con el job_id al momento; el progreso se consulta en /retrain/<job_id>.
+    - El modelo nuevo se guarda como una versión nueva y se activa al terminar;
+      mientras tanto las peticiones siguen usando el modelo anterior.
     """
     data = request.get_json(silent=True) or {}
     username = (data.get("username") or "").strip()
     password = (data.get("password") or "").strip()
 
     # 1) Verificar credenciales de admin (usando mi DAO)
-    conn = Conexion()
-    try:
-        user = AnimatchDAO.get_user_by_username(username, conn)
-    finally:
-        try:
-            conn.GetConn().close()
-        except:
-            pass
+    user = AnimatchDAO.get_user_by_username(username)
+
+    if not user or user.get("role") != "admin" or user.get("password") != password:
+        return jsonify({"error": "No autorizado"}), 403
+
+    # 2) Lanzar el reentrenamiento (si no hay otro en curso)
+    job = RETRAIN_JOBS.start(username)
+    if job is None:
+        running = RETRAIN_JOBS.running_job() or {}
+        return jsonify({"error": "Ya hay un reentrenamiento o una actualización en curso",
+                        "job_id": running.get("job_id")}), 409
+    return jsonify({"message": "Reentrenamiento iniciado", "job_id": job["job_id"], "status": job["status"]}), 202
+
+
+@app.get("/retrain/<job_id>")
+def retrain_status(job_id):
+    """
+    Estado de un reentrenamiento: status (running/done/error/interrupted),
+    etapa actual, progreso (0..1), tiempos por etapa y error si lo hay.
+    """
+    job = RETRAIN_JOBS.get(job_id)
+    if job is None:
+        return jsonify({"error": "No existe ese reentrenamiento"}), 404
+    job.pop("pid", None)
+    return jsonify(job), 200
+
+
+@app.post("/ratings-delta")
+def ratings_delta():
+    """
+    Aplica valoraciones nuevas al modelo sin reentrenarlo entero (solo admin).
+    Espera JSON: {"username": "...", "password": "...",
+                  "ratings": [{"user_id": 1, "anime_id": 20, "rating": 8}, ...]}
+    - El modelo tiene que estar entrenado con estadísticas (python model/model.py --stats).
+    - Solo se recalculan los pares de animes afectados; se guarda como versión nueva.
+    """
+    data = request.get_json(silent=True) or {}
+    username = (data.get("username") or "").strip()
+    password = (data.get("password") or "").strip()
+    rows = data.get("ratings")
+
+    user = AnimatchDAO.get_user_by_username(username)
 
     if not user or user.get("role") != "admin" or user.get("password") != password:
         return jsonify({"error": "No autorizado"}), 403
 
-    # 2) Reentrenar y recargar el modelo
+    if not isinstance(rows, list) or not rows:
+        return jsonify({"error": "Envía 'ratings': [{user_id, anime_id, rating}, ...]"}), 400
     try:
-        train_model()               # recalcula y guarda model_v1.0.pkl
-        global MODEL_CACHE
-        MODEL_CACHE = load_model()  # refresca caché en memoria
-        return jsonify({"message": "Modelo reentrenado correctamente"}), 200
-    except Exception as e:
-        return jsonify({"error": f"Fallo al reentrenar: {e}"}), 500
+        import pandas as pd
+        delta = pd.DataFrame(rows, columns=["user_id", "anime_id", "rating"]).astype("int64")
+    except (TypeError, ValueError):
+        return jsonify({"error": "Cada valoración necesita user_id, anime_id y rating enteros"}), 400
+
+    # El lock de los reentrenamientos (entre procesos) durante toda la actualización:
+    # dos update_model a la vez, o uno y un reentrenamiento, se pisarían las estadísticas
+    with RETRAIN_JOBS.exclusive("ratings-delta") as acquired:
+        if not acquired:
+            return jsonify({"error": "Ya hay un reentrenamiento o una actualización en curso"}), 409
+        try:
+            summary = model_api().update_model(delta)
+            reload_model()
+            return jsonify({"message": "Modelo actualizado", **summary}), 200
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 409
+        except Exception as e:
+            return jsonify({"error": f"Fallo al actualizar: {e}"}), 500
 
 
-# ARRANQUE
+# ARRANQUE (servidor de desarrollo; en producción: gunicorn -c api/gunicorn.conf.py)
 if __name__ == "__main__":
+    check_db_config()  # sin usuario y contraseña de la BD no se arranca
+    # Con debug el reloader ejecuta este fichero en dos procesos: solo precarga el que sirve
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_warmup()
     app.run(debug=True)
@@ -0,0 +1,63 @@
+"""
+Configuración de gunicorn para servir la API en producción:
+    cd backend && gunicorn -c api/gunicorn.conf.py
+
+- Varios procesos (workers) con varios hilos cada uno (gthread): una petición que
+  espera a MySQL solo ocupa su hilo, las demás siguen atendiéndose.
+- preload_app: el modelo se carga una vez en el maestro antes del fork y los
+  workers comparten esa memoria copy-on-write (la matriz densa es un memmap,
+  que además comparte la page cache del sistema).
+- Los hooks preparan cada worker (pool de MySQL y hilos propios) y lo cierran
+  de forma ordenada (graceful_timeout para acabar las peticiones en marcha).
+- Cada worker puntúa en su propio pool de hilos (scoring_pool.py). Para no
+  tener workers x núcleos hilos compitiendo por la CPU, el pool se dimensiona
+  por worker: max(1, núcleos // workers). Por eso aquí se deja el número de
+  workers en ANIMATCH_WORKERS antes de cargar la app (ANIMATCH_SCORING_THREADS
+  lo fija a mano).
+
+Variables: ANIMATCH_BIND (0.0.0.0:5000), ANIMATCH_WORKERS (núcleos),
+ANIMATCH_THREADS (8), ANIMATCH_TIMEOUT (60), ANIMATCH_ACCESS_LOG (sin log de accesos).
+"""
+import gc
+import logging
+import multiprocessing
+import os
+
+wsgi_app = "wsgi:app"
+chdir = os.path.dirname(os.path.abspath(__file__))
+
+bind = os.environ.get("ANIMATCH_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("ANIMATCH_WORKERS", "0")) or multiprocessing.cpu_count()
+os.environ["ANIMATCH_WORKERS"] = str(workers)  # lo lee scoring_pool.pool_from_env
+worker_class = "gthread"
+threads = int(os.environ.get("ANIMATCH_THREADS", "8"))
+preload_app = True
+timeout = int(os.environ.get("ANIMATCH_TIMEOUT", "60"))
+graceful_timeout = 30
+keepalive = 5
+accesslog = os.environ.get("ANIMATCH_ACCESS_LOG")
+
+log = logging.getLogger("animatch.server")
+
+
+def when_ready(server):
+    # La app ya está precargada y aún no hay workers: congelamos los objetos
+    # actuales para que el recolector de basura no los toque (y no copie sus
+    # páginas) en cada worker
+    gc.freeze()
+    log.info("Servidor listo", extra={"bind": ",".join(server.cfg.bind), "workers": server.cfg.workers,
+                                      "threads": server.cfg.threads})
+
+
+def post_fork(server, worker):
+    from api import on_worker_start
+    on_worker_start()
+
+
+def worker_exit(server, worker):
+    from api import on_worker_exit
+    on_worker_exit()
+
+
+def on_exit(server):
+    log.info("Servidor parado")
@@ -0,0 +1,228 @@
+import bisect
+import csv
+import heapq
+
+
+NGRAM = 3                   # tamaño de los n-gramas del índice
+MAX_RESULTS = 10            # candidatos que se devuelven como máximo
+MAX_TYPO_CANDIDATES = 200   # nombres como máximo a los que se calcula la distancia de edición
+SHORT_PREFIX = 3            # prefijos hasta esta longitud tienen el resultado precalculado
+
+
+class NameIndex:
+    """
+    Índice de nombres de anime para resolver nombres a ids sin recorrer la lista.
+    - exacto: dict nombre en minúsculas -> id
+    - contiene: trigramas -> posiciones de los nombres que los contienen
+      (se intersectan las listas y se comprueba el substring solo en esas).
+      También se indexan los trozos de 1 y 2 letras para las consultas cortas.
+    - con erratas: los mismos trigramas sirven de filtro y luego se calcula la
+      distancia de edición contra los pocos nombres que quedan
+    - autocompletar: array ordenado con el nombre desde el inicio de cada
+      palabra; un prefijo es un rango contiguo (bisect) y se ordena por
+      popularidad (members)
+    Los nombres en minúsculas se calculan una sola vez al construirlo.
+    """
+
+    def __init__(self, rows, members=None):
+        # rows: lista de dicts {"id": ..., "name": ...}; members: popularidad de cada fila
+        self.rows = rows
+        self.lower = [row["name"].lower() for row in rows]
+        self.members = list(members) if members is not None else [0] * len(rows)
+        self.exact = {}
+        self.postings = {}
+        for pos, name in enumerate(self.lower):
+            self.exact[name] = rows[pos]["id"]  # si se repite, gana el último (como antes)
+            for gram in _all_grams(name):
+                self.postings.setdefault(gram, []).append(pos)
+
+        # "shingeki no kyojin" se encuentra por "shin", "no k" y "kyo"
+        suffixes = [_word_suffixes(name) for name in self.lower]
+        entries = sorted((key, pos) for pos, keys in enumerate(suffixes) for key in keys)
+        self.prefix_keys = [key for key, _ in entries]
+        self.prefix_pos = [pos for _, pos in entries]
+
+        # Posición de cada fila en el orden de popularidad (empates: como en resolve)
+        by_popularity = sorted(range(len(rows)), key=lambda pos: (-self.members[pos],) + self._order(pos))
+        self.rank = [0] * len(rows)
+        for rank, pos in enumerate(by_popularity):
+            self.rank[pos] = rank
+
+        # Los prefijos muy cortos abarcan medio catálogo: los dejamos resueltos
+        self.short_prefixes = {}
+        for pos in by_popularity:
+            prefixes = {key[:n] for key in suffixes[pos] for n in range(1, min(SHORT_PREFIX, len(key)) + 1)}
+            for prefix in prefixes:
+                best = self.short_prefixes.setdefault(prefix, [])
+                if len(best) < MAX_RESULTS:
+                    best.append(pos)
+
+    @classmethod
+    def from_csv(cls, path):
+        """Lee anime.csv (anime_id, name, members). Si no existe, índice vacío."""
+        rows, members = [], []
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    try:
+                        aid = int(row.get("anime_id"))
+                    except Exception:
+                        continue
+                    name = (row.get("name") or "").strip()
+                    if not name:
+                        continue
+                    try:
+                        popularity = int(row.get("members") or 0)
+                    except ValueError:
+                        popularity = 0
+                    rows.append({"id": aid, "name": name})
+                    members.append(popularity)
+        except FileNotFoundError:
+            pass  # sin CSV seguimos aceptando ids
+        return cls(rows, members)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def containing(self, q):
+        """Posiciones de los nombres que contienen q (q ya en minúsculas)."""
+        grams = set(_ngrams(q))
+        if not grams:
+            # Consulta más corta que un trigrama: su lista ya es el resultado
+            return list(self.postings.get(q, ()))
+
+        lists = [self.postings.get(gram) for gram in grams]
+        if not all(lists):
+            return []
+        lists.sort(key=len)
+        cands = set(lists[0])
+        for lst in lists[1:]:
+            cands.intersection_update(lst)
+            if not cands:
+                return []
+        # Tener todos los trigramas no garantiza que estén seguidos: comprobamos
+        return [pos for pos in sorted(cands) if q in self.lower[pos]]
+
+    def similar(self, q):
+        """
+        Nombres que contienen q con alguna errata: [(distancia, posición), ...].
+        Se admite 1 error desde 6 caracteres y 2 desde 10 (más cortos darían ruido).
+        """
+        max_dist = _max_typos(len(q))
+        grams = set(_ngrams(q))
+        if max_dist == 0:
+            return []
+        # Cada error (o intercambio) rompe como mucho NGRAM + 1 trigramas de q: el
+        # resto tienen que aparecer. Como filtro pedimos siempre al menos uno.
+        min_shared = max(1, len(grams) - (NGRAM + 1) * max_dist)
+
+        shared = {}
+        for gram in grams:
+            for pos in self.postings.get(gram, ()):
+                shared[pos] = shared.get(pos, 0) + 1
+
+        # Solo los que más trigramas comparten (la distancia de edición es lo caro)
+        cands = [pos for pos, count in shared.items() if count >= min_shared]
+        if len(cands) > MAX_TYPO_CANDIDATES:
+            cands = heapq.nlargest(MAX_TYPO_CANDIDATES, cands, key=shared.get)
+
+        found = []
+        for pos in cands:
+            dist = _substring_distance(q, self.lower[pos], max_dist)
+            if dist <= max_dist:
+                found.append((dist, pos))
+        return found
+
+    def resolve(self, name):
+        """
+        Primero exacto, después por contiene y por último tolerando erratas.
+        Devuelve (id, []) si hay un único resultado o (None, candidatos):
+        candidatos [{id, name}, ...] ordenados por nombre más corto y después
+        alfabético (con erratas, primero los más parecidos). Con erratas nunca se
+        elige solo: siempre se devuelven candidatos para que el usuario confirme.
+        """
+        q = (name or "").strip().lower()
+        if not q or not self.rows:
+            return None, []
+
+        # 1) miramos si es exacta
+        if q in self.exact:
+            return self.exact[q], []
+
+        # 2) miramos si contiene
+        cands = self.containing(q)
+        if len(cands) == 1:
+            return self.rows[cands[0]]["id"], []
+        if cands:
+            best = heapq.nsmallest(MAX_RESULTS, cands, key=self._order)
+            return None, [self.rows[pos] for pos in best]
+
+        # 3) con erratas
+        best = heapq.nsmallest(MAX_RESULTS, self.similar(q),
+                               key=lambda item: (item[0],) + self._order(item[1]))
+        return None, [self.rows[pos] for _, pos in best]
+
+    def search_prefix(self, prefix, limit=MAX_RESULTS):
+        """
+        Autocompletar: animes con alguna palabra (o el nombre) que empieza por
+        prefix, los más populares primero. [{id, name, members}, ...]
+        """
+        q = (prefix or "").strip().lower()
+        if not q or limit < 1:
+            return []
+        if len(q) <= SHORT_PREFIX and limit <= MAX_RESULTS:
+            best = self.short_prefixes.get(q, [])[:limit]
+        else:
+            lo = bisect.bisect_left(self.prefix_keys, q)
+            hi = bisect.bisect_left(self.prefix_keys, q + "\uffff")
+            best = self._most_popular(set(self.prefix_pos[lo:hi]), limit)
+        return [{**self.rows[pos], "members": self.members[pos]} for pos in best]
+
+    def _most_popular(self, positions, limit):
+        return heapq.nsmallest(limit, positions, key=self.rank.__getitem__)
+
+    def _order(self, pos):
+        return len(self.rows[pos]["name"]), self.lower[pos]
+
+
+def _ngrams(text):
+    return [text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)]
+
+
+def _all_grams(text):
+    """Trozos distintos de 1 a NGRAM letras"""
+    return {text[i:i + n] for n in range(1, NGRAM + 1) for i in range(len(text) - n + 1)}
+
+
+def _word_suffixes(name):
+    """El nombre desde el principio y desde el inicio de cada palabra"""
+    starts = [0] + [i + 1 for i, ch in enumerate(name) if ch == " " and i + 1 < len(name)]
+    return {name[i:] for i in starts if name[i] != " "}
+
+
+def _max_typos(length):
+    if length >= 10:
+        return 2
+    if length >= 6:
+        return 1
+    return 0
+
+
+def _substring_distance(q, text, max_dist):
+    """
+    Mínima distancia de edición (contando el intercambio de dos letras
+    seguidas como un solo error) entre q y cualquier trozo de text: la primera
+    fila a cero permite empezar en cualquier posición.
+    Para en cuanto ninguna columna puede quedar por debajo de max_dist.
+    """
+    before, prev = None, [0] * (len(text) + 1)
+    for i, qc in enumerate(q, start=1):
+        cur = [i] + [0] * len(text)
+        for j, tc in enumerate(text, start=1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (qc != tc))
+            if before is not None and j > 1 and qc == text[j - 2] and q[i - 2] == tc:
+                cur[j] = min(cur[j], before[j - 2] + 1)
+        if min(cur) > max_dist:
+            return max_dist + 1
+        before, prev = prev, cur
+    return min(prev)
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from user_cache import canonical_profile
+
+
+def profile_key(profile, top_n, version, options=None):
+    """
+    Clave de caché de una petición: perfil canónico (canonical_profile), top_n,
+    versión del modelo y opciones (offset y filtros, ver recommend_options).
+    {20: 9, 1: 7} y {1: 7.0, 20: 9.0} dan la misma clave.
+    """
+    key = (version, int(top_n), canonical_profile(profile))
+    if options:
+        key += (sorted(options.items()),)
+    raw = repr(key)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+class MemoryBackend:
+    """LRU en memoria del proceso con caducidad (TTL)."""
+
+    def __init__(self, max_entries=1024, ttl=600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key -> (caduca, valor)
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[0] <= time.time():
+                del self._data[key]
+                self.evictions += 1
+                return None
+            self._data.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.time() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SqliteBackend:
+    """
+    Misma caché en un fichero sqlite: la comparten todos los workers de la
+    máquina (un perfil calculado en uno es un acierto en los demás).
+    Los valores se guardan en JSON.
+    """
+
+    def __init__(self, path, max_entries=10000, ttl=600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0  # las que ha hecho este proceso
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS rec_cache ("
+                       "key TEXT PRIMARY KEY, value TEXT, expires REAL, used REAL)")
+            db.execute("CREATE INDEX IF NOT EXISTS rec_cache_used ON rec_cache (used)")
+
+    def _conn(self):
+        # Una conexión por hilo (sqlite no deja compartirlas entre hilos)
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def get(self, key):
+        now = time.time()
+        with self._conn() as db:
+            row = db.execute("SELECT value, expires FROM rec_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                db.execute("DELETE FROM rec_cache WHERE key = ?", (key,))
+                self.evictions += 1
+                return None
+            db.execute("UPDATE rec_cache SET used = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        with self._conn() as db:
+            db.execute("INSERT OR REPLACE INTO rec_cache (key, value, expires, used) VALUES (?, ?, ?, ?)",
+                       (key, json.dumps(value), now + self.ttl, now))
+            # Fuera las caducadas y, si sobran, las usadas hace más tiempo
+            removed = db.execute("DELETE FROM rec_cache WHERE expires <= ?", (now,)).rowcount
+            extra = db.execute("SELECT COUNT(*) FROM rec_cache").fetchone()[0] - self.max_entries
+            if extra > 0:
+                removed += db.execute("DELETE FROM rec_cache WHERE key IN "
+                                      "(SELECT key FROM rec_cache ORDER BY used LIMIT ?)", (extra,)).rowcount
+        self.evictions += removed
+
+    def clear(self):
+        with self._conn() as db:
+            db.execute("DELETE FROM rec_cache")
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM rec_cache").fetchone()[0]
+
+
+class RecCache:
+    """
+    Caché de resultados de recomendación delante de get_recommendations.
+    Cuenta aciertos, fallos y expulsiones (LRU o caducadas).
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, profile, top_n, version, compute, options=None):
+        """Resultado cacheado para (perfil, top_n, versión, opciones) o compute() si no está."""
+        key = profile_key(profile, top_n, version, options)
+        value = self.backend.get(key)
+        with self._lock:
+            if value is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if value is None:
+            value = compute()
+            self.backend.set(key, value)
+        return value
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.backend.evictions,
+            "size": len(self.backend),
+        }
+
+
+def cache_from_env(default_dir):
+    """
+    RecCache configurada con variables de entorno:
+    ANIMATCH_REC_CACHE = memory (por defecto) | sqlite | off
+    ANIMATCH_REC_CACHE_SIZE (entradas), ANIMATCH_REC_CACHE_TTL (segundos),
+    ANIMATCH_REC_CACHE_PATH (fichero sqlite; por defecto default_dir/rec_cache.sqlite)
+    Devuelve None si está desactivada.
+    """
+    kind = os.environ.get("ANIMATCH_REC_CACHE", "memory").lower()
+    size = int(os.environ.get("ANIMATCH_REC_CACHE_SIZE", "1024"))
+    ttl = float(os.environ.get("ANIMATCH_REC_CACHE_TTL", "600"))
+    if kind == "off":
+        return None
+    if kind == "sqlite":
+        path = os.environ.get("ANIMATCH_REC_CACHE_PATH", os.path.join(default_dir, "rec_cache.sqlite"))
+        return RecCache(SqliteBackend(path, size, ttl))
+    return RecCache(MemoryBackend(size, ttl))
@@ -0,0 +1,230 @@
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+LOCK_FILE = "running.lock"
+# Si no se puede saber si el dueño de un trabajo sigue vivo, se da por muerto
+# pasado este tiempo (ningún reentrenamiento dura tanto)
+UNKNOWN_OWNER_MAX_AGE = 24 * 3600
+
+
+class RetrainJobs:
+    """
+    Reentrenamientos en segundo plano.
+    Cada trabajo corre en un hilo y su estado se guarda en jobs/<job_id>.json,
+    así cualquier worker de la API puede consultarlo (no solo el que lo lanzó).
+    Solo puede haber uno a la vez en todos los procesos: el que lo lanza crea
+    jobs/running.lock (O_CREAT | O_EXCL, atómico entre procesos) y lo borra al terminar.
+    exclusive() toma el mismo lock para las actualizaciones incrementales.
+    """
+
+    def __init__(self, jobs_dir, train_fn, on_done):
+        self.jobs_dir = jobs_dir
+        self._train_fn = train_fn   # train_fn(progress=...) -> timings
+        self._on_done = on_done     # se llama al terminar (recarga el modelo y lo devuelve)
+        self._lock = threading.Lock()
+        self._active = set()        # trabajos que corren en este proceso
+
+    def start(self, username=None):
+        """
+        Lanza un reentrenamiento y devuelve su estado inicial.
+        Devuelve None si ya hay otro en curso.
+        """
+        job_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            if not self._acquire(job_id):
+                return None
+            job = {
+                "job_id": job_id,
+                "status": "running",
+                "stage": None,
+                "progress": 0.0,
+                "requested_by": username,
+                "pid": os.getpid(),
+                "started_at": time.time(),
+                "finished_at": None,
+                "timings": None,
+                "error": None,
+            }
+            self._save(job)
+            self._active.add(job["job_id"])
+
+        threading.Thread(target=self._run, args=(job,), daemon=True).start()
+        return dict(job)
+
+    @contextmanager
+    def exclusive(self, name):
+        """
+        Toma el mismo lock que los reentrenamientos durante el bloque, para
+        operaciones síncronas que no pueden coincidir con uno (ni entre ellas),
+        como update_model en /ratings-delta. Devuelve False si ya está cogido:
+            with RETRAIN_JOBS.exclusive("ratings-delta") as acquired: ...
+        """
+        lock_id = f"{name}-{uuid.uuid4().hex[:12]}"
+        with self._lock:
+            acquired = self._acquire(lock_id)
+            if acquired:
+                self._active.add(lock_id)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self._active.discard(lock_id)
+                self._release(lock_id)
+
+    def get(self, job_id):
+        """Estado de un trabajo (dict) o None si no existe."""
+        path = self._path(job_id)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            job = json.load(f)
+        if job.get("status") == "running" and not self._alive(job, job.get("started_at")):
+            job["status"] = "interrupted"  # el proceso que lo corría ya no existe
+        return job
+
+    def running_job(self):
+        """Trabajo en curso (de este o de otro proceso vivo) o None."""
+        if not os.path.isdir(self.jobs_dir):
+            return None
+        for name in os.listdir(self.jobs_dir):
+            if not name.endswith(".json"):
+                continue
+            job = self.get(name[:-len(".json")])
+            if job and job.get("status") == "running":
+                return job
+        return None
+
+    def _run(self, job):
+        def progress(stage, fraction):
+            job.update(stage=stage, progress=round(fraction, 3))
+            self._save(job)
+
+        try:
+            job["timings"] = self._train_fn(progress=progress)
+            model = self._on_done()
+            job.update(status="done", stage=None, progress=1.0,
+                       model_version=getattr(model, "version", None))
+        except Exception as e:
+            job.update(status="error", error=str(e))
+        job["finished_at"] = time.time()
+        self._save(job)
+        self._active.discard(job["job_id"])
+        self._release(job["job_id"])
+
+    def _acquire(self, job_id):
+        """
+        Crea el lock con el job_id y el pid de este proceso. False si ya existe
+        y su dueño sigue vivo; si su proceso murió (lock huérfano) lo rompe y
+        lo vuelve a intentar.
+        """
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        path = os.path.join(self.jobs_dir, LOCK_FILE)
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                owner = _read_lock(path)
+                if owner is None:  # se acaba de borrar
+                    continue
+                if not owner or self._alive(owner, owner.get("created_at")):  # vacío: se está escribiendo
+                    return False
+                # Se mueve antes de borrarlo: si otro proceso ya lo rompió y creó
+                # el suyo, se devuelve a su sitio en lugar de borrar un lock vivo
+                stale = f"{path}.{os.getpid()}.stale"
+                try:
+                    os.rename(path, stale)
+                except FileNotFoundError:
+                    continue
+                if _read_lock(stale) != owner:
+                    os.rename(stale, path)
+                    return False
+                os.remove(stale)
+                continue
+            with os.fdopen(fd, "w") as f:
+                json.dump({"job_id": job_id, "pid": os.getpid(), "created_at": time.time()}, f)
+            return True
+        return False
+
+    def _release(self, job_id):
+        path = os.path.join(self.jobs_dir, LOCK_FILE)
+        if (_read_lock(path) or {}).get("job_id") == job_id:
+            os.remove(path)
+
+    def _alive(self, job, since=None):
+        """
+        El proceso que corre el trabajo sigue vivo? Si no se puede comprobar
+        se supone que sí, salvo que lleve más de UNKNOWN_OWNER_MAX_AGE desde `since`.
+        """
+        if job.get("pid") == os.getpid():
+            return job["job_id"] in self._active
+        alive = _pid_alive(job.get("pid"))
+        if alive is None:
+            return since is None or time.time() - since < UNKNOWN_OWNER_MAX_AGE
+        return alive
+
+    def _path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{os.path.basename(job_id)}.json")
+
+    def _save(self, job):
+        # Escritura atómica: fichero temporal + os.replace
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        path = self._path(job["job_id"])
+        with open(path + ".tmp", "w") as f:
+            json.dump(job, f, indent=4)
+        os.replace(path + ".tmp", path)
+
+
+def _read_lock(path):
+    """Contenido del lock ({job_id, pid}) o None si no existe; {} si se está escribiendo"""
+    try:
+        with open(path) as f:
+            return json.loads(f.read() or "{}")
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        return {}
+
+
+def _pid_alive(pid):
+    """True/False si el proceso existe o no; None si no se puede saber"""
+    if not pid:
+        return False
+    if os.name == "nt":
+        # En Windows os.kill(pid, 0) mataría el proceso: se pregunta al kernel
+        return _pid_alive_windows(pid)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def _pid_alive_windows(pid):
+    try:
+        import ctypes
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    except (ImportError, AttributeError, OSError):
+        return None
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    STILL_ACTIVE = 259
+    ERROR_ACCESS_DENIED = 5
+
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, int(pid))
+    if not handle:
+        # Sin permisos el proceso existe; con cualquier otro error (pid inválido) no
+        return ctypes.get_last_error() == ERROR_ACCESS_DENIED
+    try:
+        code = ctypes.c_ulong()
+        if not kernel32.GetExitCodeProcess(handle, ctypes.byref(code)):
+            return None
+        return code.value == STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(handle)
@@ -0,0 +1,80 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ScoringBusy(Exception):
+    """No hay hueco para puntuar a tiempo: la API responde 503."""
+
+
+class ScoringPool:
+    """
+    Hilos para el trabajo de CPU (puntuar perfiles) separados de los hilos que
+    atienden peticiones. Como mucho max_workers puntuaciones a la vez por
+    proceso: el resto espera un hilo libre (hasta timeout segundos; el tiempo
+    de cálculo no cuenta) y mientras tanto las peticiones que solo esperan a
+    MySQL o a la red no se quedan sin CPU.
+    NumPy suelta el GIL en los productos de matrices, así que con varios
+    núcleos por worker se puntúan varias peticiones en paralelo.
+    Los hilos se crean al primer uso: después de un fork hay que llamar a
+    reset() (el proceso hijo no hereda los hilos del padre).
+    """
+
+    def __init__(self, max_workers=2, timeout=10.0):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(max_workers)  # hilos libres
+
+    def run(self, fn, *args, **kwargs):
+        """
+        fn(*args, **kwargs) en un hilo del pool. ScoringBusy si en timeout
+        segundos no queda ningún hilo libre; una vez empieza se espera a que
+        acabe (un perfil grande no da 503 por tardar en calcularse).
+        """
+        slots = self._slots
+        if not slots.acquire(timeout=self.timeout):
+            raise ScoringBusy(f"Sin hueco para puntuar en {self.timeout}s")
+        try:
+            future = self._get_executor().submit(fn, *args, **kwargs)
+        except BaseException:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        return future.result()
+
+    def reset(self):
+        """Olvida el executor heredado (post_fork) sin esperar a sus hilos."""
+        with self._lock:
+            self._executor = None
+            self._slots = threading.BoundedSemaphore(self.max_workers)
+
+    def shutdown(self, wait=True):
+        """Deja de aceptar trabajo y, si wait, espera a que acabe el que está en marcha."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="scoring")
+        return self._executor
+
+
+def pool_from_env():
+    """
+    ScoringPool configurado con variables de entorno:
+    ANIMATCH_SCORING_THREADS (por defecto, los núcleos repartidos entre los
+      ANIMATCH_WORKERS procesos de la API: max(1, núcleos // workers))
+    ANIMATCH_SCORING_TIMEOUT (segundos esperando un hilo libre; 10)
+    gunicorn.conf.py deja en ANIMATCH_WORKERS los workers que arranca; con el
+    servidor de desarrollo hay un solo proceso.
+    """
+    workers = int(os.environ.get("ANIMATCH_WORKERS", "0")) or 1
+    threads = int(os.environ.get("ANIMATCH_SCORING_THREADS", "0")) or max(1, (os.cpu_count() or 1) // workers)
+    timeout = float(os.environ.get("ANIMATCH_SCORING_TIMEOUT", "10"))
+    return ScoringPool(threads, timeout)
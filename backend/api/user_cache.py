@@ -0,0 +1,64 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def canonical_profile(ratings):
+    """
+    Forma canónica de un perfil {anime_id: rating}: tuplas (anime_id, rating)
+    ordenadas, así {20: 9, 1: 7} y {"1": 7.0, "20": 9.0} son iguales.
+    La usan las huellas de las dos cachés (ratings_hash y rec_cache.profile_key).
+    """
+    return sorted((int(aid), float(r)) for aid, r in ratings.items())
+
+
+def ratings_hash(ratings):
+    """Huella de un perfil {anime_id: rating} (no depende del orden)."""
+    return hashlib.sha1(repr(canonical_profile(ratings)).encode()).hexdigest()
+
+
+class UserRecCache:
+    """
+    Recomendaciones ya calculadas de cada usuario.
+    La clave es (usuario, versión del modelo, huella de sus valoraciones, top_n):
+    si el usuario cambia sus notas o se activa otro modelo la clave ya no
+    coincide y se vuelve a calcular. Además se invalida explícitamente al
+    guardar valoraciones o al terminar un reentrenamiento, para no guardar
+    entradas que ya no se van a usar.
+    Es por proceso: cada worker de la API tiene la suya.
+    """
+
+    def __init__(self, max_users=10000):
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # user_id -> {(version, hash, top_n): recs}
+
+    def get(self, user_id, version, rhash, top_n):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(user_id)
+            return entry.get((version, rhash, top_n))
+
+    def put(self, user_id, version, rhash, top_n, recs):
+        with self._lock:
+            entry = self._entries.setdefault(user_id, {})
+            # Solo vale la versión y las notas actuales: lo anterior se descarta
+            for key in [k for k in entry if k[:2] != (version, rhash)]:
+                del entry[key]
+            entry[(version, rhash, top_n)] = recs
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)  # el usuario usado hace más tiempo
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
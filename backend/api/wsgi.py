@@ -0,0 +1,19 @@
+"""
+Punto de entrada WSGI de la API para servidores de producción:
+    cd backend && gunicorn -c api/gunicorn.conf.py
+Por defecto (ANIMATCH_WARMUP=sync) precarga el modelo y el índice de nombres
+al importarse: con preload_app el proceso maestro lo hace una sola vez antes
+de crear los workers. Con ANIMATCH_WARMUP=background cada worker arranca al
+momento y carga en segundo plano (ver /health/ready).
+"""
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+os.environ.setdefault("ANIMATCH_WARMUP", "sync")
+from api import WARMUP_MODE, app, check_db_config, preload
+
+check_db_config()  # sin usuario y contraseña de la BD no se arranca (RuntimeError)
+
+if WARMUP_MODE == "sync":
+    preload()
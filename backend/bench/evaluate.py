@@ -0,0 +1,176 @@
+"""
+Evaluación offline de los dos tipos de modelo (correlaciones y ALS) con los
+mismos datos: se aparta un 20% de las valoraciones de unos cuantos usuarios,
+se entrenan los dos modelos con el resto y, para cada usuario de prueba, se
+usa lo que queda de su perfil para predecir lo apartado.
+
+- rmse: error al predecir la nota de las valoraciones apartadas. El modelo de
+  correlaciones no predice notas: se usa la media de las notas del perfil
+  ponderada por la correlación (positiva) con el anime a predecir, y la media
+  del perfil si no hay ninguna (coverage dice cuántas sí tenían).
+- recall_at_10: de los animes apartados, cuántos salen en las 10 primeras
+  recomendaciones (sobre min(10, apartados)).
+- latencia de get_recommendations por perfil y tamaño de los ficheros.
+
+Uso:
+    python bench/evaluate.py --data bench/data/1m --out bench/results/eval_1m.json
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from run_bench import quiet  # noqa: E402
+
+
+def split_ratings(data_dir, test_users, holdout, min_ratings=10, seed=0):
+    """
+    (valoraciones de entrenamiento, {user_id: (perfil, apartadas)}): a test_users
+    usuarios con al menos min_ratings notas se les aparta la fracción holdout.
+    """
+    ratings = pd.read_csv(os.path.join(data_dir, "rating.csv"))
+    ratings = ratings[ratings["rating"] != -1].drop_duplicates(["user_id", "anime_id"], keep="last")
+
+    rng = np.random.default_rng(seed)
+    counts = ratings["user_id"].value_counts()
+    candidates = counts[counts >= min_ratings].index.to_numpy()
+    chosen = rng.choice(candidates, min(test_users, len(candidates)), replace=False)
+
+    test = ratings[ratings["user_id"].isin(chosen)]
+    hidden = np.zeros(len(ratings), dtype=bool)
+    users = {}
+    for user_id, rows in test.groupby("user_id"):
+        n_hidden = max(1, int(round(len(rows) * holdout)))
+        out = rng.choice(len(rows), n_hidden, replace=False)
+        mask = np.zeros(len(rows), dtype=bool)
+        mask[out] = True
+        hidden[ratings.index.get_indexer(rows.index[mask])] = True
+        users[int(user_id)] = (dict(zip(rows["anime_id"][~mask].astype(int), rows["rating"][~mask].astype(float))),
+                               dict(zip(rows["anime_id"][mask].astype(int), rows["rating"][mask].astype(float))))
+    return ratings[~hidden], users
+
+
+def corr_predictions(model, profile, targets):
+    """Nota prevista de cada target amb el model de correlacions (None si no hi ha cap veí)"""
+    ids = model.item_ids
+    known = [a for a in profile if model.has_item(a)]
+    if not known:
+        return {t: None for t in targets}
+    cols = np.searchsorted(ids, known)
+    ratings = np.array([profile[a] for a in known])
+    preds = {}
+    for t in targets:
+        if not model.has_item(t):
+            preds[t] = None
+            continue
+        corr = np.asarray(model.values[np.searchsorted(ids, t), cols], dtype="float64")
+        use = ~np.isnan(corr) & (corr > 0)
+        preds[t] = float(corr[use] @ ratings[use] / corr[use].sum()) if use.any() else None
+    return preds
+
+
+def als_predictions(model, profile, targets):
+    factors, ids = model.factors, model.item_ids
+    known = [a for a in profile if model.has_item(a)]
+    if not known:
+        return {t: None for t in targets}
+    pos = np.searchsorted(ids, known)
+    scores = factors.predict(factors.fold_in(pos, [profile[a] for a in known]))
+    return {t: float(scores[np.searchsorted(ids, t)]) if model.has_item(t) else None for t in targets}
+
+
+def evaluate(model_mod, model, users, predict, k=10, exact=False):
+    errors, baseline, covered, hits, relevant = [], [], 0, 0, 0
+    latencies = []
+    for profile, hidden in users.values():
+        mean = float(np.mean(list(profile.values())))
+        for target, pred in predict(model, profile, hidden).items():
+            covered += pred is not None
+            errors.append((pred if pred is not None else mean) - hidden[target])
+            baseline.append(mean - hidden[target])
+
+        t0 = time.perf_counter()
+        recs = model_mod.get_recommendations(profile, top_n=k, model=model, exact=exact)
+        latencies.append(time.perf_counter() - t0)
+        hits += len(set(recs["anime_id"].astype(int)) & set(hidden))
+        relevant += min(k, len(hidden))
+
+    latencies = np.array(latencies) * 1000
+    return {
+        "rmse": round(float(np.sqrt(np.mean(np.square(errors)))), 4),
+        "rmse_profile_mean": round(float(np.sqrt(np.mean(np.square(baseline)))), 4),
+        "coverage": round(covered / max(len(errors), 1), 3),
+        f"recall_at_{k}": round(hits / max(relevant, 1), 4),
+        "latency_median_ms": round(float(np.median(latencies)), 3),
+        "latency_p95_ms": round(float(np.percentile(latencies, 95)), 3),
+    }
+
+
+def model_files(info):
+    keys = ("artifact_path", "ids_path", "neighbors_path", "factors_path", "similar_path")
+    return {key[:-len("_path")] + "_bytes": os.path.getsize(info[key])
+            for key in keys if info.get(key) and os.path.exists(info[key])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluación offline: correlaciones frente a ALS")
+    parser.add_argument("--data", required=True, help="directorio con anime.csv y rating.csv")
+    parser.add_argument("--test-users", type=int, default=500, help="usuarios de prueba")
+    parser.add_argument("--holdout", type=float, default=0.2, help="fracción apartada de cada usuario de prueba")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="fichero JSON de resultados (por defecto solo se imprime)")
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="animatch_eval_")
+    try:
+        train, users = split_ratings(args.data, args.test_users, args.holdout, seed=args.seed)
+        data_dir = os.path.join(work, "data")
+        os.makedirs(data_dir)
+        train.to_csv(os.path.join(data_dir, "rating.csv"), index=False)
+        shutil.copy(os.path.join(args.data, "anime.csv"), data_dir)
+
+        # Rutas antes de importar el modelo (las lee al importarse)
+        os.environ["ANIMATCH_DATA_DIR"] = data_dir
+        os.environ["ANIMATCH_MODELS_DIR"] = os.path.join(work, "models")
+        with quiet():
+            import model.model as model_mod
+
+        results = {"meta": {"data": os.path.abspath(args.data), "train_ratings": len(train),
+                            "test_users": len(users), "holdout": args.holdout}}
+        for model_type, predict in (("corr", corr_predictions), ("als", als_predictions)):
+            print(f"{model_type}: entrenando...", file=sys.stderr)
+            with quiet():
+                t0 = time.perf_counter()
+                model_mod.train_model(model_type=model_type)
+                train_s = time.perf_counter() - t0
+                model = model_mod.MODEL_STORE.reload()
+                results[model_type] = {"train_s": round(train_s, 2), "items": len(model.item_ids),
+                                       **evaluate(model_mod, model, users, predict),
+                                       **model_files(model.info)}
+                if model_type == "corr":
+                    exact = evaluate(model_mod, model, users, predict, exact=True)
+                    results["corr_exact"] = {key: exact[key] for key in
+                                             ("recall_at_10", "latency_median_ms", "latency_p95_ms")}
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    text = json.dumps(results, indent=2)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
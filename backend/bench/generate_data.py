@@ -0,0 +1,151 @@
+"""
+Generador de datos sintéticos con el mismo formato que el dataset de Kaggle
+(anime.csv y rating.csv), para poder medir el rendimiento sin los CSV reales.
+
+- La popularidad de los animes sigue una ley de potencias (Zipf-Mandelbrot):
+  unos pocos acumulan la mayoría de valoraciones, como en los datos reales.
+- La actividad de los usuarios también está muy sesgada (log-normal).
+- La nota depende de la "calidad" del anime, del sesgo del usuario y de ruido;
+  una parte de las filas son -1 (visto pero sin nota), como en Kaggle.
+- Con la misma semilla se generan exactamente los mismos ficheros.
+
+Uso:
+    python bench/generate_data.py --ratings 1000000 --out bench/data/1m
+"""
+import argparse
+import math
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+GENRES = ["Action", "Adventure", "Comedy", "Drama", "Fantasy", "Romance", "Sci-Fi",
+          "Slice of Life", "Mystery", "Sports", "Supernatural", "Mecha", "Music",
+          "Psychological", "School", "Shounen", "Seinen", "Historical", "Horror"]
+TYPES = ["TV", "OVA", "Movie", "Special", "ONA", "Music"]
+TYPE_P = [0.30, 0.27, 0.19, 0.14, 0.06, 0.04]
+WORDS = ["Shingeki", "Kyojin", "Naruto", "Gintama", "Bleach", "Steins", "Gate", "Code",
+         "Geass", "Death", "Note", "Kimi", "no", "Na", "wa", "Fullmetal", "Alchemist",
+         "Hunter", "Tokyo", "Ghoul", "Cowboy", "Bebop", "Neon", "Genesis", "Sword", "Art",
+         "Online", "Monogatari", "Clannad", "Haikyuu", "Mushishi", "Ginga", "Eiyuu",
+         "Densetsu", "Sen", "Chihiro", "Kamikakushi", "Koe", "Katachi", "Hajime", "Ippo"]
+SUFFIXES = ["", "", "", "", " 2nd Season", " Movie", " OVA", " Specials", ": Brotherhood", " Final"]
+
+NOT_RATED = 0.19        # fracción de filas con rating -1
+CHUNK_RATINGS = 2_000_000
+
+
+def default_items(n_ratings):
+    # Kaggle: ~12k animes para ~7.8M valoraciones; a escalas pequeñas, menos animes
+    return int(min(12294, max(200, 4 * math.sqrt(n_ratings))))
+
+
+def generate(out_dir, n_ratings, n_items=None, n_users=None, alpha=1.0, seed=0):
+    """
+    Escribe out_dir/anime.csv y out_dir/rating.csv.
+    n_ratings: filas aproximadas de rating.csv (se quitan los pares repetidos)
+    alpha: exponente de la ley de potencias de la popularidad
+    Devuelve un resumen (filas, animes, usuarios, segundos).
+    """
+    t0 = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    n_items = n_items or default_items(n_ratings)
+    n_users = n_users or max(100, n_ratings // 100)  # ~100 valoraciones por usuario, como Kaggle
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Animes: popularidad por rango (Zipf-Mandelbrot; el desplazamiento suaviza
+    # la cabeza) y calidad algo correlacionada con ella
+    rank = rng.permutation(n_items) + 1
+    popularity = 1.0 / (rank + max(10.0, n_items / 100)) ** alpha
+    popularity /= popularity.sum()
+    quality = rng.normal(size=n_items) + 0.3 * (np.log(popularity) - np.log(popularity).mean())
+    quality /= quality.std()
+    anime_ids = np.sort(rng.choice(np.arange(1, max(40000, 4 * n_items)), n_items, replace=False))
+
+    anime = pd.DataFrame({
+        "anime_id": anime_ids,
+        "name": _names(rng, n_items),
+        "genre": [", ".join(rng.choice(GENRES, rng.integers(1, 5), replace=False)) for _ in range(n_items)],
+        "type": rng.choice(TYPES, n_items, p=TYPE_P),
+        "episodes": rng.integers(1, 100, n_items),
+        "rating": np.round(np.clip(6.5 + 0.9 * quality, 1, 10), 2),
+        "members": np.maximum(1, (popularity * n_ratings * 1.5 + rng.integers(0, 50, n_items))).astype(int),
+    })
+    anime.to_csv(os.path.join(out_dir, "anime.csv"), index=False)
+
+    # Usuarios: actividad log-normal (muchos con pocas notas, algunos con miles)
+    activity = rng.lognormal(0.0, 1.2, n_users)
+    counts = np.maximum(1, rng.poisson(activity / activity.sum() * n_ratings))
+    counts = np.minimum(counts, n_items // 2)
+    bias = rng.normal(0, 0.8, n_users)
+    cdf = np.cumsum(popularity)
+    cdf[-1] = 1.0
+
+    rating_path = os.path.join(out_dir, "rating.csv")
+    written = 0
+    ends = np.cumsum(counts)
+    start_user = 0
+    with open(rating_path, "w", newline="") as f:
+        f.write("user_id,anime_id,rating\n")
+        while start_user < n_users:
+            # Trozo de usuarios con unos CHUNK_RATINGS valoraciones en total
+            base = ends[start_user - 1] if start_user else 0
+            end_user = int(np.searchsorted(ends, base + CHUNK_RATINGS, side="right"))
+            end_user = max(end_user, start_user + 1)
+            # Se sortea el doble de animes por usuario porque los repetidos se descartan
+            users = np.repeat(np.arange(start_user, end_user), 2 * counts[start_user:end_user])
+            items = np.searchsorted(cdf, rng.random(len(users)), side="right")
+
+            # Un usuario no valora dos veces el mismo anime; nos quedamos con sus
+            # counts[u] primeros animes distintos
+            _, first = np.unique(users.astype("int64") * n_items + items, return_index=True)
+            first.sort()
+            users, items = users[first], items[first]
+            group_start = np.searchsorted(users, users, side="left")
+            keep = np.arange(len(users)) - group_start < counts[users]
+            users, items = users[keep], items[keep]
+
+            notes = np.rint(6.8 + 1.3 * quality[items] + bias[users] + rng.normal(0, 1.2, len(users)))
+            notes = np.clip(notes, 1, 10).astype("int8")
+            notes[rng.random(len(notes)) < NOT_RATED] = -1
+
+            pd.DataFrame({"user_id": users + 1, "anime_id": anime_ids[items], "rating": notes}) \
+                .to_csv(f, header=False, index=False)
+            written += len(users)
+            start_user = end_user
+
+    return {
+        "ratings": int(written),
+        "items": int(n_items),
+        "users": int(n_users),
+        "alpha": alpha,
+        "seed": seed,
+        "seconds": round(time.perf_counter() - t0, 2),
+    }
+
+
+def _names(rng, n):
+    names, seen = [], set()
+    for i in range(n):
+        name = " ".join(rng.choice(WORDS, rng.integers(1, 4))) + str(rng.choice(SUFFIXES))
+        if name in seen:
+            name = f"{name} {i}"
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera anime.csv y rating.csv sintéticos")
+    parser.add_argument("--out", required=True, help="directorio de salida")
+    parser.add_argument("--ratings", type=int, default=1_000_000,
+                        help="filas de rating.csv (de 100k a 50M)")
+    parser.add_argument("--items", type=int, help="animes (por defecto según --ratings)")
+    parser.add_argument("--users", type=int, help="usuarios (por defecto ratings / 100)")
+    parser.add_argument("--alpha", type=float, default=1.0, help="exponente de la popularidad (Zipf)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    summary = generate(args.out, args.ratings, args.items, args.users, args.alpha, args.seed)
+    print(f"Datos generados en {args.out}: {summary}")
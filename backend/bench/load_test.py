@@ -0,0 +1,174 @@
+"""
+Prueba de carga de la API: arranca el servidor, le lanza peticiones desde
+varios procesos cliente durante un tiempo fijo y mide peticiones por segundo
+y latencias. Sirve para comparar el servidor de desarrollo (python api/api.py)
+con el de producción (gunicorn -c api/gunicorn.conf.py).
+
+Mezcla de peticiones (sin MySQL): /obtener-recomendaciones con perfiles
+aleatorios (caché de recomendaciones desactivada, para medir el modelo),
+/search-anime con prefijos y /health.
+
+Uso:
+    python bench/load_test.py --data bench/data/1m --models bench/models --mode dev,prod
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+MIX = [("recommend", 0.6), ("search", 0.3), ("health", 0.1)]
+PREFIXES = ["a", "na", "sh", "ko", "gi", "to", "de", "ha", "ki", "mo", "se", "co"]
+
+
+def server_command(mode, port):
+    if mode == "dev":
+        # Igual que hasta ahora: app.run(debug=True) (el puerto es el de Flask por defecto)
+        return [sys.executable, os.path.join("api", "api.py")], 5000
+    if mode == "prod":
+        return [sys.executable, "-m", "gunicorn", "-c", os.path.join("api", "gunicorn.conf.py")], port
+    raise ValueError(f"Modo desconocido: {mode}")
+
+
+def start_server(mode, env, port):
+    cmd, port = server_command(mode, port)
+    env = dict(env, ANIMATCH_BIND=f"127.0.0.1:{port}")
+    proc = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env, start_new_session=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"El servidor ({mode}) ha terminado al arrancar")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/health/ready")  # con el modelo ya cargado
+            if conn.getresponse().status == 200:
+                return proc, port
+        except OSError:
+            time.sleep(0.2)
+    stop_server(proc)
+    raise RuntimeError(f"El servidor ({mode}) no responde")
+
+
+def stop_server(proc):
+    # El de desarrollo tiene un proceso hijo (el reloader): paramos todo el grupo
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(timeout=30)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(proc.pid, signal.SIGKILL)
+
+
+def client(args):
+    """Un proceso cliente: peticiones en bucle hasta el final; devuelve (latencias por tipo, errores)"""
+    port, item_ids, end, seed = args
+    rng = random.Random(seed)
+    kinds, weights = zip(*MIX)
+    latencies = {kind: [] for kind in kinds}
+    errors = 0
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    while time.time() < end:
+        kind = rng.choices(kinds, weights)[0]
+        if kind == "recommend":
+            profile = {str(a): rng.randint(1, 10) for a in rng.sample(item_ids, rng.randint(2, 10))}
+            method, path, body = "POST", "/obtener-recomendaciones", json.dumps(profile)
+        elif kind == "search":
+            method, path, body = "GET", f"/search-anime?q={rng.choice(PREFIXES)}&limit=10", None
+        else:
+            method, path, body = "GET", "/health", None
+        t0 = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers={"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            resp.read()
+            ok = resp.status < 500
+        except (OSError, http.client.HTTPException):
+            ok = False
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        if ok:
+            latencies[kind].append(time.perf_counter() - t0)
+        else:
+            errors += 1
+    return latencies, errors
+
+
+def run_load(port, item_ids, clients, duration, seed=0):
+    end = time.time() + duration
+    with multiprocessing.Pool(clients) as pool:
+        results = pool.map(client, [(port, item_ids, end, seed + i) for i in range(clients)])
+    all_lat = np.concatenate([np.array(l, dtype=float) for lat, _ in results for l in lat.values()] or [[]])
+    summary = {
+        "requests": int(all_lat.size),
+        "errors": sum(e for _, e in results),
+        "rps": round(all_lat.size / duration, 1),
+        **_percentiles(all_lat),
+        "by_endpoint": {},
+    }
+    for kind, _ in MIX:
+        lat = np.array([l for r, _ in results for l in r[kind]], dtype=float)
+        summary["by_endpoint"][kind] = {"requests": int(lat.size), **_percentiles(lat)}
+    return summary
+
+
+def _percentiles(lat):
+    if lat.size == 0:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    p50, p95, p99 = np.percentile(lat, [50, 95, 99]) * 1000
+    return {"p50_ms": round(p50, 2), "p95_ms": round(p95, 2), "p99_ms": round(p99, 2)}
+
+
+def model_item_ids(models_dir, limit=2000):
+    with open(os.path.join(models_dir, "current_model.json")) as f:
+        info = json.load(f)
+    if "ids_path" in info:
+        ids = np.load(info["ids_path"])
+    elif "factors_path" in info:
+        ids = np.load(info["factors_path"])["item_ids"]
+    else:
+        ids = np.load(info["neighbors_path"])["item_ids"]
+    return [int(a) for a in ids[:limit]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga del servidor de desarrollo y el de producción")
+    parser.add_argument("--data", required=True, help="directorio con anime.csv y rating.csv")
+    parser.add_argument("--models", required=True, help="directorio con un modelo ya entrenado")
+    parser.add_argument("--mode", default="dev,prod", help="servidores a probar, separados por comas")
+    parser.add_argument("--clients", type=int, default=16, help="procesos cliente simultáneos")
+    parser.add_argument("--duration", type=float, default=20, help="segundos de carga por servidor")
+    parser.add_argument("--port", type=int, default=5055, help="puerto del servidor de producción")
+    parser.add_argument("--out", help="fichero JSON de resultados")
+    args = parser.parse_args()
+
+    env = dict(os.environ, ANIMATCH_DATA_DIR=os.path.abspath(args.data),
+               ANIMATCH_MODELS_DIR=os.path.abspath(args.models), ANIMATCH_REC_CACHE="off")
+    item_ids = model_item_ids(env["ANIMATCH_MODELS_DIR"])
+
+    results = {"meta": {"clients": args.clients, "duration": args.duration, "cpus": os.cpu_count()}}
+    for mode in args.mode.split(","):
+        print(f"{mode}: arrancando...", file=sys.stderr)
+        proc, port = start_server(mode, env, args.port)
+        try:
+            results[mode] = run_load(port, item_ids, args.clients, args.duration)
+        finally:
+            stop_server(proc)
+        print(f"{mode}: {results[mode]['rps']} peticiones/s, p95 {results[mode]['p95_ms']} ms", file=sys.stderr)
+
+    if "dev" in results and "prod" in results and results["dev"]["rps"]:
+        results["speedup"] = round(results["prod"]["rps"] / results["dev"]["rps"], 2)
+
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    print(text)
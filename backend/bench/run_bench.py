@@ -0,0 +1,517 @@
+"""
+Benchmarks de AniMatch: entrenamiento, carga del modelo, recomendaciones,
+resolución de nombres y endpoints de Flask (con el test client).
+Cada medida guarda el tiempo (mediana y p95 si se repite) y el pico de
+memoria del proceso; el resultado se escribe en JSON para comparar
+ejecuciones entre commits.
+
+Uso:
+    python bench/generate_data.py --ratings 1000000 --out bench/data/1m
+    python bench/run_bench.py --data bench/data/1m --out bench/results/1m.json
+    python bench/run_bench.py --data bench/data/1m --skip-train --compare bench/results/1m.json
+
+Los modelos se entrenan en un directorio aparte (--models, por defecto uno
+temporal), así nunca se toca backend/models.
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+PROFILE_SIZES = [1, 5, 20, 100]
+
+
+# MEMORIA
+
+def rss_bytes():
+    """Memoria residente actual del proceso (None si no se puede saber)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+class PeakMemory:
+    """
+    Mide el pico de memoria residente mientras dura el bloque, muestreando
+    en un hilo aparte. mark(nombre) empieza un tramo nuevo (para las etapas
+    del entrenamiento); peaks tiene el pico de cada tramo en MB.
+    """
+
+    INTERVAL = 0.005
+
+    def __init__(self):
+        self.peaks = {}
+        self._current = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def __enter__(self):
+        self.mark("total")
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._sample_once()
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def total_mb(self):
+        return self.peaks.get("total")
+
+    def mark(self, name):
+        self._sample_once()
+        self._current = name
+
+    def _sample(self):
+        while not self._stop.wait(self.INTERVAL):
+            self._sample_once()
+
+    def _sample_once(self):
+        rss = rss_bytes()
+        if rss is None:
+            return
+        mb = round(rss / 1024 ** 2, 1)
+        for name in {"total", self._current} - {None}:
+            self.peaks[name] = max(self.peaks.get(name, 0), mb)
+
+
+# MEDIDAS
+
+def timed(fn, repeat=1, warmup=0):
+    """Ejecuta fn varias veces: {median_ms, p95_ms, min_ms, runs, peak_rss_mb}"""
+    for _ in range(warmup):
+        fn()
+    times = []
+    with PeakMemory() as mem:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            times.append((time.perf_counter() - t0) * 1000)
+    times.sort()
+    return {
+        "median_ms": round(times[len(times) // 2], 3),
+        "p95_ms": round(times[min(len(times) - 1, int(len(times) * 0.95))], 3),
+        "min_ms": round(times[0], 3),
+        "runs": repeat,
+        "peak_rss_mb": mem.total_mb,
+    }
+
+
+@contextlib.contextmanager
+def quiet():
+    """El modelo escribe mucho (logs y pantalla): lo silenciamos mientras medimos."""
+    logger = logging.getLogger("animatch")
+    level = logger.level
+    logger.setLevel(logging.WARNING)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        logger.setLevel(level)
+
+
+def bench_train(model_mod, args):
+    timings = {}
+    with PeakMemory() as mem:
+        t0 = time.perf_counter()
+        with quiet():
+            timings = model_mod.train_model(engine=args.engine, workers=args.workers,
+                                            artifact_format=args.format, use_cache=False,
+                                            progress=lambda stage, _: mem.mark(stage))
+        total = time.perf_counter() - t0
+    return {
+        "total_s": round(total, 3),
+        "peak_rss_mb": mem.total_mb,
+        "stages": {
+            name: {"s": round(seconds, 3), "peak_rss_mb": mem.peaks.get(name)}
+            for name, seconds in timings.items()
+        },
+    }
+
+
+def bench_load(model_mod, args):
+    def load():
+        with quiet():
+            info = model_mod.read_model_info()
+            model_mod.load_model(info)
+            model_mod.load_neighbors(info)
+
+    def store_reload():
+        with quiet():
+            model_mod.MODEL_STORE.reload()
+
+    def dense_first_touch():
+        with quiet():
+            model = model_mod.MODEL_STORE.reload()
+            model.dense_filled()
+
+    return {
+        "load_model": timed(load, repeat=args.repeat),
+        "model_store_reload": timed(store_reload, repeat=args.repeat),
+        "dense_first_touch": timed(dense_first_touch, repeat=max(1, args.repeat // 5)),
+    }
+
+
+def sample_profiles(model, sizes, count, seed=0):
+    """Perfiles aleatorios de cada tamaño, con animes elegidos según su peso en el modelo."""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    ids = np.asarray(model.item_ids)
+    profiles = {}
+    for size in sizes:
+        size = min(size, len(ids))
+        profiles[size] = [
+            {int(a): float(rng.integers(1, 11)) for a in rng.choice(ids, size, replace=False)}
+            for _ in range(count)
+        ]
+    return profiles
+
+
+def bench_recommendations(model_mod, args):
+    with quiet():
+        model = model_mod.MODEL_STORE.get()
+    profiles = sample_profiles(model, args.sizes, args.repeat)
+    results = {}
+    for exact in (False, True):
+        label = "exact" if exact else "topk"
+        for size, plist in profiles.items():
+            it = itertools.cycle(plist)
+            with quiet():
+                results[f"{label}_{size}"] = timed(
+                    lambda: model_mod.get_recommendations(next(it), top_n=10, model=model, exact=exact),
+                    repeat=len(plist), warmup=1)
+
+    batch = [p for plist in profiles.values() for p in plist]
+    results["batch_topk"] = timed(
+        lambda: model_mod.get_recommendations_batch(batch, top_n=10, model=model), repeat=3)
+    results["batch_topk"]["profiles"] = len(batch)
+    return results
+
+
+def bench_similar(model_mod, args):
+    """
+    Animes similares (índice aproximado): recall@10 frente a la búsqueda exacta
+    con los mismos vectores, coincidencia con el top-10 de la columna de
+    corrMatrix y latencia por consulta (µs). Además, la misma medida en un
+    catálogo sintético grande (--ann-items vectores) para ver cómo escala.
+    """
+    import numpy as np
+    with quiet():
+        model = model_mod.MODEL_STORE.get()
+    if model.similar is None:
+        return {"skipped": "el modelo no tiene índice de similares"}
+    rng = np.random.default_rng(0)
+    index = model.similar
+    positions = rng.choice(len(index), min(args.repeat, len(index)), replace=False)
+    results = {"catalog": similar_recall(index, positions, k=10)}
+
+    # Coincidencia con los vecinos por correlación (lo que usa el modelo para recomendar)
+    values = model.values
+    col = {int(a): i for i, a in enumerate(model.item_ids)}
+    hits = total = 0
+    for pos in positions:
+        anime_id = int(index.item_ids[pos])
+        corr = values[:, col[anime_id]].copy()
+        corr[col[anime_id]] = np.nan
+        valid = np.flatnonzero(~np.isnan(corr))
+        if len(valid) < 10:
+            continue
+        truth = set(model.item_ids[valid[np.argsort(-corr[valid])[:10]]].tolist())
+        found = model_mod.similar_items(anime_id, k=10, model=model)["anime_id"]
+        hits += len(truth.intersection(found.tolist()))
+        total += 10
+    results["catalog"]["recall_vs_corr"] = round(hits / total, 3) if total else None
+
+    if args.ann_items:
+        vectors = clustered_vectors(args.ann_items, model_mod.EMBEDDING_DIM, rng)
+        t0 = time.perf_counter()
+        large = model_mod.SimilarityIndex.build(np.arange(len(vectors)), vectors)
+        build_s = time.perf_counter() - t0
+        positions = rng.choice(len(large), min(args.repeat, len(large)), replace=False)
+        results["synthetic"] = {"build_s": round(build_s, 2), **similar_recall(large, positions, k=10)}
+    return results
+
+
+def similar_recall(index, positions, k=10):
+    """recall@k de index.query frente a la búsqueda exacta y latencia (µs) de las dos"""
+    ann_us, exact_us, hits = [], [], 0
+    for pos in positions:
+        t0 = time.perf_counter()
+        found, _ = index.query(pos, k)
+        t1 = time.perf_counter()
+        truth, _ = index.query(pos, k, exact=True)
+        t2 = time.perf_counter()
+        ann_us.append((t1 - t0) * 1e6)
+        exact_us.append((t2 - t1) * 1e6)
+        hits += len(set(found.tolist()) & set(truth.tolist()))
+    return {
+        "items": len(index),
+        "queries": len(positions),
+        "recall_at_10": round(hits / (k * len(positions)), 3),
+        "ann_median_us": round(sorted(ann_us)[len(ann_us) // 2], 1),
+        "exact_median_us": round(sorted(exact_us)[len(exact_us) // 2], 1),
+    }
+
+
+def clustered_vectors(n, dim, rng, clusters=1000):
+    """Vectores normalizados agrupados alrededor de unos centros (como los de un catálogo real)"""
+    import numpy as np
+    centers = rng.standard_normal((clusters, dim))
+    vectors = centers[rng.integers(0, clusters, n)] + 0.5 * rng.standard_normal((n, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype("float32")
+
+
+def name_queries(api_mod, count, seed=0):
+    import random
+    rnd = random.Random(seed)
+    rows = api_mod.load_name_index().rows
+    picked = [rnd.choice(rows)["name"] for _ in range(count)] if rows else []
+    typo = lambda s: s[:len(s) // 2] + s[len(s) // 2 + 1:] if len(s) > 6 else s
+    return {
+        "exact": picked,
+        "substring": [n[len(n) // 4: len(n) // 4 + 5] for n in picked],
+        "typo": [typo(n) for n in picked],
+        "prefix": [n[:3] for n in picked],
+    }
+
+
+def bench_names(api_mod, args):
+    results = {"build_index": timed(lambda: _rebuild_name_index(api_mod), repeat=1)}
+    queries = name_queries(api_mod, args.repeat)
+    for kind, qs in queries.items():
+        if not qs:
+            continue
+        it = itertools.cycle(qs)
+        if kind == "prefix":
+            index = api_mod.load_name_index()
+            results[kind] = timed(lambda: index.search_prefix(next(it)), repeat=len(qs))
+        else:
+            results[kind] = timed(lambda: api_mod.resolve_name_to_id(next(it)), repeat=len(qs))
+    return results
+
+
+def _rebuild_name_index(api_mod):
+    api_mod.NAME_INDEX = None
+    api_mod.load_name_index()
+
+
+def bench_endpoints(api_mod, model_mod, args):
+    client = api_mod.app.test_client()
+    with quiet():
+        model = model_mod.MODEL_STORE.get()
+    profiles = sample_profiles(model, [5], args.repeat, seed=1)[5]
+    names = name_queries(api_mod, args.repeat)["prefix"] or ["a"]
+
+    def post_json(path, bodies):
+        it = itertools.cycle(bodies)
+
+        def call():
+            resp = client.post(path, json=next(it))
+            resp.get_data()
+            assert resp.status_code < 500, resp.get_data(as_text=True)[:200]
+        return call
+
+    def get(paths):
+        it = itertools.cycle(paths)
+        return lambda: client.get(next(it)).get_data()
+
+    as_json = [{str(k): v for k, v in p.items()} for p in profiles]
+    results = {}
+    with quiet():
+        results["obtener_recomendaciones"] = timed(post_json("/obtener-recomendaciones", as_json),
+                                                   repeat=len(as_json))
+        # Mismos perfiles otra vez: si la caché de recomendaciones está activa, son aciertos
+        results["obtener_recomendaciones_repetidas"] = timed(post_json("/obtener-recomendaciones", as_json),
+                                                             repeat=len(as_json))
+        results["obtener_recomendaciones_batch"] = timed(
+            post_json("/obtener-recomendaciones-batch", [{"profiles": as_json}]), repeat=3)
+        results["search_anime"] = timed(get([f"/search-anime?q={q}" for q in names]), repeat=len(names))
+        ids = [next(iter(p)) for p in profiles]
+        results["exists_anime"] = timed(get([f"/exists-anime/{a}" for a in ids]), repeat=len(ids))
+    return results
+
+
+# Se ejecuta en un intérprete nuevo: importar la API y precargar modelo y nombres
+STARTUP_SCRIPT = """
+import json, sys, time
+t0 = time.perf_counter()
+import api
+t1 = time.perf_counter()
+heavy = sorted(m for m in ("pandas", "numpy", "scipy") if m in sys.modules)
+api.preload()
+t2 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "warmup": t2 - t1, "heavy": heavy}))
+"""
+
+
+def bench_startup(args):
+    """Arranque en frío de la API: import (sin cargar nada) y precarga, en procesos nuevos."""
+    env = dict(os.environ, ANIMATCH_LOG_LEVEL="WARNING")
+    runs = []
+    for _ in range(max(1, min(5, args.repeat))):
+        out = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=os.path.join(BACKEND_DIR, "api"),
+                             env=env, capture_output=True, text=True, timeout=600, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    median = lambda key: sorted(r[key] for r in runs)[len(runs) // 2]
+    return {
+        "import_ms": round(median("import") * 1000, 1),
+        "warmup_ms": round(median("warmup") * 1000, 1),
+        "heavy_modules_on_import": runs[0]["heavy"],
+        "runs": len(runs),
+    }
+
+
+# DATOS DE LA EJECUCIÓN
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def dataset_info(data_dir):
+    info = {"dir": os.path.abspath(data_dir)}
+    for name in ("anime.csv", "rating.csv"):
+        path = os.path.join(data_dir, name)
+        if os.path.exists(path):
+            info[f"{name}_bytes"] = os.path.getsize(path)
+    return info
+
+
+def environment():
+    import numpy, pandas, scipy
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "scipy": scipy.__version__,
+    }
+
+
+def compare(current, baseline_path):
+    """Imprime, para cada medida común, el tiempo actual frente al de baseline."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nComparación con {baseline_path} (commit {baseline.get('meta', {}).get('commit')}):")
+    for path, now in _flatten_times(current["results"]):
+        before = dict(_flatten_times(baseline.get("results", {}))).get(path)
+        if before:
+            print(f"  {path:60s} {before:10.3f} -> {now:10.3f}  (x{now / before:.2f})")
+
+
+def _flatten_times(results, prefix=""):
+    for key, value in results.items():
+        if isinstance(value, dict):
+            for k in ("median_ms", "ann_median_us", "total_s", "s"):
+                if k in value:
+                    yield f"{prefix}{key}.{k}", value[k]
+            yield from _flatten_times(value, f"{prefix}{key}.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de AniMatch")
+    parser.add_argument("--data", required=True, help="directorio con anime.csv y rating.csv")
+    parser.add_argument("--out", help="fichero JSON de resultados (por defecto solo se imprime)")
+    parser.add_argument("--models", help="directorio de modelos (por defecto uno temporal)")
+    parser.add_argument("--skip-train", action="store_true",
+                        help="no entrena: usa el modelo que ya haya en --models")
+    parser.add_argument("--engine", choices=["sparse", "pandas"], default="sparse")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--format", choices=["memmap", "float16", "quant8", "pickle"], default="memmap",
+                        help="formato de la matriz densa")
+    parser.add_argument("--repeat", type=int, default=50, help="repeticiones de las medidas rápidas")
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=PROFILE_SIZES,
+                        help="tamaños de perfil, separados por comas")
+    parser.add_argument("--ann-items", type=int, default=100000,
+                        help="vectores del catálogo sintético para medir similares (0: no se mide)")
+    parser.add_argument("--compare", metavar="JSON", help="resultados anteriores con los que comparar")
+    args = parser.parse_args()
+
+    if args.skip_train and not args.models:
+        parser.error("--skip-train necesita --models")
+    models_dir = args.models or tempfile.mkdtemp(prefix="animatch_bench_")
+
+    # Rutas antes de importar el modelo (las lee al importarse)
+    os.environ["ANIMATCH_DATA_DIR"] = os.path.abspath(args.data)
+    os.environ["ANIMATCH_MODELS_DIR"] = os.path.abspath(models_dir)
+    sys.path.insert(0, BACKEND_DIR)
+    sys.path.insert(0, os.path.join(BACKEND_DIR, "api"))
+
+    started = time.time()
+    results = {}
+    try:
+        with quiet():
+            import model.model as model_mod
+        if not args.skip_train:
+            print("Entrenando...")
+            results["train"] = bench_train(model_mod, args)
+        print("Cargando modelo...")
+        results["load"] = bench_load(model_mod, args)
+        print("Recomendaciones...")
+        results["recommendations"] = bench_recommendations(model_mod, args)
+        print("Similares...")
+        results["similar"] = bench_similar(model_mod, args)
+
+        with quiet():
+            import api as api_mod
+        print("Nombres...")
+        results["names"] = bench_names(api_mod, args)
+        print("Endpoints...")
+        results["endpoints"] = bench_endpoints(api_mod, model_mod, args)
+        print("Arranque...")
+        results["startup"] = bench_startup(args)
+    finally:
+        if not args.models:
+            shutil.rmtree(models_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+            "seconds": round(time.time() - started, 1),
+            "args": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+            "data": dataset_info(args.data),
+            "env": environment(),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+        print(f"Resultados guardados en {args.out}")
+    else:
+        print(text)
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
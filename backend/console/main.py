@@ -1,4 +1,5 @@
 import os
+import time
 import requests
 
 BASE_URL = os.environ.get("ANIMATCH_API", "http://127.0.0.1:5000")
@@ -86,6 +87,30 @@ def mostrar_ejemplos():
     print("\n(Puedes escribir nombres o IDs.)\n")
 
 
+def elegir_sugerencia(texto):
+    """
+    Busca el nombre en /search-anime y deja elegir entre los más populares.
+    Devuelve el id elegido, el texto tal cual (si no hay sugerencias o se pulsa
+    Enter) o None para volver a escribir el nombre.
+    """
+    status, data = pedir_json("GET", f"/search-anime?q={requests.utils.quote(texto)}&limit=5")
+    if status != 200 or not data:
+        return texto
+    for cand in data:
+        if cand.get("name", "").lower() == texto.lower():
+            return int(cand["id"])  # coincide exacto: no preguntamos
+
+    print("¿Te refieres a...?")
+    for i, cand in enumerate(data, start=1):
+        print(f"   {i}. [{cand.get('id')}] {cand.get('name')}")
+    eleccion = input("Elige número, Enter para dejarlo así o 'n' para escribir otro: ").strip().lower()
+    if not eleccion:
+        return texto
+    if eleccion.isdigit() and 1 <= int(eleccion) <= len(data):
+        return int(data[int(eleccion) - 1]["id"])
+    return None
+
+
 def pedir_par_entrada(idx: int):
     """Pide un anime (por ID o nombre) y una nota del 1 al 10."""
     while True:
@@ -101,7 +126,9 @@ def pedir_par_entrada(idx: int):
             clave = aid
             break
         except ValueError:
-            clave = raw
+            clave = elegir_sugerencia(raw)
+            if clave is None:
+                continue
             break
 
     while True:
@@ -185,11 +212,13 @@ def pedir_recomendaciones():
             score = f"{float(score):.2f}"
         except Exception:
             score = str(score)
-        print(f"{aid:>8}  {score:>7}  {name}")
+        # Las que no salen del modelo (perfil poco conocido) son populares de géneros parecidos
+        extra = "  (popular)" if rec.get("source") == "fallback" else ""
+        print(f"{aid:>8}  {score:>7}  {name}{extra}")
 
 
 def reentrenar_modelo():
-    """Solo para admin: reentrena el modelo."""
+    """Solo para admin: lanza el reentrenamiento y espera a que termine."""
     if USER_ROLE != "admin":
         print("Solo los administradores pueden hacer esto.")
         return
@@ -197,13 +226,11 @@ def reentrenar_modelo():
     print("\n--- Reentrenar modelo (admin) ---")
     pw = input("Contraseña de admin: ").strip()
 
-    # Timeout largo (15 minutos)
-    LONG_TIMEOUT = 15 * 60
     body = {"username": USERNAME, "password": pw}
-    status, data = pedir_json("POST", "/retrain", body, timeout=LONG_TIMEOUT)
+    status, data = pedir_json("POST", "/retrain", body)
 
-    if status == 200:
-        print("Modelo reentrenado correctamente.")
+    if status == 202:
+        seguir_reentrenamiento(data.get("job_id"))
     elif status == 403:
         print("No autorizado o contraseña incorrecta.")
     elif status == 409:
@@ -214,6 +241,30 @@ def reentrenar_modelo():
         print(data or {"error": "No se pudo reentrenar el modelo."})
 
 
+def seguir_reentrenamiento(job_id, intervalo=2):
+    """Consulta el estado del reentrenamiento hasta que termina (la API sigue sirviendo mientras)."""
+    print(f"Reentrenamiento en segundo plano (job {job_id}). Puedes pulsar Ctrl+C para dejar de esperar.")
+    ultima_etapa = None
+    try:
+        while True:
+            status, data = pedir_json("GET", f"/retrain/{job_id}")
+            if status != 200 or not data:
+                print(data or {"error": "No se pudo consultar el reentrenamiento."})
+                return
+            if data.get("status") == "done":
+                print(f"Modelo reentrenado correctamente (versión {data.get('model_version')}).")
+                return
+            if data.get("status") != "running":
+                print(f"El reentrenamiento ha fallado: {data.get('error') or data.get('status')}")
+                return
+            if data.get("stage") != ultima_etapa:
+                ultima_etapa = data.get("stage")
+                print(f"  etapa: {ultima_etapa} ({float(data.get('progress') or 0) * 100:.0f}%)")
+            time.sleep(intervalo)
+    except KeyboardInterrupt:
+        print("\nDejamos de esperar; el reentrenamiento sigue en el servidor.")
+
+
 # MENÚS
 def menu_acceso():
     """Opciones antes de iniciar sesión."""
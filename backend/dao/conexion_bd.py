@@ -1,23 +1,157 @@
+import os
+import threading
+import time
+
 import mysql.connector
+from mysql.connector import pooling
+
+from monitoring import REGISTRY
+
+# Configuración de la BD (variables de entorno). El usuario y la contraseña no
+# tienen valor por defecto: sin ellos la API no arranca (ver check_db_config)
+DB_CONFIG = {
+    "host": os.environ.get("ANIMATCH_DB_HOST", "localhost"),
+    "port": int(os.environ.get("ANIMATCH_DB_PORT", "3306")),
+    "user": os.environ.get("ANIMATCH_DB_USER"),
+    "password": os.environ.get("ANIMATCH_DB_PASSWORD"),
+    "database": os.environ.get("ANIMATCH_DB_NAME", "animatch_db"),
+    "connect_timeout": int(os.environ.get("ANIMATCH_DB_CONNECT_TIMEOUT", "5")),
+}
+REQUIRED_ENV = {"user": "ANIMATCH_DB_USER", "password": "ANIMATCH_DB_PASSWORD"}
+POOL_SIZE = int(os.environ.get("ANIMATCH_DB_POOL_SIZE", "5"))        # conexiones abiertas por proceso
+POOL_TIMEOUT = float(os.environ.get("ANIMATCH_DB_POOL_TIMEOUT", "5"))  # segundos esperando una libre
+
+POOL_WAIT_SECONDS = REGISTRY.histogram("animatch_db_pool_wait_seconds",
+                                       "Tiempo esperando una conexión libre del pool")
+POOL_TIMEOUTS = REGISTRY.counter("animatch_db_pool_timeouts_total",
+                                 "Peticiones que no han conseguido conexión del pool a tiempo")
+
+_POOL = None
+_SLOTS = None   # semáforo con las conexiones libres del pool
+_POOL_LOCK = threading.Lock()
+
+
+def check_db_config():
+    """
+    Comprueba que están las variables obligatorias de la BD; se llama al arrancar la API.
+    RuntimeError si falta alguna.
+    """
+    missing = [env for key, env in REQUIRED_ENV.items() if not DB_CONFIG[key]]
+    if missing:
+        raise RuntimeError("Falta la configuración de la BD: define " + ", ".join(missing))
+
+
+def get_pool():
+    """
+    Pool de conexiones del proceso (se crea la primera vez que se usa) y el
+    semáforo que cuenta sus conexiones libres.
+    """
+    global _POOL, _SLOTS
+    with _POOL_LOCK:
+        if _POOL is None:
+            check_db_config()
+            _POOL = pooling.MySQLConnectionPool(pool_name="animatch", pool_size=POOL_SIZE,
+                                                pool_reset_session=True, **DB_CONFIG)
+            _SLOTS = threading.BoundedSemaphore(POOL_SIZE)
+        return _POOL, _SLOTS
+
+
+def reset_pool():
+    """
+    Olvida el pool heredado tras un fork (gunicorn post_fork): las conexiones
+    del padre no se pueden compartir, el worker creará el suyo al primer uso.
+    """
+    global _POOL, _SLOTS, _POOL_LOCK
+    _POOL = _SLOTS = None
+    _POOL_LOCK = threading.Lock()
+
+
+def close_pool():
+    """
+    Suelta el pool (al parar el proceso). mysql.connector no tiene un close()
+    público: sin referencias, sus conexiones libres se cierran al recogerse, y
+    las prestadas vuelven a él al cerrarlas y se cierran igual.
+    """
+    global _POOL, _SLOTS
+    with _POOL_LOCK:
+        _POOL = _SLOTS = None
+
+
+def get_pooled_connection(timeout=None):
+    """
+    Pide una conexión al pool. Si están todas ocupadas espera (hasta timeout,
+    por defecto POOL_TIMEOUT) en lugar de abrir más: así una ráfaga no agota
+    las conexiones de MySQL.
+    La espera es un solo acquire del semáforo, que se despierta en cuanto
+    otra petición devuelve la suya. PoolError si no queda ninguna a tiempo.
+    Devuelve (conexión, release): release() se llama después de conn.close().
+    """
+    timeout = POOL_TIMEOUT if timeout is None else timeout
+    pool, slots = get_pool()
+    start = time.monotonic()
+    if not slots.acquire(timeout=timeout):
+        POOL_TIMEOUTS.inc()
+        raise pooling.PoolError(f"Ninguna conexión libre en el pool tras {timeout}s")
+    try:
+        conn = pool.get_connection()
+    except BaseException:
+        slots.release()
+        raise
+    POOL_WAIT_SECONDS.observe(time.monotonic() - start)
+    return conn, slots.release
+
 
 class Conexion:
-    def __init__(self, user = "root", password = "root"):
-        self.SetConn(mysql.connector.connect(
-            host="localhost",
-            user=user,
-            password=password,
-            database="animatch_db") )
-        
-        self.SetCursor(self.__conn.cursor()) 
+    """
+    Conexión a la BD sacada del pool. Al cerrarla vuelve al pool.
+    Se puede usar como context manager:  with Conexion() as conn: ...
+    Si se pasan user/password se abre una conexión propia (fuera del pool).
+    """
+
+    def __init__(self, user = None, password = None):
+        self.__release = None  # devuelve el hueco del pool (solo si la conexión es del pool)
+        if user is None and password is None:
+            conn, self.__release = get_pooled_connection()
+            self.SetConn(conn)
+        else:
+            config = dict(DB_CONFIG)
+            config.update(user=user or DB_CONFIG["user"], password=password or DB_CONFIG["password"])
+            self.SetConn(mysql.connector.connect(**config))
+
+        self.SetCursor(None)  # el cursor se abre solo si alguien lo pide
 
     def GetConn(self):
         return self.__conn
-    
+
     def SetConn(self, conn):
         self.__conn = conn
-        
+
     def GetCursor(self):
+        if self.__cursor is None:
+            self.__cursor = self.__conn.cursor()
         return self.__cursor
-    
+
     def SetCursor(self, cursor):
-        self.__cursor = cursor 
+        self.__cursor = cursor
+
+    def Close(self):
+        """Cierra el cursor (si lo hay) y devuelve la conexión al pool."""
+        if self.__conn is None:
+            return  # ya estaba cerrada
+        try:
+            if self.__cursor is not None:
+                self.__cursor.close()
+        finally:
+            conn, self.__conn, self.__cursor = self.__conn, None, None
+            release, self.__release = self.__release, None
+            try:
+                conn.close()
+            finally:
+                if release is not None:
+                    release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.Close()
@@ -1,29 +1,68 @@
+import logging
+from contextlib import contextmanager
+
 import mysql.connector
 
+from dao.conexion_bd import Conexion
+from monitoring import REGISTRY
+
+log = logging.getLogger("animatch.dao")
+
+# Métricas de las consultas (se exportan en /metrics de la API)
+DB_SECONDS = REGISTRY.histogram("animatch_db_query_seconds",
+                                "Duración de cada operación del DAO (incluye pedir la conexión al pool)", ["op"])
+DB_ERRORS = REGISTRY.counter("animatch_db_errors_total", "Errores de MySQL por operación del DAO", ["op"])
+
+
+@contextmanager
+def usar_conexion(conn=None):
+    """
+    Conexión para una operación del DAO: la que nos pasan (y no la cerramos)
+    o una prestada del pool que se devuelve al terminar. Pedirla puede fallar
+    (PoolError o error al conectar, ambos mysql.connector.Error): se usa dentro
+    del try de la operación para que error_bd lo registre como los demás.
+    """
+    if conn is not None:
+        yield conn
+    else:
+        with Conexion() as prestada:
+            yield prestada
+
+
+def error_bd(op, err):
+    """Cuenta y registra un error de MySQL de una operación del DAO"""
+    DB_ERRORS.inc(op=op)
+    log.error("Error en la BD", extra={"op": op, "error": str(err)})
+
+
 class AnimatchDAO:
 
     @staticmethod
-    def add_user(username, password, conn, role='user'):
+    @DB_SECONDS.time(op="add_user")
+    def add_user(username, password, conn=None, role='user'):
         sql = "INSERT INTO users (`user`, `password`, `role`) VALUES (%s, %s, %s)"
-        cur = conn.GetConn().cursor()
         try:
-            cur.execute(sql, (username, password, role))
-            conn.GetConn().commit()
-            return True
+            with usar_conexion(conn) as conn:
+                cur = conn.GetConn().cursor()
+                try:
+                    cur.execute(sql, (username, password, role))
+                    conn.GetConn().commit()
+                    return True
+                finally:
+                    try:
+                        cur.close()
+                    except:
+                        pass
         except mysql.connector.IntegrityError:
             # duplicado (hemos puesto UNIQUE en 'user')
             return False
         except mysql.connector.Error as err:
-            print("Error add_user:", err)
+            error_bd("add_user", err)
             return False
-        finally:
-            try:
-                cur.close()
-            except:
-                pass
 
     @staticmethod
-    def get_user_by_username(username, conn):
+    @DB_SECONDS.time(op="get_user_by_username")
+    def get_user_by_username(username, conn=None):
         sql = """
             SELECT 
                 id_users       AS id,
@@ -34,22 +73,25 @@ class AnimatchDAO:
             WHERE `user` = %s
             LIMIT 1
         """
-        cur = conn.GetConn().cursor(dictionary=True)
         try:
-            cur.execute(sql, (username,))
-            row = cur.fetchone()  # dict o None
-            return row
+            with usar_conexion(conn) as conn:
+                cur = conn.GetConn().cursor(dictionary=True)
+                try:
+                    cur.execute(sql, (username,))
+                    row = cur.fetchone()  # dict o None
+                    return row
+                finally:
+                    try:
+                        cur.close()
+                    except:
+                        pass
         except mysql.connector.Error as err:
-            print("Error get_user_by_username:", err)
+            error_bd("get_user_by_username", err)
             return None
-        finally:
-            try:
-                cur.close()
-            except:
-                pass
 
     @staticmethod
-    def list_users(conn):
+    @DB_SECONDS.time(op="list_users")
+    def list_users(conn=None):
         sql = """
             SELECT 
                 id_users AS id,
@@ -58,15 +100,71 @@ class AnimatchDAO:
             FROM users
             ORDER BY id_users
         """
-        cur = conn.GetConn().cursor(dictionary=True)
         try:
-            cur.execute(sql)
-            return cur.fetchall()
+            with usar_conexion(conn) as conn:
+                cur = conn.GetConn().cursor(dictionary=True)
+                try:
+                    cur.execute(sql)
+                    return cur.fetchall()
+                finally:
+                    try:
+                        cur.close()
+                    except:
+                        pass
         except mysql.connector.Error as err:
-            print("Error list_users:", err)
+            error_bd("list_users", err)
             return []
-        finally:
-            try:
-                cur.close()
-            except:
-                pass
+
+    @staticmethod
+    @DB_SECONDS.time(op="upsert_ratings")
+    def upsert_ratings(user_id, ratings, conn=None):
+        """
+        Guarda (o actualiza) varias valoraciones de un usuario de una vez.
+        ratings: {anime_id: rating}. Devuelve True si se han guardado.
+        """
+        sql = """
+            INSERT INTO user_ratings (id_users, anime_id, rating)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE rating = VALUES(rating)
+        """
+        rows = [(int(user_id), int(aid), float(r)) for aid, r in ratings.items()]
+        if not rows:
+            return True
+        try:
+            with usar_conexion(conn) as conn:
+                cur = conn.GetConn().cursor()
+                try:
+                    cur.executemany(sql, rows)
+                    conn.GetConn().commit()
+                    return True
+                except mysql.connector.Error:
+                    conn.GetConn().rollback()
+                    raise
+                finally:
+                    try:
+                        cur.close()
+                    except:
+                        pass
+        except mysql.connector.Error as err:
+            error_bd("upsert_ratings", err)
+            return False
+
+    @staticmethod
+    @DB_SECONDS.time(op="get_ratings")
+    def get_ratings(user_id, conn=None):
+        """Valoraciones guardadas de un usuario: {anime_id: rating} (None si falla)"""
+        sql = "SELECT anime_id, rating FROM user_ratings WHERE id_users = %s"
+        try:
+            with usar_conexion(conn) as conn:
+                cur = conn.GetConn().cursor()
+                try:
+                    cur.execute(sql, (int(user_id),))
+                    return {int(aid): float(r) for aid, r in cur.fetchall()}
+                finally:
+                    try:
+                        cur.close()
+                    except:
+                        pass
+        except mysql.connector.Error as err:
+            error_bd("get_ratings", err)
+            return None
@@ -0,0 +1,123 @@
+import numpy as np
+import scipy.sparse as sp
+
+# Paràmetres per defecte de la factorització (ALS explícit)
+ALS_FACTORS = 32    # dimensions dels vectors d'usuari i d'item
+ALS_REG = 0.1       # regularització (multiplicada pel nombre de valoracions, ALS-WR)
+ALS_ITERS = 10      # iteracions (cada una resol usuaris i items)
+BIAS_SHRINK = 25    # valoracions "virtuals" a 0 en el biaix d'item (encongeix els poc valorats)
+
+
+class FactorModel:
+    """
+    Model de factorització: valoració(u, i) ~ mitjana + biaix(i) + x_u · y_i + b_u.
+    Només es guarden els items (factors float32, items x factors); un perfil
+    nou es "plega" al model resolent un mínim quadrats petit amb els items que
+    ha valorat (fold_in) i es puntua amb un sol producte matriu-vector.
+    """
+
+    def __init__(self, item_ids, item_factors, item_bias, global_mean, reg=ALS_REG):
+        self.item_ids = item_ids            # anime_id de cada fila (ordenats)
+        self.item_factors = item_factors    # (items x factors) float32
+        self.item_bias = item_bias          # (items,) float32
+        self.global_mean = float(global_mean)
+        self.reg = float(reg)
+
+    def __len__(self):
+        return len(self.item_ids)
+
+    @property
+    def factors(self):
+        return self.item_factors.shape[1]
+
+    def fold_in(self, positions, ratings):
+        """
+        Vector de l'usuari (factors + biaix al final) que millor explica les
+        valoracions ratings dels items de positions, amb els items fixos.
+        """
+        Y = _with_ones(self.item_factors[positions].astype("float64"))
+        residual = np.asarray(ratings, dtype="float64") - self.global_mean - self.item_bias[positions]
+        return _solve(Y, residual, self.reg)
+
+    def predict(self, user):
+        """Valoració prevista de tots els items per al vector d'usuari de fold_in"""
+        return (self.item_factors @ user[:-1].astype("float32")) + self.item_bias + (self.global_mean + user[-1])
+
+    def predict_many(self, users):
+        """predict per a molts usuaris alhora (files de users): matriu usuaris x items"""
+        users = np.asarray(users, dtype="float32")
+        return (users[:, :-1] @ self.item_factors.T) + self.item_bias + (self.global_mean + users[:, -1:])
+
+    def save(self, path):
+        np.savez(path, item_ids=self.item_ids, item_factors=self.item_factors, item_bias=self.item_bias,
+                 global_mean=self.global_mean, reg=self.reg)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data["item_ids"], data["item_factors"], data["item_bias"],
+                   data["global_mean"], data["reg"])
+
+
+def train_als(R, item_ids, factors=ALS_FACTORS, reg=ALS_REG, iters=ALS_ITERS, seed=0, progress=None):
+    """
+    ALS explícit sobre R (usuaris x animes, dispersa): alterna resoldre tots
+    els usuaris amb els items fixos i tots els items amb els usuaris fixos.
+    Cada usuari té també un biaix (una columna d'uns als factors d'item); el
+    biaix de cada item es calcula abans (mitjana regularitzada dels residus).
+    progress: funció progress(iteració, rmse) que es crida després de cada iteració
+    Retorna un FactorModel.
+    """
+    R_users = sp.csr_matrix(R, dtype="float64")
+    R_items = sp.csc_matrix(R_users)
+    global_mean = R_users.data.mean() if R_users.nnz else 0.0
+
+    # Biaix d'item: mitjana dels residus, encongida cap a 0 si té poques valoracions
+    n_users, n_items = R_users.shape
+    sums = np.bincount(R_users.indices, weights=R_users.data - global_mean, minlength=n_items)
+    item_bias = sums / (np.diff(R_items.indptr) + BIAS_SHRINK)
+
+    rng = np.random.default_rng(seed)
+    Y = rng.normal(0, 0.1, (n_items, factors))
+    X = np.zeros((n_users, factors + 1))  # factors + biaix de l'usuari
+    for it in range(iters):
+        Y1 = _with_ones(Y)
+        for u in range(n_users):
+            start, end = R_users.indptr[u], R_users.indptr[u + 1]
+            if start < end:
+                cols = R_users.indices[start:end]
+                residual = R_users.data[start:end] - global_mean - item_bias[cols]
+                X[u] = _solve(Y1[cols], residual, reg)
+        for i in range(n_items):
+            start, end = R_items.indptr[i], R_items.indptr[i + 1]
+            if start < end:
+                rows = R_items.indices[start:end]
+                residual = R_items.data[start:end] - global_mean - item_bias[i] - X[rows, -1]
+                Y[i] = _solve(X[rows, :-1], residual, reg)
+        if progress is not None:
+            progress(it, _train_rmse(R_users, X, Y, item_bias, global_mean))
+
+    return FactorModel(np.asarray(item_ids), Y.astype("float32"), item_bias.astype("float32"),
+                       global_mean, reg)
+
+
+def _with_ones(Y):
+    return np.hstack([Y, np.ones((len(Y), 1))])
+
+
+def _solve(A, b, reg):
+    """Mínims quadrats regularitzats (A^T A + reg * n * I) x = A^T b"""
+    gram = A.T @ A
+    gram[np.diag_indices_from(gram)] += reg * len(b)
+    return np.linalg.solve(gram, A.T @ b)
+
+
+def _train_rmse(R_users, X, Y, item_bias, global_mean, chunk=1_000_000):
+    """RMSE sobre les valoracions d'entrenament (per trossos, per no duplicar R per factors)"""
+    rows = np.repeat(np.arange(R_users.shape[0]), np.diff(R_users.indptr))
+    total = 0.0
+    for start in range(0, R_users.nnz, chunk):
+        r, c = rows[start:start + chunk], R_users.indices[start:start + chunk]
+        pred = global_mean + item_bias[c] + X[r, -1] + np.einsum("ij,ij->i", X[r, :-1], Y[c])
+        total += float(np.sum((R_users.data[start:start + chunk] - pred) ** 2))
+    return float(np.sqrt(total / max(R_users.nnz, 1)))
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from filters import ItemFilters
+from scoring import top_k
+
+# Motor de reserva: popularitat + gèneres (de anime.csv), per als perfils que
+# el model de valoracions no cobreix (animes massa nous o poc valorats)
+POPULARITY_WEIGHT = 0.3     # pes de la popularitat davant la similitud de gèneres
+RATING_NEUTRAL = 5.5        # les notes per sobre sumen al gust pels gèneres, les de sota en resten
+MEMBERS_QUANTILE = 0.75     # membres "de referència" de la nota ponderada (com la de IMDb)
+
+
+class FallbackIndex:
+    """
+    Tots els animes de anime.csv amb:
+    - genres: matriu dispersa multi-hot (animes x gèneres), CSR
+    - popularity: posició a la classificació per nota ponderada (nota
+      encongida cap a la mitjana si té pocs membres) com a percentil [0, 1]
+    - popular: posicions ordenades de més a menys popular
+    - types (codi dins type_names, -1 si no en té) i members, per als filtres
+      (ItemFilters; filters és None en els models d'abans, sense aquestes dades)
+    Un perfil es puntua amb un producte matriu-vector: similitud cosinus entre
+    els gèneres de cada anime i els del perfil, barrejada amb la popularitat.
+    """
+
+    def __init__(self, item_ids, genre_names, indptr, indices, popularity, popular,
+                 type_names=None, types=None, members=None):
+        self.item_ids = item_ids            # anime_id de cada fila (ordenats)
+        self.genre_names = genre_names
+        self.genres = sp.csr_matrix((np.ones(len(indices), dtype="float32"), indices, indptr),
+                                    shape=(len(item_ids), len(genre_names)))
+        norms = np.sqrt(np.diff(indptr)).astype("float32")
+        self._normalized = sp.diags(np.divide(1, norms, out=np.zeros_like(norms), where=norms > 0)) @ self.genres
+        self.popularity = popularity        # (animes,) float32
+        self.popular = popular              # posicions, de més a menys popular
+        self.type_names = type_names
+        self.types = types
+        self.members = members
+        self.filters = ItemFilters(item_ids, self) if types is not None else None
+
+    @classmethod
+    def build(cls, anime):
+        """anime: DataFrame de anime.csv (anime_id, genre, type, rating, members)"""
+        anime = anime.drop_duplicates("anime_id").sort_values("anime_id")
+        genre_lists = [[g.strip() for g in str(text).split(",") if g.strip()] if pd.notna(text) else []
+                       for text in anime["genre"]]
+        genre_names = np.array(sorted({g for genres in genre_lists for g in genres}), dtype="U")
+        column = {g: c for c, g in enumerate(genre_names)}
+        indptr = np.concatenate([[0], np.cumsum([len(genres) for genres in genre_lists])]).astype("int64")
+        indices = np.array([column[g] for genres in genre_lists for g in sorted(genres)], dtype="int32")
+
+        type_names, types = np.unique(anime["type"].fillna("").to_numpy(dtype="U"), return_inverse=True)
+        types = types.astype("int16")
+        if "" in type_names:  # sense tipus: no surt amb cap filtre de tipus
+            empty = int(np.flatnonzero(type_names == "")[0])
+            types = np.where(types == empty, -1, types - (types > empty)).astype("int16")
+            type_names = type_names[type_names != ""]
+
+        members = anime["members"].fillna(0).to_numpy(dtype="float64")
+        rating = anime["rating"].to_numpy(dtype="float64")
+        mean = np.nanmean(rating) if np.isfinite(rating).any() else 0.0
+        m = max(float(np.quantile(members, MEMBERS_QUANTILE)), 1.0) if len(members) else 1.0
+        weighted = (members * np.nan_to_num(rating, nan=mean) + m * mean) / (members + m)
+        popular = np.lexsort((-members, -weighted))
+        popularity = np.empty(len(popular), dtype="float32")
+        popularity[popular] = 1 - np.arange(len(popular)) / max(len(popular) - 1, 1)
+        return cls(anime["anime_id"].to_numpy(dtype="int64"), genre_names, indptr, indices, popularity, popular,
+                   type_names, types, members.astype("int64"))
+
+    def __len__(self):
+        return len(self.item_ids)
+
+    def recommend(self, myRatings, top_n=10, exclude=(), allowed=None):
+        """
+        Els top_n animes per al perfil {anime_id: rating} segons els gèneres
+        que hi agraden i la popularitat (només popularitat si el perfil no té
+        cap anime amb gèneres coneguts). No inclou els animes del perfil ni
+        els d'exclude; allowed: màscara dels items que es poden recomanar
+        (de self.filters). Retorna (ids, scores) amb scores dins [0, 1].
+        """
+        excluded = np.concatenate([np.fromiter((int(a) for a in myRatings), dtype="int64", count=len(myRatings)),
+                                   np.asarray(list(exclude), dtype="int64")])
+        pos = np.searchsorted(self.item_ids, excluded)
+        found = pos < len(self.item_ids)
+        found[found] = self.item_ids[pos[found]] == excluded[found]
+        rated = pos[:len(myRatings)][found[:len(myRatings)]]
+        weights = np.fromiter(myRatings.values(), dtype="float64", count=len(myRatings))[found[:len(myRatings)]]
+
+        taste = self._normalized[rated].T @ (weights - RATING_NEUTRAL) if rated.size else np.zeros(0)
+        norm = np.linalg.norm(taste)
+        candidates = np.ones(len(self.item_ids), dtype=bool)
+        candidates[pos[found]] = False
+        if allowed is not None:
+            candidates &= allowed
+        if not norm > 0:
+            return self._most_popular(candidates, top_n)
+
+        similarity = self._normalized @ (taste / norm)  # cosinus dins [-1, 1]
+        scores = (1 - POPULARITY_WEIGHT) * (similarity + 1) / 2 + POPULARITY_WEIGHT * self.popularity
+        return top_k(scores, candidates, self.item_ids, top_n)
+
+    def _most_popular(self, candidates, top_n):
+        """Els top_n candidats més populars (recorre l'ordre precalculat, sense puntuar)"""
+        chosen = self.popular[candidates[self.popular]][:max(top_n, 0)]
+        return self.item_ids[chosen], self.popularity[chosen].astype("float64")
+
+    def save(self, path):
+        np.savez(path, item_ids=self.item_ids, genre_names=self.genre_names, indptr=self.genres.indptr,
+                 indices=self.genres.indices, popularity=self.popularity, popular=self.popular,
+                 type_names=self.type_names, types=self.types, members=self.members)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        extra = [data[k] if k in data else None for k in ("type_names", "types", "members")]
+        return cls(data["item_ids"], data["genre_names"], data["indptr"], data["indices"],
+                   data["popularity"], data["popular"], *extra)
@@ -0,0 +1,63 @@
+import numpy as np
+
+
+class ItemFilters:
+    """
+    Màscares booleanes precalculades per atribut sobre un índex d'items
+    (item_ids ordenats), a partir de les metadades del catàleg (FallbackIndex):
+    una fila per gènere, una per tipus (TV, Movie, ...) i els membres.
+    mask() combina les que demana una petició amb operacions vectoritzades
+    (sense recórrer items), i el resultat es passa al top-K com a candidats.
+    Els items que no són al catàleg no tenen cap gènere ni tipus i 0 membres.
+    """
+
+    def __init__(self, item_ids, catalog):
+        item_ids = np.asarray(item_ids, dtype="int64")
+        pos = np.clip(np.searchsorted(catalog.item_ids, item_ids), 0, max(len(catalog) - 1, 0))
+        found = catalog.item_ids[pos] == item_ids if len(catalog) else np.zeros(len(item_ids), dtype=bool)
+        rows = pos[found]
+
+        self.genre_names = [str(g) for g in catalog.genre_names]
+        self.genre_masks = np.zeros((len(self.genre_names), len(item_ids)), dtype=bool)
+        self.genre_masks[:, found] = catalog.genres[rows].T.toarray() > 0
+
+        self.type_names = [str(t) for t in catalog.type_names]
+        codes = np.full(len(item_ids), -1, dtype="int16")
+        codes[found] = catalog.types[rows]
+        self.type_masks = np.stack([codes == c for c in range(len(self.type_names))]) \
+            if self.type_names else np.zeros((0, len(item_ids)), dtype=bool)
+
+        self.members = np.zeros(len(item_ids), dtype="int64")
+        self.members[found] = catalog.members[rows]
+
+    def mask(self, exclude_genres=None, types=None, min_members=None):
+        """
+        Items que compleixen tots els filtres: cap dels gèneres exclude_genres,
+        un dels tipus types i almenys min_members membres. Els noms no
+        distingeixen majúscules. None si no hi ha cap filtre.
+        ValueError si un gènere o un tipus no existeix al catàleg.
+        """
+        if not exclude_genres and not types and not min_members:
+            return None
+        allowed = np.ones(self.genre_masks.shape[1], dtype=bool)
+        if exclude_genres:
+            rows = _lookup(self.genre_names, exclude_genres, "Gènere")
+            allowed &= ~self.genre_masks[rows].any(axis=0)
+        if types:
+            rows = _lookup(self.type_names, types, "Tipus")
+            allowed &= self.type_masks[rows].any(axis=0)
+        if min_members:
+            allowed &= self.members >= min_members
+        return allowed
+
+
+def _lookup(names, wanted, what):
+    """Files de wanted dins names (sense distingir majúscules)"""
+    index = {name.lower(): i for i, name in enumerate(names)}
+    rows = []
+    for name in wanted:
+        row = index.get(str(name).strip().lower())
+        if row is None:
+            raise ValueError(f"{what} desconegut: {name} (valors possibles: {', '.join(names)})")
+        rows.append(row)
+    return rows
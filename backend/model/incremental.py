@@ -0,0 +1,207 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from sparse_corr import corr_from_stats, open_stats_files, pair_stats, rating_operands
+
+
+# ACTUALITZACIONS INCREMENTALS
+#
+# A stats_dir hi ha, per a cada parell d'items, les estadístiques suficients de
+# Pearson (n, sx, sxx, sxy; veure sparse_corr.STAT_NAMES) i la matriu de
+# valoracions amb què s'han calculat. Quan arriben valoracions noves només
+# canvien els parells d'items que han valorat els usuaris afectats, així que
+# n'hi ha prou amb restar la contribució antiga d'aquests usuaris, sumar-hi la
+# nova i recalcular la correlació d'aquells parells.
+#
+# La versió nova del model no copia la matriu: fa servir la de la versió
+# entrenada (que no es modifica mai) i un patch amb el bloc dels items afectats
+# (PatchedMatrix), acumulat amb els de les actualitzacions anteriors. Com que el
+# patch creix amb el quadrat dels items afectats, quan n'hi ha massa
+# (model.PATCH_MAX_FRACTION) update_model el consolida en una matriu sencera nova.
+
+
+def save_training_ratings(stats_dir, R, user_ids, item_ids):
+    """Guarda la matriu de valoracions (usuaris x items) que acompanya les estadístiques"""
+    R = sp.csr_matrix(R)
+    np.savez(os.path.join(stats_dir, "ratings.npz"), data=R.data, indices=R.indices,
+             indptr=R.indptr, user_ids=np.asarray(user_ids), item_ids=np.asarray(item_ids))
+
+
+def load_training_ratings(stats_dir):
+    data = np.load(os.path.join(stats_dir, "ratings.npz"))
+    user_ids, item_ids = data["user_ids"], data["item_ids"]
+    R = sp.csr_matrix((data["data"], data["indices"], data["indptr"]),
+                      shape=(len(user_ids), len(item_ids)))
+    return R, user_ids, item_ids
+
+
+def read_stats_meta(stats_dir):
+    """{"version": ..., "state": "ok" | "updating"} o None si no hi ha estadístiques"""
+    path = os.path.join(stats_dir, "meta.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_stats_meta(stats_dir, version, state="ok"):
+    path = os.path.join(stats_dir, "meta.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump({"version": version, "state": state}, f, indent=4)
+    os.replace(path + ".tmp", path)
+
+
+def prepare_ratings_delta(stats_dir, delta, min_periods):
+    """
+    Calcula l'efecte de noves valoracions (DataFrame user_id, anime_id, rating)
+    sense modificar stats_dir: això ho fa commit_ratings_delta amb el que
+    retorna com a pending (None si no hi ha res a canviar).
+    Una valoració d'un parell (usuari, anime) que ja existia la substitueix.
+    Els animes que no són al model s'ignoren (cal un reentrenament complet).
+    Retorna (posicions dels items afectats, correlacions noves entre ells, pending, resum)
+    """
+    R, user_ids, item_ids = load_training_ratings(stats_dir)
+
+    delta = delta[delta["rating"] != -1]
+    delta = delta.drop_duplicates(subset=["user_id", "anime_id"], keep="last")
+    item_pos = pd.Index(item_ids).get_indexer(delta["anime_id"])
+    known = item_pos >= 0
+    summary = {"rows": int(len(delta)), "ignored_unknown_anime": int((~known).sum())}
+    delta, item_pos = delta[known], item_pos[known]
+    if delta.empty:
+        summary.update(users=0, items=0)
+        return np.empty(0, dtype="int64"), np.empty((0, 0)), None, summary
+
+    # Usuaris afectats: files antigues (buides si l'usuari és nou) i files noves
+    users = pd.unique(delta["user_id"])
+    user_rows = pd.Index(user_ids).get_indexer(users)
+    existing = user_rows >= 0
+    old = sp.vstack([R[user_rows[existing]],
+                     sp.csr_matrix((int((~existing).sum()), R.shape[1]))]).tocsr()
+    local = np.concatenate([np.flatnonzero(existing), np.flatnonzero(~existing)])
+    order = np.empty_like(local)
+    order[local] = np.arange(len(local))  # fila local de cada usuari de `users`
+
+    old_coo = old.tocoo()
+    rows = np.concatenate([old_coo.row, order[pd.Index(users).get_indexer(delta["user_id"])]])
+    cols = np.concatenate([old_coo.col, item_pos])
+    vals = np.concatenate([old_coo.data, delta["rating"].to_numpy(dtype="float64")])
+    # Si un parell surt dues vegades, guanya la valoració nova (l'última)
+    pair = rows.astype("int64") * R.shape[1] + cols
+    _, last = np.unique(pair[::-1], return_index=True)
+    keep = len(pair) - 1 - last
+    new = sp.csr_matrix((vals[keep], (rows[keep], cols[keep])), shape=old.shape)
+
+    # Items tocats: només canvien els parells (i, j) amb i, j dins d'aquest conjunt
+    touched = np.union1d(old.indices, new.indices)
+    stats = open_stats_files(stats_dir)
+    block = np.ix_(touched, touched)
+    sums_new, sums_old = _pair_sums(new[:, touched]), _pair_sums(old[:, touched])
+    current = {name: values[block] + np.rint(sums_new[name] - sums_old[name]).astype("int32")
+               for name, values in stats.items()}
+
+    corr = corr_from_stats({
+        "n": current["n"], "sx": current["sx"], "sy": current["sx"].T,
+        "sxx": current["sxx"], "syy": current["sxx"].T, "sxy": current["sxy"],
+    }, min_periods)
+
+    # Matriu de valoracions actualitzada: fora les files antigues, dins les noves
+    keep_rows = np.ones(R.shape[0], dtype=bool)
+    keep_rows[user_rows[existing]] = False
+    R = sp.vstack([R[keep_rows], new]).tocsr()
+    user_ids = np.concatenate([user_ids[keep_rows], users[local]])
+    pending = {"touched": touched, "stats": current, "R": R, "user_ids": user_ids, "item_ids": item_ids}
+
+    summary.update(users=int(len(users)), new_users=int((~existing).sum()), items=int(len(touched)))
+    return touched, corr, pending, summary
+
+
+def commit_ratings_delta(stats_dir, pending):
+    """Escriu a stats_dir el bloc d'estadístiques i la matriu de valoracions de prepare_ratings_delta"""
+    if pending is None:
+        return
+    block = np.ix_(pending["touched"], pending["touched"])
+    for name, values in open_stats_files(stats_dir, mode="r+").items():
+        values[block] = pending["stats"][name]
+        values.flush()
+    save_training_ratings(stats_dir, pending["R"], pending["user_ids"], pending["item_ids"])
+
+
+# MATRIU AMB PATCH
+class PatchedMatrix:
+    """
+    Matriu d'una versió feta amb update_model: la de la versió entrenada
+    (base, memmap que no es modifica mai) amb el bloc positions x positions
+    substituït per block. Es comporta com un array (com BlockMatrix): shape,
+    m[:, columnes], m[fila, columnes], np.asarray(m).
+    """
+
+    def __init__(self, base, positions, block):
+        self.base = base
+        self.positions = np.asarray(positions, dtype="int64")   # ordenades
+        self.block = np.asarray(block, dtype="float32")
+        self.shape = tuple(base.shape)
+        self.dtype = np.dtype("float32")
+        self.ndim = 2
+        self._slot = np.full(self.shape[1], -1, dtype="int64")  # columna -> columna del bloc
+        self._slot[self.positions] = np.arange(len(self.positions))
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        rows, cols = key if isinstance(key, tuple) else (key, slice(None))
+        scalar_col = np.isscalar(cols)
+        cols = np.arange(self.shape[1])[cols] if isinstance(cols, slice) else np.atleast_1d(cols)
+        if isinstance(rows, slice):
+            # Un tram de files (p. ex. per escriure la matriu per blocs): només es llegeix aquest tram
+            out = np.array(self.base[rows][:, cols], dtype="float32")
+            row_slots = self._slot[np.arange(self.shape[0])[rows]]
+            col_slots = self._slot[cols]
+            r, c = np.flatnonzero(row_slots >= 0), np.flatnonzero(col_slots >= 0)
+            if r.size and c.size:
+                out[np.ix_(r, c)] = self.block[np.ix_(row_slots[r], col_slots[c])]
+            return out[:, 0] if scalar_col else out
+        out = np.array(self.base[:, cols], dtype="float32")
+        slots = self._slot[cols]
+        patched = np.flatnonzero(slots >= 0)
+        if patched.size:
+            out[np.ix_(self.positions, patched)] = self.block[:, slots[patched]]
+        values = out[rows]
+        return values[..., 0] if scalar_col else values
+
+    def __array__(self, dtype=None, copy=None):
+        values = self[:, :]
+        return values if dtype is None else values.astype(dtype)
+
+
+def patch_block(values, touched, corr, positions=None):
+    """
+    (posicions, bloc) del patch d'una versió nova: les posicions del patch
+    anterior (positions, o cap) més les touched, amb els valors actuals de
+    values (la matriu de la versió de partida) i les correlacions noves corr
+    al bloc touched x touched. Llegeix columnes senceres només d'aquests items.
+    """
+    positions = np.union1d(np.empty(0, dtype="int64") if positions is None else positions, touched)
+    block = np.array(values[:, positions], dtype="float32")[positions]
+    idx = np.searchsorted(positions, touched)
+    block[np.ix_(idx, idx)] = corr
+    return positions, block
+
+
+def save_patch(path, positions, block):
+    np.savez(path, positions=positions, block=block)
+
+
+def load_patch(path):
+    data = np.load(path)
+    return data["positions"], data["block"]
+
+
+def _pair_sums(X):
+    """Estadístiques de Pearson entre totes les columnes de X (usuaris x items)"""
+    return pair_stats(rating_operands(X), np.arange(X.shape[1]))
@@ -0,0 +1,78 @@
+import logging
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+
+# Tipus compactes per a rating.csv (per defecte pandas ho llegeix tot com int64)
+RATING_DTYPES = {"user_id": "int32", "anime_id": "int32", "rating": "int8"}
+CHUNK_ROWS = 1_000_000
+
+log = logging.getLogger("animatch.model")
+
+
+def load_ratings(csv_path, cache_dir, chunksize=CHUNK_ROWS):
+    """
+    Retorna les valoracions netes (sense -1 ni duplicats) com a DataFrame amb
+    tipus compactes. La primera vegada llegeix el CSV per trossos i deixa una
+    còpia binària per columnes (.npy) a cache_dir; les següents vegades, si el
+    CSV no ha canviat (mida i data de modificació), es llegeix directament
+    d'aquesta còpia sense parsejar res.
+    """
+    cache_path = os.path.join(cache_dir, f"ratings_{_cache_key(csv_path)}")
+    if os.path.isdir(cache_path):
+        log.info("Llegint valoracions de la cache", extra={"path": cache_path})
+        return _read_cache(cache_path)
+
+    log.info("Llegint valoracions del CSV", extra={"path": csv_path, "chunksize": chunksize})
+    users, animes, ratings = [], [], []
+    for chunk in pd.read_csv(csv_path, usecols=list(RATING_DTYPES), dtype=RATING_DTYPES,
+                             chunksize=chunksize):
+        chunk = chunk[chunk["rating"] != -1]
+        chunk = chunk.drop_duplicates(subset=["user_id", "anime_id"])
+        users.append(chunk["user_id"].to_numpy())
+        animes.append(chunk["anime_id"].to_numpy())
+        ratings.append(chunk["rating"].to_numpy())
+
+    user_id = np.concatenate(users) if users else np.empty(0, dtype="int32")
+    anime_id = np.concatenate(animes) if animes else np.empty(0, dtype="int32")
+    rating = np.concatenate(ratings) if ratings else np.empty(0, dtype="int8")
+
+    # Duplicats entre trossos: ens quedem amb la primera aparició (com drop_duplicates)
+    pair = (user_id.astype("int64") << 32) | anime_id.astype("int64")
+    _, first = np.unique(pair, return_index=True)
+    if len(first) < len(pair):
+        keep = np.sort(first)
+        user_id, anime_id, rating = user_id[keep], anime_id[keep], rating[keep]
+
+    columns = {"user_id": user_id, "anime_id": anime_id, "rating": rating}
+    _write_cache(cache_dir, cache_path, columns)
+    return pd.DataFrame(columns, copy=False)
+
+
+def _cache_key(csv_path):
+    st = os.stat(csv_path)
+    return f"{st.st_size}_{st.st_mtime_ns}"
+
+
+def _read_cache(cache_path):
+    columns = {name: np.load(os.path.join(cache_path, f"{name}.npy")) for name in RATING_DTYPES}
+    return pd.DataFrame(columns, copy=False)
+
+
+def _write_cache(cache_dir, cache_path, columns):
+    """Escriu la cache en un directori temporal i el reanomena (mai queda a mitges)"""
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for name, values in columns.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), values)
+
+    # Les caches d'altres versions del CSV ja no serveixen
+    for old in os.listdir(cache_dir):
+        if old.startswith("ratings_") and not old.endswith(".tmp"):
+            shutil.rmtree(os.path.join(cache_dir, old), ignore_errors=True)
+    os.replace(tmp_path, cache_path)
@@ -1,141 +1,832 @@
+import numpy as np
 import pandas as pd
+import argparse
 import json
+import logging
 import os
-
-# CONFIGURACIÓ DE RUTES (ajustada al teu projecte)
-
-# Aquesta línia obté el directori "backend/"
-BASE_DIR = os.path.dirname(os.path.dirname(__file__))
-
-# Carpeta de dades i models dins backend/
-DATA_DIR = os.path.join(BASE_DIR, "data")
-MODELS_DIR = os.path.join(BASE_DIR, "models")
-
-# Fitxers de model
-MODEL_FILE = os.path.join(MODELS_DIR, "model_v1.0.pkl")
-CURRENT_MODEL = os.path.join(MODELS_DIR, "current_model.json")
+import sys
+import time
+from contextlib import contextmanager
+
+# Els mòduls germans (scoring, ...) s'importen igual com a script o des de l'API
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+# Rutes (DATA_DIR, MODELS_DIR, fitxers, ...): veure paths.py
+from paths import (ANIME_CSV, BASE_DIR, CACHE_DIR, CURRENT_MODEL, DATA_DIR, MODELS_DIR,
+                   RATING_CSV, STAGE_CACHE_DIR, STATS_DIR, VERSIONS_DIR)
+sys.path.append(os.path.abspath(BASE_DIR))  # monitoring (compartit amb l'API)
+from monitoring import REGISTRY, setup_logging
+from scoring import score_batch, score_profile, score_profile_factors, score_profile_topk
+from neighbors import NeighborIndex, build_topk_index, replace_columns
+from incremental import (PatchedMatrix, commit_ratings_delta, load_patch, patch_block, prepare_ratings_delta,
+                         read_stats_meta, save_patch, save_training_ratings, write_stats_meta)
+from ingest import load_ratings
+from sparse_corr import build_rating_matrix, pearson_corr_parallel, pearson_corr_sparse
+from model_store import ModelStore
+from similarity import SimilarityIndex, item_vectors, normalize_rows
+from als import ALS_FACTORS, ALS_ITERS, ALS_REG, FactorModel, train_als
+from quantized import BlockMatrix, save_matrix_quantized
+from registry import ModelRegistry, data_fingerprint
+from pipeline import StageCache, csv_key, filter_items, filter_users, ratings_frame, ratings_outputs
+from fallback import FallbackIndex
 
 # PARÀMETRES DE FILTRE
 MIN_RATINGS_ITEM = 100      # mínim de valoracions per anime
 MIN_RATINGS_USER = 5        # mínim de valoracions per usuari
 MIN_PERIODS_CORR = 100      # mínim d’usuaris comuns per calcular correlació
+MAX_USER_QUANTILE = 0.99    # es treuen els usuaris amb més valoracions que aquest percentil
+TOPK_NEIGHBORS = 100        # veïns que es guarden per anime a l'índex compacte
+EMBEDDING_DIM = 64          # dimensions dels vectors d'item de l'índex de similars
+FALLBACK_MIN_COVERAGE = 0.5 # per sota d'aquesta fracció del perfil dins el model es barreja el motor de reserva
+PATCH_MAX_FRACTION = 0.25   # update_model: amb més animes al patch que aquesta fracció es consolida la matriu
+
+# Tipus de model: "corr" (correlacions de Pearson entre animes) o "als"
+# (factorització de la matriu de valoracions); es guarda a current_model.json
+MODEL_TYPES = ("corr", "als")
+
+# Format de la matriu densa: "memmap" (float32 en cru, compartit entre processos),
+# "float16" (igual, la meitat de mida), "quant8" (int8 per blocs comprimits amb
+# zstd/zlib, es descomprimeixen sota demanda) o "pickle"
+ARTIFACT_FORMAT = "memmap"
+ARTIFACT_FORMATS = ("memmap", "float16", "quant8", "pickle")
+
+log = logging.getLogger("animatch.model")
+
+# Mètriques (s'exporten a /metrics de l'API)
+TRAIN_STAGE_SECONDS = REGISTRY.histogram("animatch_train_stage_seconds",
+                                         "Durada de cada etapa de l'entrenament", ["stage"])
+RECOMMEND_SECONDS = REGISTRY.histogram("animatch_recommend_seconds",
+                                       "Temps de puntuar un perfil (topk/exact/als), un lot sencer (batch), "
+                                       "la part del motor de reserva (fallback) "
+                                       "o de buscar els similars d'un anime (similar)",
+                                       ["path"])
+RECOMMEND_EMPTY = REGISTRY.counter("animatch_recommend_empty_total",
+                                   "Perfils sense cap candidat similar")
+RECOMMEND_FALLBACK = REGISTRY.counter("animatch_recommend_fallback_total",
+                                      "Perfils completats amb el motor de reserva (popularitat i gèneres)")
 
 
 # ENTRENAR ALGORITME
-def train_model():
-    """Llegeix els CSV, aplica filtres, calcula correlacions i guarda el model"""
-
-    print("Llegint dades...")
-    ratings = pd.read_csv(os.path.join(DATA_DIR, "rating.csv"))
-    anime = pd.read_csv(os.path.join(DATA_DIR, "anime.csv"))
-
-    # Neteja bàsica
-    print("Netejant dades...")
-    ratings = ratings[ratings["rating"] != -1]
-    ratings = ratings.drop_duplicates(subset=["user_id", "anime_id"])
-
-    # Filtres d'animes
-    print(f"Filtres: animes amb > {MIN_RATINGS_ITEM} valoracions...")
-    counts_per_anime = ratings["anime_id"].value_counts()
-    valid_animes = counts_per_anime[counts_per_anime >= MIN_RATINGS_ITEM].index
-    df_filt = ratings[ratings["anime_id"].isin(valid_animes)].copy()
-
-    print("Animes abans del filtre:", ratings["anime_id"].nunique())
-    print("Animes despres del filtre:", df_filt["anime_id"].nunique())
-    print(f"Files totals despres del filtre: {len(df_filt)}")
-
-    # Filtres d’usuaris (mínim)
-    print(f"Filtres: usuaris amb > {MIN_RATINGS_USER} valoracions...")
-    counts_user = df_filt["user_id"].value_counts()
-    valid_users = counts_user[counts_user >= MIN_RATINGS_USER].index
-    df_filt = df_filt[df_filt["user_id"].isin(valid_users)].copy()
-
-    # Filtres d’usuaris (màxim = p99)
-    counts_user_after = df_filt["user_id"].value_counts()
-    max_ratings_user = int(counts_user_after.quantile(0.99)) if not counts_user_after.empty else 999999
-    valid_users = counts_user_after[
-        (counts_user_after >= MIN_RATINGS_USER) &
-        (counts_user_after <= max_ratings_user)
-    ].index
-    df_filt = df_filt[df_filt["user_id"].isin(valid_users)].copy()
-
-    print(f"Usuaris finals: {df_filt['user_id'].nunique()}")
-    print(f"Files finals despres de tots els filtres: {len(df_filt)}")
-
-    # Taula pivot i correlacions
-    print("Creant taula pivot (user x anime)...")
-    userRatings = df_filt.pivot_table(index="user_id", columns="anime_id", values="rating")
-
-    print(f"Calculant correlacions (Pearson, min_periods={MIN_PERIODS_CORR})...")
-    corrMatrix = userRatings.corr(method="pearson", min_periods=MIN_PERIODS_CORR)
-
-    # Guardar model
-    os.makedirs(MODELS_DIR, exist_ok=True)
-    corrMatrix.to_pickle(MODEL_FILE)
-    with open(CURRENT_MODEL, "w") as f:
-        json.dump({"model_version": "1.0", "artifact_path": MODEL_FILE}, f, indent=4)
-
-    print(f"Model guardat a: {MODEL_FILE}")
-    print("Entrenament complet (v1.0)")
+def train_model(topk=TOPK_NEIGHBORS, artifact_format=ARTIFACT_FORMAT, engine="sparse", workers=1,
+                version=None, progress=None, keep_stats=None, model_type=None,
+                min_ratings_item=MIN_RATINGS_ITEM, min_ratings_user=MIN_RATINGS_USER,
+                min_periods=MIN_PERIODS_CORR, max_user_quantile=MAX_USER_QUANTILE, use_cache=True):
+    """
+    Llegeix els CSV, aplica filtres, calcula correlacions i guarda el model.
+    Cada pas (filtre d'animes, filtre d'usuaris, matriu, correlacions, vectors
+    de similars) guarda la seva sortida a STAGE_CACHE_DIR amb una clau feta de
+    les seves entrades i paràmetres: si només canvia min_periods, per exemple,
+    els filtres i la matriu es llegeixen de la cache i només es recalculen
+    les correlacions.
+    model_type: "corr" (correlacions) o "als" (factorització); per defecte el
+                mateix tipus que el model actual (o "corr" si encara no n'hi ha).
+                Amb "als" no s'usen topk, artifact_format, engine, keep_stats ni min_periods.
+    topk: nombre de veïns per anime que es guarden a l'índex compacte
+    artifact_format: format de la matriu densa (veure ARTIFACT_FORMATS)
+    engine: "sparse" (matriu dispersa, poca memòria) o "pandas" (pivot_table +
+            DataFrame.corr, l'original; útil per comprovar resultats, sense cache)
+    workers: processos per calcular les correlacions per blocs (només "sparse")
+    version: nom de la versió (per defecte la data i hora actuals); cada versió
+             té el seu directori nou al registre (VERSIONS_DIR) amb un manifest
+             (FileExistsError si ja existeix)
+    progress: funció progress(etapa, fracció) que es crida a l'inici de cada etapa
+    keep_stats: guarda a STATS_DIR les estadístiques per parell d'items per poder
+                aplicar després valoracions noves amb update_model() (només "sparse";
+                les correlacions es calculen encara que siguin a la cache); per
+                defecte, si el model actual les té (així un reentrenament no
+                deixa sense actualitzacions incrementals el model que en tenia)
+    min_ratings_item, min_ratings_user, min_periods, max_user_quantile: filtres
+                (per defecte, les constants del principi del fitxer)
+    use_cache: False per calcular-ho tot sense llegir ni escriure la cache de passos
+    Retorna un diccionari amb el temps (segons) de cada etapa.
+    """
+    if model_type is None:
+        model_type = current_model_type()
+    if keep_stats is None:
+        keep_stats = current_keeps_stats()
+    if model_type not in MODEL_TYPES:
+        raise ValueError(f"Tipus de model desconegut: {model_type}")
+    if engine not in ("sparse", "pandas"):
+        raise ValueError(f"Motor d'entrenament desconegut: {engine}")
+    version = reserve_version(version)
+    paths = artifact_paths(version)
+    timings = {}
+    stage = _stage_tracker(timings, progress, TRAIN_STAGES if model_type == "corr" else ALS_TRAIN_STAGES)
+    cache = StageCache(STAGE_CACHE_DIR, enabled=use_cache)
+    params = training_params(min_ratings_item=min_ratings_item, min_ratings_user=min_ratings_user,
+                             max_user_quantile=max_user_quantile)
+
+    # Lectura i neteja bàsica (sense -1 ni duplicats), amb cache binària;
+    # no cal si el filtre d'animes ja és a la cache
+    item_inputs = {"data": csv_key(RATING_CSV), "min_ratings": min_ratings_item}
+    with stage("lectura"):
+        ratings = None
+        if not cache.has("filtre_animes", item_inputs):
+            ratings = load_ratings(RATING_CSV, CACHE_DIR)
+            log.info("Valoracions llegides", extra={"rows": len(ratings)})
+
+    with stage("filtre_animes"):
+        out, items_key = cache.run("filtre_animes", item_inputs,
+                                   lambda: ratings_outputs(filter_items(ratings, min_ratings_item)))
+        del ratings
+
+    with stage("filtre_usuaris"):
+        user_inputs = {"ratings": items_key, "min_ratings": min_ratings_user, "max_quantile": max_user_quantile}
+        out, users_key = cache.run("filtre_usuaris", user_inputs, lambda: ratings_outputs(
+            filter_users(ratings_frame(out), min_ratings_user, max_user_quantile)))
+        df_filt = ratings_frame(out)
+
+    if engine == "pandas" and model_type == "corr":
+        # Taula pivot i correlacions
+        with stage("matriu"):
+            userRatings = df_filt.pivot_table(index="user_id", columns="anime_id", values="rating")
+
+        with stage("correlacions"):
+            corrMatrix = userRatings.corr(method="pearson", min_periods=min_periods)
+            corr, item_ids = corrMatrix.to_numpy(), corrMatrix.columns.to_numpy()
+        R = build_rating_matrix(df_filt["user_id"], df_filt["anime_id"], df_filt["rating"])[0]
+        matrix_key = None
+    else:
+        # Matriu dispersa (user x anime)
+        with stage("matriu"):
+            out, matrix_key = cache.run("matriu", {"ratings": users_key}, lambda: dict(zip(
+                ("R", "user_ids", "item_ids"),
+                build_rating_matrix(df_filt["user_id"], df_filt["anime_id"], df_filt["rating"]))))
+            R, user_ids, item_ids = out["R"], out["user_ids"], out["item_ids"]
+            del df_filt
+
+        if model_type == "als":
+            return _train_factors(R, item_ids, matrix_key, cache, version, paths, stage, timings, params)
+
+        # Correlacions per blocs de columnes
+        with stage("correlacions"):
+            stats_dir = STATS_DIR if keep_stats else None
+            if stats_dir and os.path.isdir(stats_dir):
+                write_stats_meta(stats_dir, version, state="updating")  # a mig reescriure
+
+            def correlations():
+                if workers > 1:
+                    values, block_times = pearson_corr_parallel(R, min_periods, paths["matrix"] + ".part",
+                                                                workers, stats_dir=stats_dir)
+                    log.info("Correlacions per blocs", extra={"blocks": len(block_times), "workers": workers,
+                                                              "slowest_block_seconds": max(block_times, default=0)})
+                    return {"corr": values}
+                return {"corr": pearson_corr_sparse(R, min_periods, stats_dir=stats_dir)}
+
+            out, _ = cache.run("correlacions", {"matrix": matrix_key, "min_periods": min_periods},
+                               correlations, refresh=stats_dir is not None)
+            corr = out["corr"]
+            if stats_dir:
+                save_training_ratings(stats_dir, R, user_ids, item_ids)
+                write_stats_meta(stats_dir, version)
+
+    # Guardar model (el memmap de l'entrenament en paral·lel es mou; el de la cache, no)
+    with stage("guardar"):
+        temporary = isinstance(corr, np.memmap) and corr.filename == os.path.abspath(paths["matrix"] + ".part")
+        if artifact_format == "memmap":
+            header = save_matrix_memmap(corr, item_ids, paths["matrix"], paths["ids"], move=temporary)
+        elif artifact_format == "float16":
+            header = save_matrix_memmap(corr, item_ids, paths["matrix16"], paths["ids"], dtype="float16")
+        elif artifact_format == "quant8":
+            header = save_matrix_quantized(corr, item_ids, paths["quant"], paths["blocks"], paths["ids"])
+        elif artifact_format == "pickle":
+            pd.DataFrame(corr, index=item_ids, columns=item_ids).to_pickle(paths["pickle"])
+            header = {"format": "pickle", "artifact_path": paths["pickle"]}
+        else:
+            raise ValueError(f"Format de model desconegut: {artifact_format}")
+
+    # Índex compacte amb els top-K veïns (és el que es fa servir per recomanar)
+    with stage("veins"):
+        if temporary and header["artifact_path"] == paths["matrix"]:
+            corr = np.memmap(paths["matrix"], dtype="float32", mode="r", shape=tuple(header["shape"]))
+        neighbors = build_topk_index(corr, item_ids, topk)
+        neighbors.save(paths["neighbors"])
+    del corr, out
+    if os.path.exists(paths["matrix"] + ".part"):
+        os.remove(paths["matrix"] + ".part")  # en paral·lel, si s'ha guardat en un altre format
+
+    # Vectors d'item i índex aproximat per a "més com aquest" (similar_items)
+    with stage("similars"):
+        vectors = _item_vectors(R, matrix_key, cache)
+        similar = SimilarityIndex.build(item_ids, vectors)
+        similar.save(paths["similar"])
+
+    # Popularitat i gèneres de anime.csv, per als perfils que el model no cobreix
+    with stage("popularitat"):
+        fallback_path = _build_fallback(paths)
+
+    # Canvi atòmic de model: fins aquí ningú veu la versió nova
+    info = {
+        "model_version": version,
+        "model_type": "corr",
+        **header,
+        "neighbors_path": paths["neighbors"],
+        "topk": neighbors.k,
+        "similar_path": paths["similar"],
+        "fallback_path": fallback_path,
+    }
+    if keep_stats and engine == "sparse":
+        info["stats_path"] = STATS_DIR
+    MODEL_REGISTRY.write_manifest(version, info, data=data_fingerprint(RATING_CSV), timings=timings,
+                                  params=dict(params, min_periods_corr=min_periods, topk=topk,
+                                              artifact_format=artifact_format, engine=engine,
+                                              keep_stats=keep_stats))
+    write_model_info(info)
+
+    log.info("Entrenament complet", extra={"version": version, "artifact": header["artifact_path"],
+                                           "neighbors": paths["neighbors"], "engine": engine,
+                                           "seconds": sum(timings.values())})
+    return timings
+
+
+def _train_factors(R, item_ids, matrix_key, cache, version, paths, stage, timings, params):
+    """Part de train_model per al model "als": factors d'item en lloc de correlacions"""
+    with stage("als"):
+        factors = train_als(R, item_ids, progress=lambda it, rmse: log.info(
+            "Iteracio ALS", extra={"iteration": it + 1, "train_rmse": round(rmse, 4)}))
+
+    with stage("guardar"):
+        factors.save(paths["factors"])
+
+    # Els mateixos factors serveixen per a l'índex de similars
+    with stage("similars"):
+        similar = SimilarityIndex.build(item_ids, normalize_rows(factors.item_factors))
+        similar.save(paths["similar"])
+
+    with stage("popularitat"):
+        fallback_path = _build_fallback(paths)
+
+    info = {
+        "model_version": version,
+        "model_type": "als",
+        "factors_path": paths["factors"],
+        "shape": list(factors.item_factors.shape),
+        "dtype": "float32",
+        "similar_path": paths["similar"],
+        "fallback_path": fallback_path,
+    }
+    MODEL_REGISTRY.write_manifest(version, info, data=data_fingerprint(RATING_CSV), timings=timings,
+                                  params=dict(params, model_type="als", factors=ALS_FACTORS,
+                                              reg=ALS_REG, iters=ALS_ITERS))
+    write_model_info(info)
+    log.info("Entrenament complet", extra={"version": version, "model_type": "als",
+                                           "factors": paths["factors"], "seconds": sum(timings.values())})
+    return timings
+
+
+def _build_fallback(paths):
+    """Construeix i guarda el FallbackIndex (retorna la ruta, o None si no hi ha anime.csv)"""
+    if not os.path.exists(ANIME_CSV):
+        log.warning("Sense anime.csv: el model no tindrà motor de reserva", extra={"path": ANIME_CSV})
+        return None
+    anime = pd.read_csv(ANIME_CSV, usecols=["anime_id", "genre", "type", "rating", "members"])
+    FallbackIndex.build(anime).save(paths["fallback"])
+    return paths["fallback"]
+
+
+def _item_vectors(R, matrix_key, cache):
+    """Vectors d'item per a l'índex de similars (de la cache si la matriu és la mateixa)"""
+    if matrix_key is None:
+        return item_vectors(R, EMBEDDING_DIM)
+    out, _ = cache.run("vectors", {"matrix": matrix_key, "dim": EMBEDDING_DIM},
+                       lambda: {"vectors": item_vectors(R, EMBEDDING_DIM)})
+    return out["vectors"]
+
+
+# ACTUALITZACIÓ INCREMENTAL
+def update_model(delta, version=None):
+    """
+    Aplica valoracions noves al model actual sense reentrenar-lo sencer.
+    delta: DataFrame (o ruta a un CSV) amb user_id, anime_id, rating
+    Cal que el model s'hagi entrenat amb keep_stats=True. Només es recalculen
+    les correlacions entre els animes que han valorat els usuaris afectats i
+    els veïns d'aquests animes; el resultat es guarda com una versió nova que
+    no copia la matriu: fa servir la de la versió entrenada més un patch amb
+    el bloc dels animes afectats (acumulat amb els de versions anteriors).
+    Quan el patch passa de PATCH_MAX_FRACTION dels animes (creix amb el seu
+    quadrat) es consolida: la versió nova té una matriu sencera sense patch.
+    Les estadístiques (STATS_DIR) només s'escriuen quan els fitxers de la
+    versió nova ja hi són: si falla abans, el model actual no canvia.
+    Els animes nous i els filtres de MIN_RATINGS_* no s'actualitzen: per això
+    cal un reentrenament complet (recorda afegir també el delta a rating.csv).
+    Retorna un resum (files, usuaris, animes afectats i versió nova).
+    """
+    if isinstance(delta, str):
+        delta = pd.read_csv(delta, usecols=["user_id", "anime_id", "rating"])
+
+    info = read_model_info()
+    stats_dir = info.get("stats_path")
+    meta = read_stats_meta(stats_dir) if stats_dir else None
+    if meta is None or info.get("format") != "memmap":  # memmap float32 o float16
+        raise ValueError("El model actual no té estadístiques (memmap + keep_stats=True): cal reentrenar-lo")
+    if meta.get("state") != "ok" or meta.get("version") != info["model_version"]:
+        raise ValueError("Les estadístiques no corresponen al model actual: cal reentrenar-lo")
+
+    t0 = time.perf_counter()
+    # El mateix min_periods amb què es va entrenar la versió actual
+    parent = MODEL_REGISTRY.manifest(info["model_version"]) or {}
+    min_periods = (parent.get("params") or {}).get("min_periods_corr", MIN_PERIODS_CORR)
+
+    # Directori nou abans de tocar res (FileExistsError si version ja existeix)
+    version = reserve_version(version)
+    paths = artifact_paths(version)
+    touched, block, pending, summary = prepare_ratings_delta(stats_dir, delta, min_periods)
+
+    # Patch nou: l'anterior més el bloc afectat, sobre la matriu de la versió entrenada
+    values = load_model(info, frame=False)
+    positions, patch = patch_block(values, touched, block,
+                                   values.positions if isinstance(values, PatchedMatrix) else None)
+    values = PatchedMatrix(values.base if isinstance(values, PatchedMatrix) else values, positions, patch)
+    compact = len(positions) > PATCH_MAX_FRACTION * values.shape[1]
+    if compact:
+        # Es consolida (per blocs de files) en una matriu nova del mateix tipus, sense patch
+        dtype = info.get("dtype", "float32")
+        matrix = save_matrix_memmap(values, np.load(info["ids_path"]),
+                                    paths["matrix16" if dtype == "float16" else "matrix"], paths["ids"], dtype=dtype)
+    else:
+        save_patch(paths["patch"], positions, patch)
+        matrix = {"patch_path": paths["patch"]}
+
+    # Només els veïns dels animes afectats; la resta de l'índex es reaprofita
+    neighbors = NeighborIndex.load(info["neighbors_path"])
+    replace_columns(neighbors, values, touched).save(paths["neighbors"])
+
+    # Els fitxers de la versió nova ja hi són: ara les estadístiques
+    write_stats_meta(stats_dir, info["model_version"], state="updating")
+    commit_ratings_delta(stats_dir, pending)
+    write_stats_meta(stats_dir, version)
+
+    # Els similars i el motor de reserva (i, si no s'ha consolidat, la matriu) són els de la versió anterior
+    new_info = {key: value for key, value in info.items() if key != "patch_path"}
+    new_info.update(model_version=version, neighbors_path=paths["neighbors"], **matrix)
+    MODEL_REGISTRY.write_manifest(version, new_info, reuse=parent.get("files"), parent=info["model_version"],
+                                  data=parent.get("data"), params=parent.get("params"),
+                                  delta={"rows": int(len(delta)), "seconds": round(time.perf_counter() - t0, 3)})
+    write_model_info(new_info)
+
+    summary.update(version=version, compacted=compact, seconds=round(time.perf_counter() - t0, 3))
+    log.info("Model actualitzat", extra=summary)
+    return summary
+
+
+# Etapes de train_model, en ordre (per calcular el progrés)
+TRAIN_STAGES = ["lectura", "filtre_animes", "filtre_usuaris", "matriu", "correlacions", "guardar", "veins",
+                "similars", "popularitat"]
+ALS_TRAIN_STAGES = ["lectura", "filtre_animes", "filtre_usuaris", "matriu", "als", "guardar", "similars",
+                    "popularitat"]
+
+
+def _stage_tracker(timings, progress=None, stages=TRAIN_STAGES):
+    """
+    Retorna un context manager que mesura cada etapa, n'informa el progrés
+    i la registra (log i histograma animatch_train_stage_seconds)
+    """
+    @contextmanager
+    def stage(name):
+        if progress is not None:
+            progress(name, stages.index(name) / len(stages))
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            timings[name] = time.perf_counter() - t0
+            TRAIN_STAGE_SECONDS.observe(timings[name], stage=name)
+            log.info("Etapa acabada", extra={"stage": name, "seconds": timings[name]})
+    return stage
+
+
+def new_version():
+    """Versió nova basada en la data i hora amb mil·lisegons (ordenable)"""
+    now = time.time()
+    return time.strftime("%Y%m%d%H%M%S", time.localtime(now)) + f"{int(now * 1000) % 1000:03d}"
+
+
+def reserve_version(version=None):
+    """
+    Crea el directori d'una versió nova al registre i en retorna el nom.
+    Sense version se'n tria una de nova (si dos entrenaments coincideixen en
+    el mateix mil·lisegon, el segon espera i en tria una altra); amb version,
+    FileExistsError si ja existeix.
+    """
+    while True:
+        name = version or new_version()
+        try:
+            MODEL_REGISTRY.create(name)
+            return name
+        except FileExistsError:
+            if version:
+                raise
+            time.sleep(0.001)
+
+
+def artifact_paths(version):
+    """Rutes dels fitxers d'una versió del model (al seu directori del registre)"""
+    base = MODEL_REGISTRY.version_dir(version)
+    return {
+        "pickle": os.path.join(base, "model.pkl"),
+        "matrix": os.path.join(base, "model.f32"),          # format memmap
+        "matrix16": os.path.join(base, "model.f16"),        # format float16
+        "quant": os.path.join(base, "model.q8"),            # format quant8
+        "blocks": os.path.join(base, "model.q8.blocks.npy"),
+        "ids": os.path.join(base, "ids.npy"),
+        "neighbors": os.path.join(base, "neighbors.npz"),
+        "similar": os.path.join(base, "similar.npz"),
+        "factors": os.path.join(base, "als.npz"),           # model "als"
+        "fallback": os.path.join(base, "fallback.npz"),
+        "patch": os.path.join(base, "patch.npz"),          # versions de update_model
+    }
+
+
+def training_params(**kwargs):
+    """Paràmetres de l'entrenament per al manifest"""
+    return {"embedding_dim": EMBEDDING_DIM, **kwargs}
+
+
+def write_model_info(info):
+    """
+    Escriu current_model.json de forma atòmica (fitxer temporal + os.replace),
+    així cap procés llegeix mai un JSON a mitges.
+    """
+    tmp_path = CURRENT_MODEL + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(info, f, indent=4)
+    os.replace(tmp_path, CURRENT_MODEL)
+
+
+def save_matrix_memmap(values, item_ids, matrix_path, ids_path, dtype="float32", block_rows=1024, move=False):
+    """
+    Guarda la matriu en cru (obrible amb numpy.memmap) com a float32 o
+    float16, i els anime_id en un .npy a part. Retorna la capçalera per a
+    current_model.json. Amb move=True, si values ja és un memmap en cru del
+    mateix tipus (entrenament en paral·lel) només es mou; si no, s'escriu per
+    blocs de files.
+    """
+    if move and isinstance(values, np.memmap) and values.dtype == np.dtype(dtype):
+        values.flush()
+        os.replace(values.filename, matrix_path)
+    else:
+        with open(matrix_path, "wb") as f:
+            for start in range(0, values.shape[0], block_rows):
+                np.asarray(values[start:start + block_rows], dtype=dtype).tofile(f)
+    np.save(ids_path, np.asarray(item_ids, dtype="int64"))
+    return {
+        "format": "memmap",
+        "artifact_path": matrix_path,
+        "ids_path": ids_path,
+        "shape": list(values.shape),
+        "dtype": dtype,
+    }
 
 
 # CARREGAR ALGORITME
-def load_model():
-    """Carrega el model entrenat (matriu de correlacions)"""
+def read_model_info():
+    """Llegeix current_model.json (versió i ruta de l'artefacte)"""
     if not os.path.exists(CURRENT_MODEL):
         raise FileNotFoundError("No s'ha trobat current_model.json. Entrena el model primer!")
 
     with open(CURRENT_MODEL) as f:
-        info = json.load(f)
+        return json.load(f)
+
+
+def current_model_type():
+    """Tipus del model actual ("corr" si no n'hi ha cap o és d'abans de tenir-ne)"""
+    try:
+        return read_model_info().get("model_type", "corr")
+    except FileNotFoundError:
+        return "corr"
+
+
+def current_keeps_stats():
+    """Si el model actual guarda estadístiques per a update_model (False si no n'hi ha cap)"""
+    try:
+        return bool(read_model_info().get("stats_path"))
+    except FileNotFoundError:
+        return False
+
+
+def load_model(info=None, frame=True):
+    """
+    Carrega el model entrenat: matriu de correlacions (DataFrame, BlockMatrix si
+    és quant8 o PatchedMatrix si és una versió de update_model).
+    frame=False: en memmap, l'array sense el DataFrame al voltant.
+    """
+    if info is None:
+        info = read_model_info()
+    if info.get("model_type", "corr") != "corr":
+        raise ValueError(f"El model {info.get('model_type')} no té matriu de correlacions")
     model_path = info["artifact_path"]
 
     if not os.path.exists(model_path):
         raise FileNotFoundError(f"No existeix el fitxer de model: {model_path}")
 
-    print(f"Carregant model des de: {model_path}")
+    log.info("Carregant model", extra={"path": model_path, "format": info.get("format", "pickle")})
+    if info.get("format") == "quant8":
+        # Comprimida: es descomprimeixen només els blocs de columnes que es fan servir
+        return BlockMatrix.from_info(info)
+    if info.get("format") == "memmap":
+        # Mapat a memòria: tots els workers comparteixen la page cache del SO
+        values = np.memmap(model_path, dtype=info.get("dtype", "float32"),
+                           mode="r", shape=tuple(info["shape"]))
+        if info.get("patch_path"):  # versió de update_model: la matriu de l'entrenament + el bloc nou
+            return PatchedMatrix(values, *load_patch(info["patch_path"]))
+        if not frame:
+            return values
+        ids = np.load(info["ids_path"])
+        return pd.DataFrame(values, index=ids, columns=ids, copy=False)
+
     corrMatrix = pd.read_pickle(model_path)
     return corrMatrix
 
 
+def load_factors(info):
+    """Carrega els factors d'item d'un model "als" (None si és de correlacions)"""
+    if info.get("model_type") != "als":
+        return None
+    log.info("Carregant factors", extra={"path": info["factors_path"]})
+    return FactorModel.load(info["factors_path"])
+
+
+def load_neighbors(info):
+    """Carrega l'índex de top-K veïns si el model en té (None si no)"""
+    path = info.get("neighbors_path")
+    if not path or not os.path.exists(path):
+        return None
+    log.info("Carregant index de veins", extra={"path": path})
+    return NeighborIndex.load(path)
+
+
+def load_similar(info):
+    """Carrega l'índex de similars si el model en té (None si és d'abans)"""
+    path = info.get("similar_path")
+    if not path or not os.path.exists(path):
+        return None
+    return SimilarityIndex.load(path)
+
+
+def load_fallback(info):
+    """Carrega el motor de reserva si el model en té (None si és d'abans)"""
+    path = info.get("fallback_path")
+    if not path or not os.path.exists(path):
+        return None
+    return FallbackIndex.load(path)
+
+
+def read_checked_model_info():
+    """
+    current_model.json comprovant abans, contra el manifest de la versió, que
+    els fitxers hi són i tenen la mida esperada (ràpid: sense llegir-los)
+    """
+    info = read_model_info()
+    problems = MODEL_REGISTRY.check(info)
+    if problems:
+        raise ValueError(f"Model {info.get('model_version')} malmès: " + "; ".join(problems))
+    return info
+
+
+def load_anime_names():
+    """Diccionari {anime_id: name} a partir de anime.csv (buit si no hi és)"""
+    if not os.path.exists(ANIME_CSV):
+        return {}
+    anime = pd.read_csv(ANIME_CSV, usecols=["anime_id", "name"])
+    return dict(zip(anime["anime_id"].astype(int), anime["name"]))
+
+
+# Versions entrenades (directoris amb manifest) i model compartit per tot el
+# procés, que es carrega un sol cop
+MODEL_REGISTRY = ModelRegistry(VERSIONS_DIR, read_model_info, write_model_info)
+MODEL_STORE = ModelStore(read_checked_model_info, load_model, load_anime_names, load_neighbors,
+                         watch_path=CURRENT_MODEL, load_similar=load_similar, load_factors=load_factors,
+                         load_fallback=load_fallback)
+
+
 # RECOMANAR ANIMES
-def get_recommendations(myRatings, top_n=10):
+def get_recommendations(myRatings, top_n=10, model=None, exact=False, offset=0,
+                        exclude_genres=None, types=None, min_members=None):
     """
     myRatings: diccionari {anime_id: rating}, ex: {11061: 10, 2476: 1}
-    Retorna DataFrame amb (anime_id, score)
+    top_n, offset: pàgina de resultats (top_n a partir de la posició offset)
+    model: LoadedModel a fer servir (per defecte el de MODEL_STORE)
+    exact: True per puntuar amb la matriu densa en lloc de l'índex top-K
+           (el model "als" ja puntua sempre tot el catàleg)
+    exclude_genres, types, min_members: filtres (veure filter_masks); s'apliquen
+           com a màscara abans de triar el top-K, no sobre el resultat
+    Si el model cobreix poc el perfil (o no hi ha prou candidats), part de la
+    llista es completa amb el motor de reserva (veure blend_fallback).
+    Retorna DataFrame amb (anime_id, name, score, source); amb "als", score és
+    la nota prevista; source diu d'on surt cada anime ("model" o "fallback")
     """
-    corrMatrix = load_model()
-    simCandidates = pd.Series(dtype="float64")
-
-    for anime_id, rating in myRatings.items():
-        if anime_id not in corrMatrix.columns:
-            continue
-        sims = corrMatrix[anime_id].dropna()
-        sims = sims.map(lambda x: x * rating)
-        simCandidates = pd.concat([simCandidates, sims])
+    if offset < 0:
+        raise ValueError("offset ha de ser 0 o més gran")
+    if model is None:
+        model = MODEL_STORE.get()
+    allowed, fallback_allowed = filter_masks(model, exclude_genres, types, min_members)
+    n = offset + top_n  # es tria el top-(offset + top_n) i es retorna la pàgina
+    if model.factors is not None:
+        with RECOMMEND_SECONDS.time(path="als"):
+            ids, scores = score_profile_factors(model.factors, myRatings, n, allowed)
+    elif model.neighbors is not None and not exact:
+        with RECOMMEND_SECONDS.time(path="topk"):
+            ids, scores = score_profile_topk(model.neighbors, myRatings, n, allowed)
+    else:
+        with RECOMMEND_SECONDS.time(path="exact"):
+            ids, scores = score_profile(model.values, model.item_ids, myRatings, n, allowed)
+    ids, scores, source = blend_fallback(model, myRatings, ids, scores, n, fallback_allowed)
+
+    if ids.size == 0:
+        RECOMMEND_EMPTY.inc()
+        log.debug("No hi ha candidats similars", extra={"profile_size": len(myRatings)})
+    ids, scores, source = ids[offset:], scores[offset:], source[offset:]
+    if ids.size == 0:
+        return pd.DataFrame(columns=["anime_id", "name", "score", "source"])
+
+    # Afegim els noms dels animes (diccionari ja carregat)
+    return pd.DataFrame({"anime_id": ids, "name": model.name_of(ids), "score": scores, "source": source})
+
+
+def filter_masks(model, exclude_genres=None, types=None, min_members=None):
+    """
+    Màscares dels filtres (sobre model.item_ids i sobre el catàleg del motor de
+    reserva), a partir de les precalculades per gènere, tipus i membres:
+    exclude_genres: gèneres que no pot tenir cap recomanació, ex: ["Horror"]
+    types: tipus permesos, ex: ["TV", "Movie"]
+    min_members: mínim de membres
+    (None, None) si no hi ha cap filtre. ValueError si el model no té les
+    metadades de anime.csv o si un gènere o tipus no existeix.
+    """
+    if not exclude_genres and not types and not min_members:
+        return None, None
+    if model.filters is None:
+        raise ValueError("El model no té les dades de anime.csv per filtrar: cal reentrenar-lo")
+    where = {"exclude_genres": exclude_genres, "types": types, "min_members": min_members}
+    return model.filters.mask(**where), model.fallback.filters.mask(**where)
 
-    if simCandidates.empty:
-        print("No hi ha candidats similars.")
-        return pd.DataFrame(columns=["anime_id", "score"])
 
-    simCandidates = simCandidates.groupby(simCandidates.index).sum()
-    simCandidates = simCandidates.drop(myRatings.keys(), errors="ignore")
-    top = simCandidates.sort_values(ascending=False).head(top_n)
+def blend_fallback(model, myRatings, ids, scores, top_n, allowed=None):
+    """
+    Barreja les recomanacions del model (ids, scores, ordenades) amb les del
+    motor de reserva en una llista de top_n. Si el model cobreix una fracció
+    c < FALLBACK_MIN_COVERAGE del perfil, una part 1 - c / FALLBACK_MIN_COVERAGE
+    de les posicions és del motor de reserva (totes si cap anime del perfil és
+    al model), repartides al llarg de la llista; si no, només ho són les que
+    queden quan el model ja no té més candidats. Les posicions de cada motor no
+    depenen de top_n: la llista de top_n és el principi de la de qualsevol top_n
+    més gran, així les pàgines (offset) encaixen entre elles.
+    allowed: màscara dels filtres sobre el catàleg.
+    Retorna (ids, scores, source).
+    """
+    if model.fallback is None or top_n <= 0:
+        return ids, scores, np.full(len(ids), "model", dtype=object)
+    share = max(0.0, 1 - model.coverage(myRatings) / FALLBACK_MIN_COVERAGE)
+    if share == 0 and len(ids) >= top_n:
+        return ids, scores, np.full(len(ids), "model", dtype=object)
+
+    RECOMMEND_FALLBACK.inc()
+    with RECOMMEND_SECONDS.time(path="fallback"):
+        extra_ids, extra_scores = model.fallback.recommend(myRatings, top_n, allowed=allowed)
+    # La posició i és del motor de reserva si hi creix el nombre arrodonit de
+    # posicions de reserva fins a ella (en un empat, la del model va abans)
+    counts = np.ceil(share * np.arange(top_n + 1) - 0.5)
+    wanted = ["fallback" if grows else "model" for grows in np.diff(counts) > 0]
+    streams = {"model": zip(ids.tolist(), scores.tolist()),
+               "fallback": zip(extra_ids.tolist(), extra_scores.tolist())}
+    out_ids, out_scores, source, seen = [], [], [], set()
+    for first in wanted:
+        # Si un motor ja no en té més (o només repetits), la posició és de l'altre
+        for name in (first, "model" if first == "fallback" else "fallback"):
+            item = next((item for item in streams[name] if item[0] not in seen), None)
+            if item is not None:
+                break
+        if item is None:
+            break
+        seen.add(item[0])
+        out_ids.append(item[0])
+        out_scores.append(item[1])
+        source.append(name)
+    return (np.array(out_ids, dtype=ids.dtype), np.array(out_scores, dtype="float64"),
+            np.array(source, dtype=object))
+
+
+def iter_recommendations_batch(profiles, top_n=10, model=None, exact=False):
+    """
+    Com get_recommendations però per a molts perfils alhora (una multiplicació
+    de matrius per tros). Genera, per a cada perfil i en ordre, una llista de
+    diccionaris {anime_id, name, score, source} (buida si no hi ha candidats).
+    """
+    if model is None:
+        model = MODEL_STORE.get()
+    # El temps del lot compta només la puntuació, no el que tarda qui consumeix el
+    # generador; es registra en acabar-lo o en tancar-lo (encara que no s'esgoti)
+    elapsed = 0.0
+    batches = score_batch(model, profiles, top_n, exact=exact)
+    try:
+        for myRatings in profiles:
+            t0 = time.perf_counter()
+            item = next(batches, None)
+            if item is None:
+                break
+            ids, scores, source = blend_fallback(model, myRatings, *item, top_n)
+            elapsed += time.perf_counter() - t0
+            yield [{"anime_id": int(a), "name": n, "score": float(sc), "source": src}
+                   for a, n, sc, src in zip(ids, model.name_of(ids), scores, source)]
+    finally:
+        RECOMMEND_SECONDS.observe(elapsed, path="batch")
+
+
+def get_recommendations_batch(profiles, top_n=10, model=None, exact=False):
+    """
+    profiles: llista de diccionaris {anime_id: rating}
+    Retorna una llista de DataFrames (anime_id, name, score, source), un per perfil.
+    """
+    return [pd.DataFrame(recs, columns=["anime_id", "name", "score", "source"])
+            for recs in iter_recommendations_batch(profiles, top_n, model, exact)]
 
-    result = pd.DataFrame({"anime_id": top.index, "score": top.values})
-    # Afegim els noms dels animes
-    anime = pd.read_csv(os.path.join(DATA_DIR, "anime.csv"))  # llegim noms
-    result = result.merge(anime[["anime_id", "name"]], on="anime_id", how="left")
-    result = result[["anime_id", "name", "score"]]  # reordenem columnes
 
-    print("Recomanacions generades!")
-    return result
+# ANIMES SIMILARS ("més com aquest")
+def similar_items(anime_id, k=10, model=None, exact=False):
+    """
+    Els k animes més semblants a anime_id segons els vectors d'item de
+    l'entrenament (cerca aproximada a l'índex de similars).
+    exact: True per comparar amb tots els animes (més lent, per mesurar)
+    Retorna DataFrame amb (anime_id, name, similarity).
+    KeyError si l'anime no és al model; ValueError si el model no té índex.
+    """
+    if model is None:
+        model = MODEL_STORE.get()
+    if model.similar is None:
+        raise ValueError("El model actual no té índex de similars: cal reentrenar-lo")
+    pos = model.similar.position(anime_id)
+    if pos is None:
+        raise KeyError(anime_id)
+    with RECOMMEND_SECONDS.time(path="similar"):
+        positions, sims = model.similar.query(pos, k, exact=exact)
+    ids = model.similar.item_ids[positions]
+    return pd.DataFrame({"anime_id": ids, "name": model.name_of(ids), "similarity": sims})
 
 
 # TEST RÀPID DES DEL TERMINAL
 if __name__ == "__main__":
-    print("Executant prova rapida de model...")
+    parser = argparse.ArgumentParser(description="Entrena el model i fa una prova ràpida")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processos per calcular les correlacions (per defecte 1)")
+    parser.add_argument("--topk", type=int, default=TOPK_NEIGHBORS,
+                        help="veïns per anime a l'índex compacte")
+    parser.add_argument("--format", choices=ARTIFACT_FORMATS, default=ARTIFACT_FORMAT,
+                        help="format de la matriu densa")
+    parser.add_argument("--engine", choices=["sparse", "pandas"], default="sparse",
+                        help="motor de càlcul de correlacions")
+    parser.add_argument("--model-type", choices=MODEL_TYPES,
+                        help="tipus de model (per defecte el mateix que l'actual)")
+    parser.add_argument("--min-ratings-item", type=int, default=MIN_RATINGS_ITEM,
+                        help="mínim de valoracions per anime")
+    parser.add_argument("--min-ratings-user", type=int, default=MIN_RATINGS_USER,
+                        help="mínim de valoracions per usuari")
+    parser.add_argument("--min-periods", type=int, default=MIN_PERIODS_CORR,
+                        help="mínim d'usuaris comuns per calcular una correlació")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="recalcula tots els passos sense fer servir la cache")
+    parser.add_argument("--stats", action="store_true", default=None,
+                        help="guarda les estadístiques per a actualitzacions incrementals "
+                             "(per defecte, si el model actual les té)")
+    parser.add_argument("--delta", metavar="CSV",
+                        help="no reentrena: aplica les valoracions noves del CSV al model actual")
+    parser.add_argument("--list", action="store_true", help="no reentrena: llista les versions del registre")
+    parser.add_argument("--rollback", nargs="?", const="", metavar="VERSIO",
+                        help="no reentrena: torna a la versió indicada o, sense valor, a l'anterior")
+    parser.add_argument("--prune", type=int, metavar="N",
+                        help="no reentrena: esborra les versions velles i en deixa N a més de l'actual")
+    parser.add_argument("--verify", action="store_true",
+                        help="no reentrena: comprova els checksums de la versió actual")
+    args = parser.parse_args()
+    setup_logging()
+
+    if args.delta:
+        update_model(args.delta)
+        sys.exit(0)
+    if args.list:
+        current = MODEL_REGISTRY.current_version()
+        for m in MODEL_REGISTRY.versions():
+            fmt = (m.get("params") or {}).get("artifact_format", "-")
+            print(f"{'*' if m['version'] == current else ' '} {m['version']}  {m['model_type']:5s} "
+                  f"{fmt:8s} {m['bytes'] / 1e6:9.1f} MB  {m['created_at']}")
+        sys.exit(0)
+    if args.rollback is not None:
+        m = MODEL_REGISTRY.rollback(args.rollback or None)
+        print(f"Model actual: {m['version']}")
+        sys.exit(0)
+    if args.prune is not None:
+        removed = MODEL_REGISTRY.prune(args.prune)
+        print(f"Versions esborrades: {', '.join(removed) or 'cap'}")
+        sys.exit(0)
+    if args.verify:
+        problems = MODEL_REGISTRY.check(read_model_info(), full=True)
+        print("\n".join(problems) or "Model correcte")
+        sys.exit(1 if problems else 0)
+
+    log.info("Executant prova rapida de model")
     # Primer entrenar (només 1 cop)
-    train_model()
+    train_model(topk=args.topk, artifact_format=args.format, engine=args.engine, workers=args.workers,
+                keep_stats=args.stats, model_type=args.model_type, min_ratings_item=args.min_ratings_item,
+                min_ratings_user=args.min_ratings_user, min_periods=args.min_periods, use_cache=not args.no_cache)
+    MODEL_STORE.reload()
 
     # Exemple de recomanacions
     perfil = {11061: 10, 2476: 1}  # Hunter x Hunter = 10, School Days = 1
@@ -0,0 +1,216 @@
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from monitoring import REGISTRY
+from filters import ItemFilters
+from quantized import BlockMatrix
+from incremental import PatchedMatrix
+
+# Mètriques de càrrega del model (s'exporten a /metrics de l'API)
+LOAD_SECONDS = REGISTRY.histogram("animatch_model_load_seconds",
+                                  "Temps de carregar el model: index (veïns i noms) o matriu densa", ["part"])
+MODEL_BYTES = REGISTRY.gauge("animatch_model_bytes", "Mida en disc dels fitxers del model carregat", ["file"])
+MODEL_ITEMS = REGISTRY.gauge("animatch_model_items", "Animes del model carregat")
+MODEL_INFO = REGISTRY.gauge("animatch_model_info", "Versió del model carregat (sempre 1)", ["version"])
+MODEL_LOADED_AT = REGISTRY.gauge("animatch_model_loaded_timestamp_seconds",
+                                 "Moment (epoch) en què es va carregar el model actual")
+MODEL_RELOAD_ERRORS = REGISTRY.counter("animatch_model_reload_errors_total",
+                                       "Recàrregues del model que han fallat (es continua amb l'anterior)")
+
+log = logging.getLogger("animatch.model")
+
+
+class LoadedModel:
+    """
+    Una versió del model ja carregada en memòria, amb tot el que necessita
+    el camí de recomanació (índex de veïns, índex d'items i noms) precalculat.
+    La matriu densa només es llegeix si algú la demana (camí exacte).
+    Un model "als" no té matriu ni veïns: només els factors d'item.
+    """
+
+    def __init__(self, info, load_dense, names, neighbors=None, similar=None, factors=None, fallback=None):
+        self.info = info
+        self.version = info.get("model_version")
+        self.model_type = info.get("model_type", "corr")
+        self.names = names  # {anime_id: name}
+        self.neighbors = neighbors  # NeighborIndex o None
+        self.similar = similar  # SimilarityIndex o None (models d'abans)
+        self.factors = factors  # FactorModel (model "als") o None
+        self.fallback = fallback  # FallbackIndex (popularitat i gèneres) o None (models d'abans)
+        self.filters = None  # ItemFilters sobre item_ids (màscares de gènere, tipus i membres)
+        self._load_dense = load_dense
+        self._dense = None
+        self._filled = None
+        self._lock = threading.RLock()
+
+        if factors is not None:
+            self.item_ids = factors.item_ids
+        elif neighbors is not None:
+            self.item_ids = neighbors.item_ids
+        else:
+            self.item_ids = self.corrMatrix.columns.to_numpy()
+        if fallback is not None and fallback.filters is not None:
+            self.filters = ItemFilters(self.item_ids, fallback)
+
+    @property
+    def corrMatrix(self):
+        """Matriu densa de correlacions (DataFrame, BlockMatrix o PatchedMatrix), carregada sota demanda"""
+        if self._dense is None:
+            with self._lock:
+                if self._dense is None:
+                    with LOAD_SECONDS.time(part="dense"):
+                        self._dense = self._load_dense(self.info)
+        return self._dense
+
+    @property
+    def values(self):
+        """La matriu com a array (la BlockMatrix i la PatchedMatrix ja es comporten com un)"""
+        dense = self.corrMatrix
+        return dense if isinstance(dense, (BlockMatrix, PatchedMatrix)) else dense.to_numpy()
+
+    def dense_filled(self):
+        """
+        (matriu amb NaN -> 0, màscara 1/0 de valors no NaN) en float32, per
+        puntuar lots de perfils amb productes de matrius. Es calcula un sol cop.
+        """
+        if self._filled is None:
+            with self._lock:
+                if self._filled is None:
+                    values = self.values
+                    mask = ~np.isnan(values)
+                    self._filled = (np.where(mask, values, 0).astype("float32"), mask.astype("float32"))
+        return self._filled
+
+    def has_item(self, anime_id):
+        """Diu si l'anime és una columna del model (item_ids està ordenat)"""
+        pos = np.searchsorted(self.item_ids, anime_id)
+        return bool(pos < len(self.item_ids) and self.item_ids[pos] == anime_id)
+
+    def coverage(self, myRatings):
+        """Fracció dels animes del perfil que són al model (0 si el perfil és buit)"""
+        if not myRatings:
+            return 0.0
+        ids = np.fromiter((int(a) for a in myRatings), dtype="int64", count=len(myRatings))
+        pos = np.clip(np.searchsorted(self.item_ids, ids), 0, max(len(self.item_ids) - 1, 0))
+        found = self.item_ids[pos] == ids if len(self.item_ids) else np.zeros(len(ids), dtype=bool)
+        return float(found.mean())
+
+    def name_of(self, anime_ids):
+        return [self.names.get(int(a)) for a in anime_ids]
+
+
+class ModelStore:
+    """
+    Contenidor del model compartit per tot el procés (API, model.py, ...).
+    Carrega el model un sol cop. Si es dona watch_path (current_model.json),
+    cada CHECK_INTERVAL segons mira si ha canviat (un reentrenament fet per un
+    altre procés) i, si és així, carrega la versió nova i la substitueix.
+    Les peticions que ja tenien el model antic el continuen fent servir.
+    Si la recàrrega falla (current_model.json a mitges, un fitxer que encara no
+    hi és...), es continua servint el model carregat i es torna a provar al
+    següent interval: només falla get() si encara no s'ha carregat mai cap model.
+    """
+
+    CHECK_INTERVAL = 1.0  # segons entre comprovacions de watch_path
+
+    def __init__(self, read_info, load_matrix, load_names, load_neighbors, watch_path=None,
+                 load_similar=None, load_factors=None, load_fallback=None):
+        self._read_info = read_info
+        self._load_matrix = load_matrix
+        self._load_names = load_names
+        self._load_neighbors = load_neighbors
+        self._load_similar = load_similar
+        self._load_factors = load_factors
+        self._load_fallback = load_fallback
+        self._watch_path = watch_path
+        self._lock = threading.Lock()
+        self._model = None
+        self._mtime = None
+        self._last_check = 0.0
+
+    def get(self):
+        """Retorna el LoadedModel actual (el carrega la primera vegada)"""
+        model = self._model
+        if model is None:
+            with self._lock:
+                if self._model is None:
+                    self._swap(self._load())
+                model = self._model
+        elif self._changed_on_disk():
+            try:
+                model = self.reload()
+            except Exception as e:
+                MODEL_RELOAD_ERRORS.inc()
+                log.warning("No s'ha pogut recarregar el model: es continua amb l'anterior",
+                            extra={"version": model.version, "error": repr(e)})
+        return model
+
+    def reload(self):
+        """Torna a llegir current_model.json i substitueix el model en memòria"""
+        model = self._load()
+        with self._lock:
+            self._swap(model)
+        return model
+
+    def clear(self):
+        with self._lock:
+            self._model = None
+            self._mtime = None
+
+    def is_loaded(self):
+        return self._model is not None
+
+    def _load(self):
+        mtime = self._current_mtime()
+        with LOAD_SECONDS.time(part="index") as timer:
+            info = self._read_info()
+            similar = self._load_similar(info) if self._load_similar else None
+            factors = self._load_factors(info) if self._load_factors else None
+            fallback = self._load_fallback(info) if self._load_fallback else None
+            model = LoadedModel(info, self._load_matrix, self._load_names(),
+                                self._load_neighbors(info), similar, factors, fallback)
+        model.mtime = mtime
+        model.load_seconds = timer.seconds
+        return model
+
+    def _swap(self, model):
+        # Canvi de referència: atòmic per als altres fils
+        self._model = model
+        self._mtime = model.mtime
+        _publish_model_metrics(model)
+
+    def _current_mtime(self):
+        if self._watch_path is None:
+            return None
+        try:
+            return os.stat(self._watch_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _changed_on_disk(self):
+        if self._watch_path is None:
+            return False
+        now = time.monotonic()
+        if now - self._last_check < self.CHECK_INTERVAL:
+            return False
+        self._last_check = now
+        mtime = self._current_mtime()
+        return mtime is not None and mtime != self._mtime
+
+
+def _publish_model_metrics(model):
+    MODEL_BYTES.clear()  # els fitxers depenen del tipus de model
+    for name, key in (("matrix", "artifact_path"), ("ids", "ids_path"), ("neighbors", "neighbors_path"),
+                      ("similar", "similar_path"), ("factors", "factors_path"), ("blocks", "blocks_path"),
+                      ("fallback", "fallback_path"), ("patch", "patch_path")):
+        path = model.info.get(key)
+        if path and os.path.exists(path):
+            MODEL_BYTES.set(os.path.getsize(path), file=name)
+    MODEL_ITEMS.set(len(model.item_ids))
+    MODEL_INFO.clear()
+    MODEL_INFO.set(1, version=model.version)
+    MODEL_LOADED_AT.set(time.time())
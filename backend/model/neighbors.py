@@ -0,0 +1,115 @@
+import numpy as np
+import scipy.sparse as sp
+
+
+class NeighborIndex:
+    """
+    Índex compacte amb els K veïns més correlacionats de cada anime.
+    Format tipus CSR: els veïns de l'item p són
+    indices[indptr[p]:indptr[p+1]] amb pesos weights[indptr[p]:indptr[p+1]].
+    """
+
+    def __init__(self, item_ids, indptr, indices, weights, k):
+        self.item_ids = item_ids
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.k = int(k)
+
+    def __len__(self):
+        return len(self.item_ids)
+
+    def neighbors(self, pos):
+        """(posicions, pesos) dels veïns de l'item a la posició pos"""
+        start, end = self.indptr[pos], self.indptr[pos + 1]
+        return self.indices[start:end], self.weights[start:end]
+
+    def matrix(self, binary=False):
+        """
+        L'índex com a matriu dispersa (items x items): la fila p té els veïns de p.
+        binary=True posa 1 a cada veí (per comptar cobertura).
+        """
+        data = np.ones_like(self.weights) if binary else self.weights
+        n = len(self.item_ids)
+        return sp.csr_matrix((data, self.indices, self.indptr), shape=(n, n))
+
+    def save(self, path):
+        np.savez(path, item_ids=self.item_ids, indptr=self.indptr,
+                 indices=self.indices, weights=self.weights, k=self.k)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data["item_ids"], data["indptr"], data["indices"],
+                   data["weights"], data["k"])
+
+
+def build_topk_index(values, item_ids, k, block_size=1024):
+    """
+    Construeix el NeighborIndex a partir de la matriu densa de correlacions.
+    Per a cada columna es queden els k valors més alts (sense NaN ni l'item mateix).
+    Es processa per blocs de columnes per no duplicar tota la matriu en memòria.
+    """
+    n = len(item_ids)
+    k = max(1, min(int(k), n - 1))
+    lists = []
+    for start in range(0, n, block_size):
+        lists.extend(_topk_lists(values, np.arange(start, min(start + block_size, n)), k))
+    return _from_lists(np.asarray(item_ids), lists, k)
+
+
+def replace_columns(index, values, cols, block_size=1024):
+    """
+    NeighborIndex nou on només es recalculen els veïns de les columnes cols
+    (posicions). La resta de llistes no es recorren: es copien els trams
+    contigus dels arrays de index que queden entre les columnes recalculades.
+    """
+    cols = np.unique(np.asarray(cols, dtype="int64"))
+    lists = []
+    for start in range(0, len(cols), block_size):
+        lists.extend(_topk_lists(values, cols[start:start + block_size], index.k))
+
+    counts = np.diff(index.indptr)
+    counts[cols] = [len(idx) for idx, _ in lists]
+    indptr = np.zeros(len(index) + 1, dtype="int64")
+    np.cumsum(counts, out=indptr[1:])
+
+    indices, weights, prev = [], [], 0
+    for pos, (idx, w) in zip(cols, lists):
+        start, end = index.indptr[prev], index.indptr[pos]
+        indices += [index.indices[start:end], idx]
+        weights += [index.weights[start:end], w]
+        prev = pos + 1
+    indices.append(index.indices[index.indptr[prev]:])
+    weights.append(index.weights[index.indptr[prev]:])
+    return NeighborIndex(index.item_ids, indptr, np.concatenate(indices).astype("int32"),
+                         np.concatenate(weights).astype("float32"), index.k)
+
+
+def _topk_lists(values, cols, k):
+    """Llista (posicions int32, pesos float32) dels top-k veïns de cada columna de cols"""
+    block = np.array(values[:, cols], dtype="float64")  # còpia: la modifiquem
+    block[cols, np.arange(len(cols))] = np.nan  # fora l'item mateix
+    block = np.where(np.isnan(block), -np.inf, block)
+
+    top = np.argpartition(-block, k - 1, axis=0)[:k]
+    top_w = np.take_along_axis(block, top, axis=0)
+
+    # Ordenem cada llista de veïns per pes descendent i traiem els -inf (NaN)
+    order = np.argsort(-top_w, axis=0, kind="stable")
+    top = np.take_along_axis(top, order, axis=0)
+    top_w = np.take_along_axis(top_w, order, axis=0)
+
+    lists = []
+    for j in range(len(cols)):
+        valid = np.isfinite(top_w[:, j])
+        lists.append((top[valid, j].astype("int32"), top_w[valid, j].astype("float32")))
+    return lists
+
+
+def _from_lists(item_ids, lists, k):
+    indptr = np.zeros(len(lists) + 1, dtype="int64")
+    np.cumsum([len(idx) for idx, _ in lists], out=indptr[1:])
+    indices = np.concatenate([idx for idx, _ in lists]) if lists else np.empty(0, dtype="int32")
+    weights = np.concatenate([w for _, w in lists]) if lists else np.empty(0, dtype="float32")
+    return NeighborIndex(item_ids, indptr, indices.astype("int32"), weights.astype("float32"), k)
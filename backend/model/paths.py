@@ -0,0 +1,22 @@
+import os
+
+# CONFIGURACIÓ DE RUTES (ajustada al teu projecte)
+# Mòdul a part (sense pandas ni NumPy) perquè l'API les pugui llegir sense
+# importar tot el model
+
+# Aquesta línia obté el directori "backend/"
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+
+# Carpeta de dades i models dins backend/ (es poden canviar amb variables d'entorn,
+# per exemple per entrenar amb dades sintètiques sense tocar les reals)
+DATA_DIR = os.environ.get("ANIMATCH_DATA_DIR", os.path.join(BASE_DIR, "data"))
+MODELS_DIR = os.environ.get("ANIMATCH_MODELS_DIR", os.path.join(BASE_DIR, "models"))
+
+# Fitxers de model (cada entrenament en crea de nous, veure artifact_paths)
+CURRENT_MODEL = os.path.join(MODELS_DIR, "current_model.json")
+VERSIONS_DIR = os.path.join(MODELS_DIR, "versions")  # un directori per versió (registry.py)
+ANIME_CSV = os.path.join(DATA_DIR, "anime.csv")
+RATING_CSV = os.path.join(DATA_DIR, "rating.csv")
+CACHE_DIR = os.path.join(DATA_DIR, "cache")   # còpia binària de rating.csv
+STAGE_CACHE_DIR = os.path.join(CACHE_DIR, "stages")  # sortides dels passos de l'entrenament (pipeline.py)
+STATS_DIR = os.path.join(MODELS_DIR, "stats")  # estadístiques per a actualitzacions incrementals
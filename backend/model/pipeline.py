@@ -0,0 +1,136 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+STAGE_CACHE_KEEP = 2    # sortides que es guarden de cada pas (les més recents)
+
+log = logging.getLogger("animatch.model")
+
+
+# PASSOS DE L'ENTRENAMENT (funcions pures: tot el que fan depèn dels paràmetres)
+def filter_items(ratings, min_ratings):
+    """Només les valoracions dels animes amb almenys min_ratings valoracions"""
+    counts = ratings["anime_id"].value_counts()
+    valid = counts[counts >= min_ratings].index
+    filtered = ratings[ratings["anime_id"].isin(valid)]
+    log.info("Filtre d'animes", extra={"min_ratings": min_ratings,
+                                       "items_before": len(counts), "items_after": len(valid),
+                                       "rows": len(filtered)})
+    return filtered
+
+
+def filter_users(ratings, min_ratings, max_quantile=0.99):
+    """
+    Només els usuaris amb almenys min_ratings valoracions i, d'aquests, no
+    més de les del percentil max_quantile (treu els que ho valoren tot)
+    """
+    counts = ratings["user_id"].value_counts()
+    ratings = ratings[ratings["user_id"].isin(counts[counts >= min_ratings].index)]
+
+    counts = ratings["user_id"].value_counts()
+    max_ratings = int(counts.quantile(max_quantile)) if not counts.empty else 999999
+    valid = counts[(counts >= min_ratings) & (counts <= max_ratings)].index
+    ratings = ratings[ratings["user_id"].isin(valid)]
+    log.info("Filtre d'usuaris", extra={"min_ratings": min_ratings, "max_ratings": max_ratings,
+                                        "users": len(valid), "rows": len(ratings)})
+    return ratings
+
+
+def csv_key(path):
+    """Identifica la versió d'un CSV (mida i data de modificació), com la cache de ingest"""
+    st = os.stat(path)
+    return f"{st.st_size}_{st.st_mtime_ns}"
+
+
+# CACHE DELS PASSOS
+class StageCache:
+    """
+    Sortides dels passos de l'entrenament a disc (root/<pas>_<clau>/), on la
+    clau és un hash de les entrades del pas: les claus dels passos anteriors
+    i els paràmetres. Si es torna a entrenar canviant només un paràmetre,
+    els passos d'abans es llegeixen de la cache i només es recalculen el seu
+    pas i els següents.
+    Cada sortida és un diccionari d'arrays (.npy, els grans es llegeixen amb
+    memmap) o matrius disperses (.npz). De cada pas es guarden les
+    STAGE_CACHE_KEEP sortides més recents.
+    """
+
+    def __init__(self, root, enabled=True, keep=STAGE_CACHE_KEEP):
+        self.root = root
+        self.enabled = enabled
+        self.keep = keep
+
+    @staticmethod
+    def key(stage, **inputs):
+        text = json.dumps({"stage": stage, **inputs}, sort_keys=True, default=str)
+        return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+    def has(self, stage, inputs):
+        """Diu si la sortida del pas amb aquestes entrades ja és a la cache"""
+        return self.enabled and os.path.isdir(os.path.join(self.root, f"{stage}_{self.key(stage, **inputs)}"))
+
+    def run(self, stage, inputs, compute, refresh=False):
+        """
+        Sortida del pas (de la cache o calculada amb compute(), que retorna
+        un diccionari d'arrays) i la seva clau, per encadenar-la al pas següent.
+        refresh=True el calcula igualment (i en guarda el resultat).
+        """
+        key = self.key(stage, **inputs)
+        if not self.enabled:
+            return compute(), key
+        path = os.path.join(self.root, f"{stage}_{key}")
+        if not refresh and os.path.isdir(path):
+            log.info("Pas llegit de la cache", extra={"stage": stage, "key": key})
+            os.utime(path)  # els més usats són els últims d'esborrar
+            return _read_outputs(path), key
+
+        outputs = compute()
+        _write_outputs(path, outputs)
+        self._prune(stage)
+        return outputs, key
+
+    def _prune(self, stage):
+        entries = [os.path.join(self.root, name) for name in os.listdir(self.root)
+                   if name.startswith(stage + "_") and not name.endswith(".tmp")]
+        entries.sort(key=os.path.getmtime)
+        for old in entries[:max(0, len(entries) - self.keep)]:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def ratings_outputs(ratings):
+    return {name: ratings[name].to_numpy() for name in ("user_id", "anime_id", "rating")}
+
+
+def ratings_frame(outputs):
+    return pd.DataFrame({name: outputs[name] for name in ("user_id", "anime_id", "rating")}, copy=False)
+
+
+def _write_outputs(path, outputs):
+    """Escriu en un directori temporal i el reanomena (mai queda a mitges)"""
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for name, value in outputs.items():
+        if sp.issparse(value):
+            sp.save_npz(os.path.join(tmp_path, f"{name}.npz"), value, compressed=False)
+        else:
+            np.save(os.path.join(tmp_path, f"{name}.npy"), value)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def _read_outputs(path):
+    outputs = {}
+    for name in os.listdir(path):
+        base, ext = os.path.splitext(name)
+        if ext == ".npz":
+            outputs[base] = sp.load_npz(os.path.join(path, name))
+        elif ext == ".npy":
+            outputs[base] = np.load(os.path.join(path, name), mmap_mode="r")
+    return outputs
@@ -0,0 +1,139 @@
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:  # opcional: sense zstandard es comprimeix amb zlib
+    zstandard = None
+
+# Matriu de correlacions quantitzada: int8 (valor * 127, NaN = -128) per blocs
+# de columnes comprimits per separat, per descomprimir només els que calen
+BLOCK_COLS = 256        # columnes per bloc
+CACHE_BLOCKS = 16       # blocs descomprimits (int8) que es guarden en memòria
+NAN_CODE = -128
+SCALE = 127.0
+
+
+def default_codec():
+    return "zstd" if zstandard is not None else "zlib"
+
+
+def save_matrix_quantized(values, item_ids, path, blocks_path, ids_path, block_cols=BLOCK_COLS, codec=None):
+    """
+    Guarda la matriu (items x items, simètrica i dins [-1, 1]) quantitzada a
+    int8 per blocs de columnes comprimits amb zstd (o zlib si no hi és).
+    A blocks_path es guarden els offsets de cada bloc dins path.
+    Retorna la capçalera per a current_model.json.
+    """
+    codec = codec or default_codec()
+    compress = _compressor(codec)
+    n = values.shape[1]
+    offsets = [0]
+    with open(path, "wb") as f:
+        for start in range(0, n, block_cols):
+            block = np.asarray(values[:, start:start + block_cols], dtype="float32")
+            q = np.where(np.isnan(block), NAN_CODE, np.rint(np.clip(block, -1, 1) * SCALE)).astype("int8")
+            data = compress(np.ascontiguousarray(q.T).tobytes())  # columna a columna
+            f.write(data)
+            offsets.append(offsets[-1] + len(data))
+    np.save(blocks_path, np.asarray(offsets, dtype="int64"))
+    np.save(ids_path, np.asarray(item_ids, dtype="int64"))
+    return {
+        "format": "quant8",
+        "artifact_path": path,
+        "blocks_path": blocks_path,
+        "ids_path": ids_path,
+        "shape": list(values.shape),
+        "dtype": "int8",
+        "codec": codec,
+        "block_cols": block_cols,
+    }
+
+
+class BlockMatrix:
+    """
+    Lectura d'una matriu guardada amb save_matrix_quantized. Es comporta com
+    un array (shape, m[:, columnes], m[fila, columnes], np.asarray(m)) però
+    només descomprimeix els blocs de les columnes que es demanen; els últims
+    CACHE_BLOCKS blocs es guarden descomprimits.
+    """
+
+    def __init__(self, path, blocks_path, shape, codec, block_cols, cache_blocks=CACHE_BLOCKS):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype("float32")
+        self.ndim = 2
+        self.block_cols = int(block_cols)
+        self._data = np.memmap(path, dtype="uint8", mode="r")
+        self._offsets = np.load(blocks_path)
+        self._decompress = _decompressor(codec)
+        self._cache = OrderedDict()
+        self._cache_blocks = cache_blocks
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_info(cls, info):
+        return cls(info["artifact_path"], info["blocks_path"], info["shape"], info["codec"], info["block_cols"])
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        rows, cols = key if isinstance(key, tuple) else (key, slice(None))
+        scalar_col = np.isscalar(cols)
+        cols = np.arange(self.shape[1])[cols] if isinstance(cols, slice) else np.atleast_1d(cols)
+        out = np.empty((len(cols), self.shape[0]), dtype="int8")
+        block_of = cols // self.block_cols
+        for b in np.unique(block_of):
+            sel = block_of == b
+            out[sel] = self._block(int(b))[cols[sel] - b * self.block_cols]
+        values = _dequantize(out).T[rows]
+        return values[..., 0] if scalar_col else values
+
+    def __array__(self, dtype=None, copy=None):
+        values = self[:, :]
+        return values if dtype is None else values.astype(dtype)
+
+    def _block(self, b):
+        """Columnes del bloc b (columnes x files) en int8"""
+        with self._lock:
+            block = self._cache.get(b)
+            if block is not None:
+                self._cache.move_to_end(b)
+                return block
+        raw = self._decompress(self._data[self._offsets[b]:self._offsets[b + 1]].tobytes())
+        block = np.frombuffer(raw, dtype="int8").reshape(-1, self.shape[0])
+        with self._lock:
+            self._cache[b] = block
+            while len(self._cache) > self._cache_blocks:
+                self._cache.popitem(last=False)
+        return block
+
+
+def _dequantize(q):
+    values = q.astype("float32") / SCALE
+    values[q == NAN_CODE] = np.nan
+    return values
+
+
+def _compressor(codec):
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("Cal el paquet zstandard per comprimir amb zstd (pip install zstandard)")
+        return zstandard.ZstdCompressor(level=3).compress
+    if codec == "zlib":
+        return lambda data: zlib.compress(data, 6)
+    raise ValueError(f"Compressió desconeguda: {codec}")
+
+
+def _decompressor(codec):
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("El model està comprimit amb zstd: cal el paquet zstandard (pip install zstandard)")
+        # Un descompressor per crida: no es poden compartir entre fils
+        return lambda data: zstandard.ZstdDecompressor().decompress(data)
+    if codec == "zlib":
+        return zlib.decompress
+    raise ValueError(f"Compressió desconeguda: {codec}")
@@ -0,0 +1,167 @@
+import json
+import os
+import shutil
+import time
+import zlib
+
+MANIFEST = "manifest.json"
+CHECKSUM_CHUNK = 8 * 1024 * 1024
+
+
+class ModelRegistry:
+    """
+    Versions del model, cadascuna al seu directori (root/<versió>/) amb els
+    fitxers i un manifest.json: dades d'entrenament, paràmetres, temps, mida
+    i checksum (CRC32) de cada fitxer, i el current_model.json de la versió.
+    Activar una versió (rollback) només reescriu current_model.json: la API
+    la carrega sola. prune() esborra les versions velles que no s'usen.
+    """
+
+    def __init__(self, root, read_info, write_info):
+        self.root = root
+        self._read_info = read_info     # llegeix current_model.json
+        self._write_info = write_info   # l'escriu (de forma atòmica)
+
+    def version_dir(self, version):
+        return os.path.join(self.root, str(version))
+
+    def create(self, version):
+        """
+        Crea el directori (buit) d'una versió nova. FileExistsError si ja
+        existeix: mai s'escriu sobre una versió, perquè els seus fitxers poden
+        estar mapats en memòria per altres processos.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        os.mkdir(self.version_dir(version))
+
+    def write_manifest(self, version, info, reuse=None, **fields):
+        """
+        Escriu el manifest de la versió (info és el seu current_model.json).
+        reuse: "files" d'un altre manifest; els fitxers que hi són amb la
+        mateixa ruta i mida no es tornen a llegir per calcular el checksum
+        (update_model reaprofita la matriu de la versió anterior).
+        fields: la resta de camps (data, params, timings, parent, ...).
+        Retorna el manifest.
+        """
+        known = {entry["path"]: entry for entry in (reuse or {}).values()}
+        files = {}
+        for key, path in info.items():
+            if key.endswith("_path") and isinstance(path, str) and os.path.isfile(path):
+                size = os.path.getsize(path)
+                entry = known.get(path)
+                files[key[:-len("_path")]] = {"path": path, "bytes": size,
+                                              "crc32": entry["crc32"] if entry and entry["bytes"] == size
+                                              else file_checksum(path)}
+        manifest = {
+            "version": version,
+            "model_type": info.get("model_type", "corr"),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            **fields,
+            "files": files,
+            "bytes": sum(f["bytes"] for f in files.values()),
+            "info": info,
+        }
+        path = os.path.join(self.version_dir(version), MANIFEST)
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f, indent=4)
+        os.replace(path + ".tmp", path)
+        return manifest
+
+    def manifest(self, version):
+        """Manifest d'una versió (None si no existeix o no es va acabar d'entrenar)"""
+        path = os.path.join(self.version_dir(version), MANIFEST)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def versions(self):
+        """Manifests de totes les versions, de la més antiga a la més nova"""
+        if not os.path.isdir(self.root):
+            return []
+        manifests = (self.manifest(name) for name in sorted(os.listdir(self.root)))
+        return [m for m in manifests if m is not None]
+
+    def current_version(self):
+        try:
+            return self._read_info().get("model_version")
+        except FileNotFoundError:
+            return None
+
+    def check(self, info, full=False):
+        """
+        Comprova els fitxers de la versió d'info contra el seu manifest: mida
+        (ràpid, es fa a cada càrrega) i, si full, també el checksum.
+        Retorna la llista de problemes (buida si tot és correcte o si la
+        versió és d'abans del registre i no té manifest).
+        """
+        manifest = self.manifest(info.get("model_version"))
+        if manifest is None:
+            return []
+        problems = []
+        for name, entry in manifest["files"].items():
+            path = entry["path"]
+            if not os.path.exists(path):
+                problems.append(f"{name}: no existeix {path}")
+            elif os.path.getsize(path) != entry["bytes"]:
+                problems.append(f"{name}: mida {os.path.getsize(path)}, s'esperava {entry['bytes']}")
+            elif full and file_checksum(path) != entry["crc32"]:
+                problems.append(f"{name}: checksum incorrecte ({path})")
+        return problems
+
+    def activate(self, version):
+        """Fa que version sigui el model actual (comprovant abans tots els fitxers)"""
+        manifest = self.manifest(version)
+        if manifest is None:
+            raise ValueError(f"No existeix la versió {version} al registre")
+        problems = self.check(manifest["info"], full=True)
+        if problems:
+            raise ValueError(f"La versió {version} està malmesa: " + "; ".join(problems))
+        self._write_info(manifest["info"])
+        return manifest
+
+    def rollback(self, version=None):
+        """
+        Torna a una versió anterior: la indicada o, si no se'n diu cap, la
+        més nova de les anteriors a l'actual. Retorna el seu manifest.
+        """
+        if version is None:
+            current = self.current_version()
+            older = [m["version"] for m in self.versions() if current is None or m["version"] < current]
+            if not older:
+                raise ValueError("No hi ha cap versió anterior a l'actual")
+            version = older[-1]
+        return self.activate(version)
+
+    def prune(self, keep=3):
+        """
+        Esborra les versions més velles i en deixa keep (sense comptar
+        l'actual, que no s'esborra mai). Tampoc s'esborren les que tenen
+        fitxers que fan servir les que queden (la matriu de la versió
+        entrenada de les de update_model). Retorna les versions esborrades.
+        """
+        current = self.current_version()
+        manifests = self.versions()
+        versions = [m["version"] for m in manifests if m["version"] != current]
+        removed = versions[:max(0, len(versions) - keep)]
+        used = {os.path.dirname(os.path.abspath(f["path"]))
+                for m in manifests if m["version"] not in removed for f in m["files"].values()}
+        removed = [v for v in removed if os.path.abspath(self.version_dir(v)) not in used]
+        for version in removed:
+            shutil.rmtree(self.version_dir(version), ignore_errors=True)
+        return removed
+
+
+def data_fingerprint(path):
+    """Identifica les dades d'entrenament: mida, data de modificació i checksum del fitxer"""
+    st = os.stat(path)
+    return {"path": path, "bytes": st.st_size, "mtime": int(st.st_mtime), "crc32": file_checksum(path)}
+
+
+def file_checksum(path):
+    """CRC32 del fitxer (hex), llegit per trossos"""
+    crc = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHECKSUM_CHUNK), b""):
+            crc = zlib.crc32(chunk, crc)
+    return f"{crc:08x}"
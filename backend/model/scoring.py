@@ -0,0 +1,174 @@
+import numpy as np
+import scipy.sparse as sp
+
+
+# MOTOR DE PUNTUACIÓ (vectoritzat)
+def score_profile(matrix, item_ids, myRatings, top_n=10, allowed=None):
+    """
+    Puntua tot el perfil d'una passada amb NumPy.
+
+    matrix:   array 2D (items x items) amb les correlacions, NaN on no n'hi ha
+    item_ids: array amb l'anime_id de cada fila/columna de matrix
+    myRatings: diccionari {anime_id: rating}
+    allowed:  màscara booleana dels items que es poden recomanar (filtres), o None
+    Retorna (ids, scores) ordenats per score descendent (com a molt top_n)
+    """
+    positions, weights = _profile_positions(item_ids, myRatings)
+    if positions.size == 0:
+        return np.empty(0, dtype=item_ids.dtype), np.empty(0, dtype="float64")
+
+    # Columnes del perfil: suma ponderada ignorant NaN
+    cols = np.asarray(matrix[:, positions], dtype="float64")
+    valid = ~np.isnan(cols)
+    scores = np.where(valid, cols, 0.0) @ weights
+
+    # Només són candidats els items amb alguna correlació i no valorats
+    candidates = valid.any(axis=1)
+    candidates &= ~np.isin(item_ids, _rated_ids(myRatings, item_ids.dtype))
+
+    return top_k(scores, candidates, item_ids, top_n, allowed)
+
+
+def score_profile_topk(index, myRatings, top_n=10, allowed=None):
+    """
+    Igual que score_profile però a partir del NeighborIndex (top-K veïns).
+    Cost O(perfil x K) en lloc de O(perfil x items).
+    """
+    item_ids = index.item_ids
+    positions, weights = _profile_positions(item_ids, myRatings)
+    if positions.size == 0:
+        return np.empty(0, dtype=item_ids.dtype), np.empty(0, dtype="float64")
+
+    starts, ends = index.indptr[positions], index.indptr[positions + 1]
+    neigh = np.concatenate([index.indices[s:e] for s, e in zip(starts, ends)])
+    contrib = np.concatenate([
+        index.weights[s:e].astype("float64") * w for s, e, w in zip(starts, ends, weights)
+    ])
+
+    n = len(item_ids)
+    scores = np.bincount(neigh, weights=contrib, minlength=n)
+    candidates = np.bincount(neigh, minlength=n) > 0
+    candidates &= ~np.isin(item_ids, _rated_ids(myRatings, item_ids.dtype))
+
+    return top_k(scores, candidates, item_ids, top_n, allowed)
+
+
+def score_profile_factors(factors, myRatings, top_n=10, allowed=None):
+    """
+    Puntua el perfil amb el model de factors ("als"): fold-in del perfil
+    (mínims quadrats amb els items valorats) i un producte matriu-vector.
+    Tots els items no valorats són candidats; score és la nota prevista.
+    """
+    item_ids = factors.item_ids
+    positions, weights = _profile_positions(item_ids, myRatings)
+    if positions.size == 0:
+        return np.empty(0, dtype=item_ids.dtype), np.empty(0, dtype="float64")
+
+    scores = factors.predict(factors.fold_in(positions, weights))
+    candidates = np.ones(len(item_ids), dtype=bool)
+    candidates[positions] = False
+    return top_k(scores, candidates, item_ids, top_n, allowed)
+
+
+# PUNTUACIÓ PER LOTS (molts perfils alhora)
+def score_batch(model, profiles, top_n=10, exact=False, chunk_size=256):
+    """
+    Puntua molts perfils amb un sol producte de matrius per tros:
+    P (perfils x items, dispersa) per la matriu de veïns (o la densa si exact).
+    Genera (ids, scores) per a cada perfil, en el mateix ordre que profiles.
+    """
+    if model.factors is not None:
+        yield from _score_batch_factors(model.factors, profiles, top_n, chunk_size)
+        return
+    if model.neighbors is not None and not exact:
+        weights = model.neighbors.matrix()
+        covered = model.neighbors.matrix(binary=True)
+    else:
+        weights, covered = model.dense_filled()
+
+    for start in range(0, len(profiles), chunk_size):
+        P = _profile_matrix(model.item_ids, profiles[start:start + chunk_size])
+        Pb = P.copy()
+        Pb.data = np.ones_like(Pb.data)
+
+        # Puntuacions i cobertura (nombre de veïns que aporten) de tot el tros
+        S, C = _dense(P @ weights), _dense(Pb @ covered)
+        for row in range(P.shape[0]):
+            candidates = C[row] > 0
+            candidates[P.indices[P.indptr[row]:P.indptr[row + 1]]] = False
+            yield top_k(S[row], candidates, model.item_ids, top_n)
+
+
+def _score_batch_factors(factors, profiles, top_n, chunk_size):
+    """score_batch per al model "als": fold-in de cada perfil i un producte (perfils x items) per tros"""
+    item_ids = factors.item_ids
+    for start in range(0, len(profiles), chunk_size):
+        P = _profile_matrix(item_ids, profiles[start:start + chunk_size])
+        U = np.zeros((P.shape[0], factors.factors + 1))
+        for row in range(P.shape[0]):
+            cols = P.indices[P.indptr[row]:P.indptr[row + 1]]
+            if cols.size:
+                U[row] = factors.fold_in(cols, P.data[P.indptr[row]:P.indptr[row + 1]])
+
+        S = factors.predict_many(U)
+        for row in range(P.shape[0]):
+            cols = P.indices[P.indptr[row]:P.indptr[row + 1]]
+            candidates = np.full(len(item_ids), cols.size > 0)
+            candidates[cols] = False
+            yield top_k(S[row], candidates, item_ids, top_n)
+
+
+def _profile_matrix(item_ids, profiles):
+    """Matriu dispersa (perfils x items) amb els ratings (els animes fora del model no hi són)"""
+    rows, cols, vals = [np.empty(0, dtype="int64")], [np.empty(0, dtype="int64")], [np.empty(0)]
+    for row, myRatings in enumerate(profiles):
+        positions, weights = _profile_positions(item_ids, myRatings)
+        rows.append(np.full(len(positions), row))
+        cols.append(positions)
+        vals.append(weights)
+    return sp.csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+                         shape=(len(profiles), len(item_ids)))
+
+
+def _dense(M):
+    return np.asarray(M.toarray() if sp.issparse(M) else M, dtype="float64")
+
+
+def top_k(scores, candidates, item_ids, top_n, allowed=None):
+    """
+    Tria els top_n candidats amb argpartition (sense ordenar-ho tot).
+    allowed: màscara dels filtres, que s'aplica abans de triar
+    """
+    if allowed is not None:
+        candidates = candidates & allowed
+    cand_pos = np.flatnonzero(candidates)
+    if cand_pos.size == 0 or top_n <= 0:
+        return np.empty(0, dtype=item_ids.dtype), np.empty(0, dtype="float64")
+
+    cand_scores = scores[cand_pos]
+    if cand_pos.size > top_n:
+        # Es queden tots els empatats amb el top_n-èsim: així el top_n és sempre
+        # el principi del top d'un top_n més gran (pàgines estables)
+        kth = np.partition(-cand_scores, top_n - 1)[top_n - 1]
+        keep = ~(-cand_scores > kth)
+        cand_pos, cand_scores = cand_pos[keep], cand_scores[keep]
+
+    # Ordre final: score descendent i, en cas d'empat, anime_id ascendent
+    order = np.lexsort((item_ids[cand_pos], -cand_scores))[:top_n]
+    return item_ids[cand_pos[order]], cand_scores[order]
+
+
+def _profile_positions(item_ids, myRatings):
+    """Posicions (dins item_ids) i ratings dels animes del perfil que són al model"""
+    ids = _rated_ids(myRatings, item_ids.dtype)
+    ratings = np.fromiter(myRatings.values(), dtype="float64", count=len(myRatings))
+
+    # item_ids ve ordenat (columnes del pivot), així que podem fer searchsorted
+    pos = np.searchsorted(item_ids, ids)
+    pos = np.clip(pos, 0, max(len(item_ids) - 1, 0))
+    found = item_ids[pos] == ids if len(item_ids) else np.zeros(len(ids), dtype=bool)
+    return pos[found], ratings[found]
+
+
+def _rated_ids(myRatings, dtype):
+    return np.fromiter((int(a) for a in myRatings), dtype=dtype, count=len(myRatings))
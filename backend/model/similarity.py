@@ -0,0 +1,140 @@
+import numpy as np
+import scipy.sparse as sp
+
+# Paràmetres per defecte de l'índex de similitud
+EMBEDDING_DIM = 64      # dimensions dels vectors d'item
+N_PROBE = 8             # llistes (clústers) que es miren per consulta
+KMEANS_ITERS = 15       # iteracions de k-means en construir l'índex
+EXACT_MAX_ITEMS = 4096  # catàlegs petits: recórrer-los tots és igual de ràpid (i exacte)
+
+
+def item_vectors(R, dim=EMBEDDING_DIM, seed=0, oversample=10, power_iters=3):
+    """
+    Vectors d'item (un per columna de R, usuaris x animes) per a la cerca de
+    similars: les valoracions es centren per la mitjana de cada anime (com fa
+    Pearson) i es redueixen a dim dimensions amb una SVD aleatòria truncada.
+    Els vectors es normalitzen: el producte escalar és la similitud cosinus.
+    Retorna una matriu float32 (animes x dim).
+    """
+    X = sp.csc_matrix(R, dtype="float64", copy=True)
+    counts = np.diff(X.indptr)
+    sums = np.asarray(X.sum(axis=0)).ravel()
+    means = np.divide(sums, counts, out=np.zeros(X.shape[1]), where=counts > 0)
+    X.data -= np.repeat(means, counts)
+
+    n_users, n_items = X.shape
+    dim = max(1, min(dim, n_items - 1, n_users - 1))
+    # SVD aleatòria (Halko et al.): base ortonormal de la imatge de X amb unes
+    # quantes iteracions de potència, i SVD exacta de la projecció petita
+    rng = np.random.default_rng(seed)
+    Q = np.linalg.qr(X @ rng.standard_normal((n_items, dim + oversample)))[0]
+    for _ in range(power_iters):
+        Q = np.linalg.qr(X.T @ Q)[0]
+        Q = np.linalg.qr(X @ Q)[0]
+    _, s, vt = np.linalg.svd((X.T @ Q).T, full_matrices=False)
+    return normalize_rows((vt[:dim].T * s[:dim]).astype("float32"))
+
+
+def normalize_rows(vectors):
+    """Cada fila amb norma 1 (les files a zero es queden a zero), en float32"""
+    vectors = np.asarray(vectors, dtype="float32")
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+class SimilarityIndex:
+    """
+    Cerca aproximada dels animes més semblants a un altre (producte escalar
+    entre vectors normalitzats) amb un índex de llistes invertides (IVF):
+    els vectors s'agrupen amb k-means en ~sqrt(n) clústers i es guarden
+    contigus per clúster. Una consulta només puntua els items dels n_probe
+    clústers amb el centroide més proper (trams contigus, sense còpies).
+    """
+
+    def __init__(self, item_ids, centroids, offsets, list_items, list_vectors):
+        self.item_ids = item_ids            # anime_id de cada posició (ordenats)
+        self.centroids = centroids          # (clústers x dim)
+        self.offsets = offsets              # els items del clúster c són [offsets[c], offsets[c+1])
+        self.list_items = list_items        # posició de l'item de cada fila de list_vectors
+        self.list_vectors = list_vectors    # (items x dim) float32, agrupats per clúster
+        self.slot = np.empty(len(list_items), dtype="int64")
+        self.slot[list_items] = np.arange(len(list_items))  # posició -> fila de list_vectors
+
+    @classmethod
+    def build(cls, item_ids, vectors, n_lists=None, iters=KMEANS_ITERS, seed=0):
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        n = len(vectors)
+        n_lists = max(1, min(n, n_lists or int(round(np.sqrt(n)))))
+        centroids, labels = _kmeans(vectors, n_lists, iters, seed)
+        list_items = np.argsort(labels, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=n_lists))])
+        return cls(np.asarray(item_ids), centroids, offsets, list_items, vectors[list_items])
+
+    def __len__(self):
+        return len(self.item_ids)
+
+    @property
+    def vectors(self):
+        """Vectors en l'ordre de item_ids"""
+        return self.list_vectors[self.slot]
+
+    def position(self, anime_id):
+        """Posició de l'anime a l'índex (None si no hi és)"""
+        pos = int(np.searchsorted(self.item_ids, anime_id))
+        if pos < len(self.item_ids) and self.item_ids[pos] == anime_id:
+            return pos
+        return None
+
+    def query(self, pos, k=10, n_probe=N_PROBE, exact=False):
+        """
+        Els k items més semblants a l'item de la posició pos (sense ell mateix).
+        Retorna (posicions, similituds) ordenades de més a menys semblant.
+        exact=True compara amb tots els items (per mesurar el recall).
+        """
+        q = self.list_vectors[self.slot[pos]]
+        n_lists = len(self.centroids)
+        if exact or n_probe >= n_lists or len(self.item_ids) <= EXACT_MAX_ITEMS:
+            sims, candidates = self.list_vectors @ q, self.list_items
+        else:
+            probe = np.argpartition(-(self.centroids @ q), n_probe - 1)[:n_probe]
+            bounds = [slice(self.offsets[c], self.offsets[c + 1]) for c in probe]
+            sims = np.concatenate([self.list_vectors[b] @ q for b in bounds])
+            candidates = np.concatenate([self.list_items[b] for b in bounds])
+            if len(candidates) <= k:
+                return self.query(pos, k, exact=True)
+        sims = np.where(candidates == pos, -np.inf, sims)  # l'item mateix no
+        k = min(k, len(candidates) - 1)
+        if k <= 0:
+            return np.empty(0, dtype="int64"), np.empty(0, dtype="float32")
+        top = np.argpartition(-sims, k - 1)[:k]
+        best = top[np.argsort(-sims[top], kind="stable")]
+        return candidates[best], sims[best]
+
+    def save(self, path):
+        np.savez(path, item_ids=self.item_ids, centroids=self.centroids, offsets=self.offsets,
+                 list_items=self.list_items, list_vectors=self.list_vectors)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data["item_ids"], data["centroids"], data["offsets"],
+                   data["list_items"], data["list_vectors"])
+
+
+def _kmeans(vectors, n_clusters, iters, seed):
+    """k-means esfèric (similitud cosinus): (centroides normalitzats, clúster de cada vector)"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    labels = np.zeros(len(vectors), dtype="int64")
+    for _ in range(iters):
+        labels = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        empty = norms[:, 0] == 0
+        # Un clúster buit agafa un vector a l'atzar (així no es perden clústers)
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        norms[empty] = 1.0
+        centroids = (sums / norms).astype("float32")
+    labels = np.argmax(vectors @ centroids.T, axis=1)
+    return centroids, labels
@@ -0,0 +1,211 @@
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import scipy.sparse as sp
+
+
+# Estadístiques que es guarden per a les actualitzacions incrementals
+# (sy i syy no cal guardar-les: són les transposades de sx i sxx)
+STAT_NAMES = ("n", "sx", "sxx", "sxy")
+
+# Memòria aproximada (bytes) que deixem per a les estadístiques d'un bloc de columnes
+BLOCK_MEMORY = 256 * 1024 ** 2
+
+
+def build_rating_matrix(user_ids, anime_ids, ratings):
+    """
+    Codifica usuaris i animes com a enters i construeix la matriu dispersa
+    (usuaris x animes) de valoracions.
+    Retorna (R en format CSC, user_ids de cada fila, anime_ids ordenats de cada columna)
+    """
+    users, user_codes = np.unique(np.asarray(user_ids), return_inverse=True)
+    items, item_codes = np.unique(np.asarray(anime_ids), return_inverse=True)
+    R = sp.csc_matrix(
+        (np.asarray(ratings, dtype="float64"), (user_codes, item_codes)),
+        shape=(len(users), len(items)),
+    )
+    return R, users, items
+
+
+def rating_operands(R):
+    """
+    Prepara un sol cop les matrius que fan servir els productes per blocs:
+    R (valoracions), B (1 on hi ha valoració), R2 (valoracions al quadrat)
+    en CSC per tallar columnes, i les seves transposades en CSR.
+    """
+    R = sp.csc_matrix(R)
+    B = R.copy()
+    B.data = np.ones_like(B.data)
+    R2 = R.multiply(R).tocsc()
+    return {
+        "R": R, "B": B, "R2": R2,
+        "RT": R.T.tocsr(), "BT": B.T.tocsr(), "R2T": R2.T.tocsr(),
+    }
+
+
+def pair_stats(ops, cols):
+    """
+    Estadístiques suficients de Pearson entre tots els items i les columnes
+    cols, comptant només els usuaris que han valorat tots dos:
+    n (usuaris comuns), sx, sy, sxx, syy i sxy. Cada una és (items x len(cols)).
+    """
+    Rc, Bc, R2c = ops["R"][:, cols], ops["B"][:, cols], ops["R2"][:, cols]
+    return {
+        "n": (ops["BT"] @ Bc).toarray(),
+        "sx": (ops["RT"] @ Bc).toarray(),
+        "sy": (ops["BT"] @ Rc).toarray(),
+        "sxx": (ops["R2T"] @ Bc).toarray(),
+        "syy": (ops["BT"] @ R2c).toarray(),
+        "sxy": (ops["RT"] @ Rc).toarray(),
+    }
+
+
+def corr_from_stats(stats, min_periods):
+    """
+    Correlació de Pearson a partir de les estadístiques suficients.
+    NaN si hi ha menys de min_periods usuaris comuns o variància zero
+    (igual que DataFrame.corr). Com que les valoracions són enteres, les
+    sumes són exactes en float64.
+    """
+    n, sx, sy, sxx, syy, sxy = (np.asarray(stats[k], dtype="float64")
+                                 for k in ("n", "sx", "sy", "sxx", "syy", "sxy"))
+    num = n * sxy - sx * sy
+    var_x = n * sxx - sx ** 2
+    var_y = n * syy - sy ** 2
+    den = np.sqrt(np.clip(var_x, 0, None) * np.clip(var_y, 0, None))
+
+    corr = np.full(n.shape, np.nan)
+    valid = (n >= min_periods) & (den > 0)
+    corr[valid] = np.clip(num[valid] / den[valid], -1.0, 1.0)
+    return corr
+
+
+def column_blocks(n_items, block_size=None):
+    """Talla les columnes en blocs perquè les estadístiques càpiguen a BLOCK_MEMORY"""
+    if block_size is None:
+        # 6 matrius float64 (items x bloc) + la correlació
+        block_size = max(1, BLOCK_MEMORY // (7 * 8 * max(n_items, 1)))
+    return [np.arange(s, min(s + block_size, n_items)) for s in range(0, n_items, block_size)]
+
+
+def pearson_corr_sparse(R, min_periods, out=None, block_size=None, stats_dir=None):
+    """
+    Matriu (items x items) de correlacions de Pearson calculada per blocs de
+    columnes amb productes de matrius disperses, sense construir mai la taula
+    pivot densa (usuaris x items).
+    out: array (o memmap) on escriure el resultat; per defecte float32 nou.
+    stats_dir: si es dona, s'hi guarden també les estadístiques (STAT_NAMES)
+               per poder fer actualitzacions incrementals.
+    """
+    n_items = R.shape[1]
+    if out is None:
+        out = np.empty((n_items, n_items), dtype="float32")
+    stats_out = create_stats_files(stats_dir, n_items) if stats_dir else None
+
+    ops = rating_operands(R)
+    for cols in column_blocks(n_items, block_size):
+        stats = pair_stats(ops, cols)
+        out[:, cols[0]:cols[-1] + 1] = corr_from_stats(stats, min_periods)
+        _write_stats(stats_out, stats, cols)
+    return out
+
+
+def create_stats_files(stats_dir, n_items):
+    """Crea els .npy (int32, items x items) de les estadístiques, oberts com a memmap"""
+    os.makedirs(stats_dir, exist_ok=True)
+    return {
+        name: np.lib.format.open_memmap(os.path.join(stats_dir, f"{name}.npy"), mode="w+",
+                                        dtype="int32", shape=(n_items, n_items))
+        for name in STAT_NAMES
+    }
+
+
+def open_stats_files(stats_dir, mode="r"):
+    return {name: np.load(os.path.join(stats_dir, f"{name}.npy"), mmap_mode=mode)
+            for name in STAT_NAMES}
+
+
+def _write_stats(stats_out, stats, cols):
+    # Les valoracions són enteres, així que les sumes ho són i caben en int32
+    if stats_out is None:
+        return
+    for name in STAT_NAMES:
+        stats_out[name][:, cols[0]:cols[-1] + 1] = np.rint(stats[name])
+        stats_out[name].flush()
+
+
+# ENTRENAMENT EN PARAL·LEL (ProcessPoolExecutor)
+
+# Estat de cada procés worker: operands i sortida oberts com a memmap
+_WORKER = None
+
+
+def pearson_corr_parallel(R, min_periods, out_path, workers, block_size=None, stats_dir=None):
+    """
+    Com pearson_corr_sparse però repartint els blocs de columnes entre
+    `workers` processos. Els operands es guarden un sol cop en .npy i cada
+    worker els obre amb mmap (no es serialitzen per tasca); cada bloc s'escriu
+    directament al fitxer de sortida out_path (float32 en cru).
+    stats_dir: com a pearson_corr_sparse (cada worker hi escriu el seu bloc).
+    Retorna (memmap de només lectura amb el resultat, temps de cada bloc)
+    """
+    n_items = R.shape[1]
+    shape = (n_items, n_items)
+    np.memmap(out_path, dtype="float32", mode="w+", shape=shape).flush()
+    if stats_dir:
+        create_stats_files(stats_dir, n_items)
+
+    tmp_dir = tempfile.mkdtemp(prefix="animatch_ops_", dir=os.path.dirname(out_path) or None)
+    try:
+        _save_operands(rating_operands(R), tmp_dir)
+        blocks = column_blocks(n_items, block_size)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(tmp_dir, out_path, shape, min_periods, stats_dir)) as pool:
+            block_times = list(pool.map(_corr_block_task, [(b[0], b[-1] + 1) for b in blocks]))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return np.memmap(out_path, dtype="float32", mode="r", shape=shape), block_times
+
+
+def _save_operands(ops, tmp_dir):
+    for name, M in ops.items():
+        np.save(os.path.join(tmp_dir, f"{name}_data.npy"), M.data)
+        np.save(os.path.join(tmp_dir, f"{name}_indices.npy"), M.indices)
+        np.save(os.path.join(tmp_dir, f"{name}_indptr.npy"), M.indptr)
+        np.save(os.path.join(tmp_dir, f"{name}_shape.npy"), np.array(M.shape))
+
+
+def _load_operands(tmp_dir):
+    ops = {}
+    for name in ("R", "B", "R2", "RT", "BT", "R2T"):
+        parts = [np.load(os.path.join(tmp_dir, f"{name}_{p}.npy"), mmap_mode="r")
+                 for p in ("data", "indices", "indptr")]
+        shape = tuple(np.load(os.path.join(tmp_dir, f"{name}_shape.npy")))
+        cls = sp.csr_matrix if name.endswith("T") else sp.csc_matrix
+        ops[name] = cls(tuple(parts), shape=shape, copy=False)
+    return ops
+
+
+def _init_worker(tmp_dir, out_path, shape, min_periods, stats_dir):
+    global _WORKER
+    _WORKER = {
+        "ops": _load_operands(tmp_dir),
+        "out": np.memmap(out_path, dtype="float32", mode="r+", shape=shape),
+        "stats": open_stats_files(stats_dir, mode="r+") if stats_dir else None,
+        "min_periods": min_periods,
+    }
+
+
+def _corr_block_task(bounds):
+    start, end = bounds
+    t0 = time.perf_counter()
+    stats = pair_stats(_WORKER["ops"], np.arange(start, end))
+    _WORKER["out"][:, start:end] = corr_from_stats(stats, _WORKER["min_periods"])
+    _WORKER["out"].flush()
+    _write_stats(_WORKER["stats"], stats, np.arange(start, end))
+    return time.perf_counter() - t0
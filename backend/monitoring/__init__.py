@@ -0,0 +1,7 @@
+"""
+Instrumentación compartida por la API, el modelo y el DAO: métricas en el
+formato de Prometheus (REGISTRY, se exportan en /metrics) y logs estructurados.
+Las métricas son por proceso: con varios workers, cada uno exporta las suyas.
+"""
+from monitoring.logs import setup_logging
+from monitoring.metrics import REGISTRY, Counter, Gauge, Histogram
@@ -0,0 +1,71 @@
+import json
+import logging
+import os
+import sys
+import time
+
+# Atributos que tiene cualquier LogRecord: lo demás son campos que se pasaron con extra={...}
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def record_fields(record):
+    """Campos estructurados de un registro (los que se pasaron con extra={...})."""
+    return {k: v for k, v in vars(record).items() if k not in _STANDARD_ATTRS and not k.startswith("_")}
+
+
+class TextFormatter(logging.Formatter):
+    """2026-01-01 12:00:00 INFO animatch.model: Llegint dades rows=123 seconds=0.5"""
+
+    def format(self, record):
+        line = "{} {} {}: {}".format(
+            time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created)),
+            record.levelname, record.name, record.getMessage())
+        fields = record_fields(record)
+        if fields:
+            line += " " + " ".join(f"{k}={_text_value(v)}" for k, v in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro (para recogerlos con Loki, ELK, ...)."""
+
+    def format(self, record):
+        data = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **record_fields(record),
+        }
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def setup_logging(level=None, fmt=None):
+    """
+    Configura el logger "animatch" (API, modelo, DAO) una sola vez:
+    nivel ANIMATCH_LOG_LEVEL (INFO) y formato ANIMATCH_LOG_FORMAT (text | json).
+    """
+    logger = logging.getLogger("animatch")
+    if getattr(logger, "_animatch_configured", False):
+        return logger
+    level = level or os.environ.get("ANIMATCH_LOG_LEVEL", "INFO")
+    fmt = fmt or os.environ.get("ANIMATCH_LOG_FORMAT", "text")
+
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    logger.addHandler(handler)
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    logger.propagate = False
+    logger._animatch_configured = True
+    return logger
+
+
+def _text_value(value):
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    text = str(value)
+    return json.dumps(text, ensure_ascii=False) if (" " in text or not text) else text
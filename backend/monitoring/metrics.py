@@ -0,0 +1,206 @@
+import bisect
+import contextlib
+import math
+import threading
+import time
+
+# Límites (segundos) de los histogramas de latencia: de medio milisegundo a minutos
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}  # tupla de valores de las etiquetas -> valor
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: etiquetas {sorted(labels)}, se esperaban {list(self.labelnames)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """[(sufijo, etiquetas, valor), ...] para el formato de Prometheus"""
+        with self._lock:
+            items = list(self._values.items())
+        return [("", dict(zip(self.labelnames, key)), value) for key, value in items]
+
+
+class Counter(_Metric):
+    """Contador que solo sube (peticiones, errores, ...)."""
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Valor que sube y baja (tamaño del modelo, entradas de una caché, ...)."""
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels))
+
+    def clear(self):
+        """Borra todas las series (por ejemplo, la versión anterior del modelo)"""
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram(_Metric):
+    """Distribución de duraciones (u otros valores) en buckets acumulados."""
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            state["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def time(self, **labels):
+        """Mide lo que tarda un bloque (with) o una función (decorador)."""
+        return _Timer(self, labels)
+
+    def snapshot(self, **labels):
+        """{"count", "sum"} de unas etiquetas (None si aún no hay observaciones)"""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return None if state is None else {"count": state["count"], "sum": state["sum"]}
+
+    def samples(self):
+        with self._lock:
+            items = [(key, dict(state, counts=list(state["counts"]))) for key, state in self._values.items()]
+        out = []
+        for key, state in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), state["counts"]):
+                cumulative += count
+                out.append(("_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            out.append(("_sum", labels, state["sum"]))
+            out.append(("_count", labels, state["count"]))
+        return out
+
+
+class _Timer(contextlib.ContextDecorator):
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+        self.seconds = None
+
+    def _recreate_cm(self):
+        # Como decorador, cada llamada necesita su propio temporizador (hilos)
+        return _Timer(self.histogram, self.labels)
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self._t0
+        self.histogram.observe(self.seconds, **self.labels)
+        return False
+
+
+class Registry:
+    """
+    Métricas del proceso. counter/gauge/histogram devuelven la métrica ya
+    existente si se vuelve a pedir el mismo nombre (los módulos se pueden
+    importar varias veces sin duplicarlas).
+    Los collectors son funciones que se llaman al exportar y devuelven
+    métricas calculadas en ese momento (por ejemplo, las estadísticas de una caché).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._collectors = []
+
+    def counter(self, name, help, labelnames=()):
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def gauge(self, name, help, labelnames=()):
+        return self._get_or_create(Gauge, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get_or_create(Histogram, name, help, labelnames, buckets=buckets)
+
+    def add_collector(self, collector):
+        """collector() -> [(nombre, tipo, ayuda, [(etiquetas, valor), ...]), ...]"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def _get_or_create(self, cls, name, help, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"La métrica {name} ya existe con otro tipo")
+            return metric
+
+    def render(self):
+        """Todas las métricas en el formato de texto de Prometheus (0.0.4)."""
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+            collectors = list(self._collectors)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labels, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        for collector in collectors:
+            for name, kind, help, samples in collector():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value):
+    if value is None:
+        return "NaN"
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+
+# Registro único del proceso (API, model.py, DAO, ...)
+REGISTRY = Registry()
@@ -0,0 +1,113 @@
+"""
+Configuración común de los tests (python -m pytest -q tests, desde backend/).
+
+Las rutas del modelo (model/paths.py) se leen al importarlo, así que antes de
+importar nada se apuntan ANIMATCH_DATA_DIR y ANIMATCH_MODELS_DIR a un
+directorio temporal: los tests nunca tocan backend/data ni backend/models.
+El dataset es sintético (bench/generate_data.py) y pequeño.
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [BACKEND_DIR, os.path.join(BACKEND_DIR, "api"), os.path.join(BACKEND_DIR, "bench")]
+
+WORK_DIR = tempfile.mkdtemp(prefix="animatch-tests-")
+os.environ.update(ANIMATCH_DATA_DIR=os.path.join(WORK_DIR, "data"),
+                  ANIMATCH_MODELS_DIR=os.path.join(WORK_DIR, "models"),
+                  ANIMATCH_WARMUP="off", ANIMATCH_LOG_LEVEL="WARNING")
+
+# Como lo importa la API (model.model); model.py añade backend/model a sys.path,
+# así que los tests importan el resto de módulos del modelo directamente
+from model import model as model_module  # noqa: E402
+
+MIN_PERIODS = 5
+MIN_RATINGS_ITEM = 10
+ADMIN = {"id": 1, "username": "admin", "password": "secreto", "role": "admin"}
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def model_mod():
+    return model_module
+
+
+@pytest.fixture(scope="session")
+def train_kwargs():
+    """Parámetros de train_model para el dataset de los tests (filtros a su escala)"""
+    return {"model_type": "corr", "min_ratings_item": MIN_RATINGS_ITEM, "min_periods": MIN_PERIODS}
+
+
+@pytest.fixture(scope="session")
+def data_dir():
+    """anime.csv y rating.csv sintéticos (200 animes, 600 usuarios)"""
+    from generate_data import generate
+    generate(model_module.DATA_DIR, 30_000, n_items=200, n_users=600, seed=0)
+    return model_module.DATA_DIR
+
+
+@pytest.fixture(scope="session")
+def ratings(data_dir):
+    """Valoraciones limpias (sin -1 ni pares repetidos), como las deja ingest.load_ratings"""
+    import pandas as pd
+    df = pd.read_csv(os.path.join(data_dir, "rating.csv"))
+    return df[df["rating"] != -1].drop_duplicates(["user_id", "anime_id"])
+
+
+@pytest.fixture(scope="session")
+def pandas_corr(ratings):
+    """Correlaciones de referencia: pivot_table + DataFrame.corr (el entrenamiento original)"""
+    return ratings.pivot_table(index="user_id", columns="anime_id", values="rating") \
+        .corr(method="pearson", min_periods=MIN_PERIODS)
+
+
+@pytest.fixture(scope="session")
+def trained(data_dir, train_kwargs):
+    """Modelo "corr" entrenado con estadísticas; devuelve su current_model.json"""
+    model_module.train_model(keep_stats=True, **train_kwargs)
+    return model_module.read_model_info()
+
+
+@pytest.fixture
+def restore_model(trained):
+    """Para los tests que cambian el modelo actual: al acabar vuelve a activar el entrenado"""
+    yield trained
+    with open(model_module.CURRENT_MODEL + ".tmp", "w") as f:
+        json.dump(trained, f)
+    os.replace(model_module.CURRENT_MODEL + ".tmp", model_module.CURRENT_MODEL)
+    model_module.MODEL_STORE.reload()
+
+
+@pytest.fixture
+def loaded(trained):
+    """LoadedModel del modelo entrenado"""
+    return model_module.MODEL_STORE.reload()
+
+
+@pytest.fixture(scope="session")
+def api_module(trained):
+    """api/api.py ya importada, con el modelo entrenado como modelo actual"""
+    import api
+    return api
+
+
+@pytest.fixture
+def client(api_module, loaded, monkeypatch):
+    """Cliente de pruebas de Flask; en lugar de la base de datos solo existe el usuario ADMIN"""
+    monkeypatch.setattr(api_module.AnimatchDAO, "get_user_by_username",
+                        staticmethod(lambda username, conn=None:
+                                     dict(ADMIN) if username == ADMIN["username"] else None))
+    return api_module.app.test_client()
+
+
+@pytest.fixture
+def admin():
+    return {"username": ADMIN["username"], "password": ADMIN["password"]}
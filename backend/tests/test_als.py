@@ -0,0 +1,98 @@
+"""
+Modelo de factorización (als.py y model_type="als"): entrenamiento, fold-in
+de un perfil nuevo y recomendaciones con el modelo entrenado.
+"""
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+from als import FactorModel, train_als
+from scoring import score_profile_factors
+
+
+@pytest.fixture(scope="module")
+def low_rank():
+    """Valoraciones de rango 3 (más ruido pequeño) con un 40 % de huecos"""
+    rng = np.random.default_rng(0)
+    users, items = rng.standard_normal((300, 3)), rng.standard_normal((60, 3))
+    full = np.clip(6 + users @ items.T + 0.1 * rng.standard_normal((300, 60)), 1, 10)
+    mask = rng.random(full.shape) < 0.6
+    return sp.csr_matrix(np.where(mask, full, 0)), full, mask
+
+
+@pytest.fixture(scope="module")
+def factors(low_rank):
+    R, _, _ = low_rank
+    history = []
+    model = train_als(R, np.arange(100, 160), factors=3, reg=0.01, iters=8,
+                      progress=lambda it, rmse: history.append(rmse))
+    return model, history
+
+
+def test_training_converges(factors):
+    model, history = factors
+    assert len(history) == 8
+    assert history[-1] < history[0] and history[-1] < 0.3
+    assert model.item_factors.shape == (60, 3) and model.item_factors.dtype == np.float32
+    assert model.item_bias.dtype == np.float32 and model.factors == 3 and len(model) == 60
+
+
+def test_fold_in_predicts_the_missing_ratings(low_rank, factors):
+    _, full, mask = low_rank
+    model, _ = factors
+    errors = []
+    for u in range(20):
+        rated = np.flatnonzero(mask[u])
+        predicted = model.predict(model.fold_in(rated, full[u, rated]))
+        missing = np.flatnonzero(~mask[u])
+        errors.append(predicted[missing] - full[u, missing])
+    assert np.sqrt(np.mean(np.concatenate(errors) ** 2)) < 0.5
+
+
+def test_predict_many_matches_predict(factors):
+    model, _ = factors
+    rng = np.random.default_rng(1)
+    users = [model.fold_in(rng.choice(60, 10, replace=False), rng.integers(1, 11, 10)) for _ in range(4)]
+    np.testing.assert_allclose(model.predict_many(users), [model.predict(u) for u in users], rtol=1e-5)
+
+
+def test_save_load(factors, tmp_path):
+    model, _ = factors
+    path = str(tmp_path / "als.npz")
+    model.save(path)
+    loaded = FactorModel.load(path)
+    for name in ("item_ids", "item_factors", "item_bias"):
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(model, name))
+    assert loaded.global_mean == model.global_mean and loaded.reg == model.reg
+
+
+def test_score_profile_excludes_rated_and_unknown(factors):
+    model, _ = factors
+    ids, scores = score_profile_factors(model, {100: 10, 101: 1, 99999: 5}, top_n=60)
+    assert len(ids) == 58 and not {100, 101} & set(ids.tolist())
+    assert np.all(np.diff(scores) <= 0)
+    assert len(score_profile_factors(model, {99999: 5})[0]) == 0
+
+
+@pytest.fixture
+def als_model(model_mod, train_kwargs, restore_model):
+    model_mod.train_model(**dict(train_kwargs, model_type="als"))
+    return model_mod.MODEL_STORE.reload()
+
+
+def test_train_model_als(model_mod, als_model):
+    info = model_mod.read_model_info()
+    assert info["model_type"] == "als" and info["dtype"] == "float32"
+    assert als_model.factors is not None and als_model.similar is not None
+    assert list(info["shape"]) == list(als_model.factors.item_factors.shape)
+
+    ids = als_model.factors.item_ids
+    profile = {int(ids[0]): 9, int(ids[1]): 8, int(ids[2]): 2}
+    recs = model_mod.get_recommendations(profile, top_n=10, model=als_model)
+    assert len(recs) == 10 and set(recs["source"]) == {"model"}
+    assert not set(profile) & set(recs["anime_id"].tolist())
+    assert recs["score"].is_monotonic_decreasing
+
+    batch = model_mod.get_recommendations_batch([profile], top_n=10, model=als_model)[0]
+    assert batch["anime_id"].tolist() == recs["anime_id"].tolist()
+    np.testing.assert_allclose(batch["score"], recs["score"], rtol=1e-5)
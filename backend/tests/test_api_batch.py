@@ -0,0 +1,106 @@
+"""
+Recomendaciones por lotes (POST /obtener-recomendaciones-batch): NDJSON con
+una línea por perfil, en orden, y los errores de cada perfil en su línea.
+"""
+import json
+
+import numpy as np
+import pytest
+
+from scoring_pool import ScoringBusy
+
+
+def post_batch(client, body):
+    # Sin json=: el cliente de pruebas ordenaría las claves y se perdería el orden de los perfiles
+    return client.post("/obtener-recomendaciones-batch", data=json.dumps(body), content_type="application/json")
+
+
+def ndjson(res):
+    assert res.status_code == 200 and res.mimetype == "application/x-ndjson"
+    return [json.loads(line) for line in res.get_data(as_text=True).splitlines()]
+
+
+@pytest.fixture(scope="module")
+def profiles(trained):
+    rng = np.random.default_rng(5)
+    ids = np.load(trained["ids_path"])
+    return [{str(a): int(r) for a, r in zip(rng.choice(ids, 6, replace=False), rng.integers(1, 11, 6))}
+            for _ in range(5)]
+
+
+def single(client, profile, top_n):
+    res = client.post(f"/obtener-recomendaciones?limit={top_n}", json=profile)
+    assert res.status_code == 200
+    return res.get_json()
+
+
+def assert_same_recommendations(batch, expected):
+    assert [r["anime_id"] for r in batch] == [r["anime_id"] for r in expected]
+    np.testing.assert_allclose([r["score"] for r in batch], [r["score"] for r in expected], rtol=1e-5)
+
+
+def test_lines_in_order_like_single_requests(client, profiles):
+    ids = ["z", "a", "m", "b", "k"]  # el orden es el de la petición, no el alfabético
+    lines = ndjson(post_batch(client, {"profiles": dict(zip(ids, profiles)), "top_n": 7}))
+    assert [line["profile"] for line in lines] == ids
+    for line, profile in zip(lines, profiles):
+        assert len(line["recommendations"]) == 7
+        assert_same_recommendations(line["recommendations"], single(client, profile, 7))
+
+
+def test_profiles_as_list(client, profiles):
+    lines = ndjson(post_batch(client, {"profiles": profiles[:3]}))
+    assert [line["profile"] for line in lines] == [0, 1, 2]
+    assert all(len(line["recommendations"]) == 10 for line in lines)
+
+
+def test_invalid_profiles_get_an_error_line(client, profiles):
+    body = {"profiles": {"ok1": profiles[0], "lista": [1, 2], "nombre": {"No Existe Ningun Anime": 8},
+                         "vacio": {}, "ok2": profiles[1]}, "top_n": 5}
+    lines = {line["profile"]: line for line in ndjson(post_batch(client, body))}
+    assert list(lines) == ["ok1", "lista", "nombre", "vacio", "ok2"]
+    assert "recommendations" in lines["ok1"] and "recommendations" in lines["ok2"]
+    assert_same_recommendations(lines["ok2"]["recommendations"], single(client, profiles[1], 5))
+    for pid in ("lista", "nombre", "vacio"):
+        assert "error" in lines[pid] and "recommendations" not in lines[pid]
+
+
+@pytest.mark.parametrize("body", [{}, {"profiles": {}}, {"profiles": "x"},
+                                  {"profiles": [{"1": 5}], "top_n": 0},
+                                  {"profiles": [{"1": 5}], "top_n": 101},
+                                  {"profiles": [{"1": 5}], "top_n": "diez"}])
+def test_bad_request(client, body):
+    assert post_batch(client, body).status_code == 400
+
+
+def test_chunks_give_the_same_result(client, api_module, profiles, monkeypatch):
+    body = {"profiles": profiles, "top_n": 5}
+    expected = ndjson(post_batch(client, body))
+    monkeypatch.setattr(api_module, "BATCH_CHUNK", 2)
+    assert ndjson(post_batch(client, body)) == expected
+
+
+def test_busy_scoring(client, api_module, profiles, monkeypatch):
+    run = api_module.SCORING.run
+    calls = []
+
+    def busy_after(n):
+        def fake_run(fn):
+            calls.append(fn)
+            if len(calls) > n:
+                raise ScoringBusy("lleno")
+            return run(fn)
+        return fake_run
+
+    # Sin hueco para el primer tramo: 503 con Retry-After
+    monkeypatch.setattr(api_module.SCORING, "run", busy_after(0))
+    res = post_batch(client, {"profiles": profiles})
+    assert res.status_code == 503 and res.headers["Retry-After"] == "1"
+
+    # Sin hueco para el segundo: el primer tramo sale y el resto lleva el error
+    calls.clear()
+    monkeypatch.setattr(api_module, "BATCH_CHUNK", 2)
+    monkeypatch.setattr(api_module.SCORING, "run", busy_after(1))
+    lines = ndjson(post_batch(client, {"profiles": profiles}))
+    assert ["recommendations" in line for line in lines] == [True, True, False, False, False]
+    assert all("ocupado" in line["error"] for line in lines[2:])
@@ -0,0 +1,179 @@
+"""
+Pool de conexiones y DAO (dao/conexion_bd.py, dao/dao.py) con un pool falso en
+lugar de MySQL: espera bloqueante con timeout, errores al pedir la conexión
+tratados como los de las consultas y configuración obligatoria.
+"""
+import threading
+import time
+
+import mysql.connector
+import pytest
+from mysql.connector import pooling
+
+from dao import conexion_bd
+from dao.dao import DB_ERRORS, AnimatchDAO
+
+
+def count(counter, **labels):
+    return sum(value for _, sample_labels, value in counter.samples() if sample_labels == labels)
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params=()):
+        if self.conn.pool.fail_queries:
+            raise mysql.connector.ProgrammingError("tabla inexistente")
+        self.conn.pool.executed.append((sql, params))
+
+    def executemany(self, sql, rows):
+        self.execute(sql, rows)
+
+    def fetchone(self):
+        return {"id": 1, "username": "ana", "password": "x", "role": "user"}
+
+    def fetchall(self):
+        return [(20, 8.0), (30, 6.5)]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """Como PooledMySQLConnection: close() la devuelve al pool"""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.rolled_back = False
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self.rolled_back = True
+
+    def close(self):
+        self.pool.free.append(self)
+
+
+class FakePool:
+    """Como MySQLConnectionPool: PoolError en cuanto no queda ninguna libre (no espera)"""
+    created = []
+
+    def __init__(self, pool_name, pool_size, pool_reset_session, **config):
+        self.config = config
+        self.free = [FakeConnection(self) for _ in range(pool_size)]
+        self.executed = []
+        self.fail_queries = False
+        FakePool.created.append(self)
+
+    def get_connection(self):
+        if not self.free:
+            raise pooling.PoolError("Failed getting connection; pool exhausted")
+        return self.free.pop()
+
+
+@pytest.fixture
+def fake_pool(monkeypatch):
+    monkeypatch.setattr(conexion_bd.pooling, "MySQLConnectionPool", FakePool)
+    monkeypatch.setattr(conexion_bd, "POOL_SIZE", 2)
+    monkeypatch.setitem(conexion_bd.DB_CONFIG, "user", "animatch")
+    monkeypatch.setitem(conexion_bd.DB_CONFIG, "password", "secreto")
+    FakePool.created.clear()
+    conexion_bd.reset_pool()
+    yield
+    conexion_bd.reset_pool()
+
+
+def test_config_is_required(monkeypatch):
+    monkeypatch.setitem(conexion_bd.DB_CONFIG, "user", None)
+    monkeypatch.setitem(conexion_bd.DB_CONFIG, "password", "secreto")
+    with pytest.raises(RuntimeError, match="ANIMATCH_DB_USER"):
+        conexion_bd.check_db_config()
+    conexion_bd.reset_pool()
+    with pytest.raises(RuntimeError):
+        conexion_bd.get_pool()
+
+
+def test_connections_return_to_the_pool(fake_pool):
+    with conexion_bd.Conexion() as a, conexion_bd.Conexion() as b:
+        assert a.GetConn() is not b.GetConn()
+    pool, _ = conexion_bd.get_pool()
+    assert len(pool.free) == 2 and pool.config["user"] == "animatch"
+    with conexion_bd.Conexion():
+        pass
+    assert len(FakePool.created) == 1
+
+
+def test_waits_for_a_free_connection(fake_pool):
+    held = [conexion_bd.Conexion(), conexion_bd.Conexion()]
+    # Se devuelve una a los 0.1 s: la espera se despierta entonces, sin agotar el timeout
+    threading.Timer(0.1, held[0].Close).start()
+    start = time.monotonic()
+    conn, release = conexion_bd.get_pooled_connection(timeout=5)
+    assert 0.05 < time.monotonic() - start < 2
+    conn.close()
+    release()
+    held[1].Close()
+
+
+def test_timeout_when_the_pool_is_exhausted(fake_pool):
+    timeouts = count(conexion_bd.POOL_TIMEOUTS)
+    with conexion_bd.Conexion(), conexion_bd.Conexion():
+        start = time.monotonic()
+        with pytest.raises(pooling.PoolError):
+            conexion_bd.get_pooled_connection(timeout=0.05)
+        assert time.monotonic() - start < 1
+    assert count(conexion_bd.POOL_TIMEOUTS) == timeouts + 1
+    # Los huecos no se pierden
+    with conexion_bd.Conexion(), conexion_bd.Conexion():
+        pass
+
+
+def test_close_pool_drops_it(fake_pool):
+    with conexion_bd.Conexion():
+        pass
+    conexion_bd.close_pool()
+    with conexion_bd.Conexion():
+        pass
+    assert len(FakePool.created) == 2
+
+
+def test_dao_queries(fake_pool):
+    assert AnimatchDAO.get_user_by_username("ana")["username"] == "ana"
+    assert AnimatchDAO.get_ratings(1) == {20: 8.0, 30: 6.5}
+    assert AnimatchDAO.upsert_ratings(1, {20: 9}) is True
+    assert AnimatchDAO.upsert_ratings(1, {}) is True
+    pool, _ = conexion_bd.get_pool()
+    assert pool.executed[-1][1] == [(1, 20, 9.0)]
+    assert len(pool.free) == 2
+
+
+def test_errors_getting_the_connection_are_handled(fake_pool, monkeypatch):
+    errors = count(DB_ERRORS, op="get_user_by_username")
+    with conexion_bd.Conexion(), conexion_bd.Conexion():
+        monkeypatch.setattr(conexion_bd, "POOL_TIMEOUT", 0.01)
+        assert AnimatchDAO.get_user_by_username("ana") is None
+        assert AnimatchDAO.list_users() == []
+        assert AnimatchDAO.add_user("ana", "x") is False
+    assert count(DB_ERRORS, op="get_user_by_username") == errors + 1
+
+    # MySQL caído: el error de conectar al crear el pool también
+    def unreachable(**kwargs):
+        raise mysql.connector.InterfaceError("Can't connect to MySQL server")
+    monkeypatch.setattr(conexion_bd.pooling, "MySQLConnectionPool", unreachable)
+    conexion_bd.reset_pool()
+    assert AnimatchDAO.get_ratings(1) is None
+
+
+def test_failed_write_rolls_back(fake_pool):
+    pool, _ = conexion_bd.get_pool()
+    pool.fail_queries = True
+    errors = count(DB_ERRORS, op="upsert_ratings")
+    assert AnimatchDAO.upsert_ratings(1, {20: 9}) is False
+    assert count(DB_ERRORS, op="upsert_ratings") == errors + 1
+    assert any(conn.rolled_back for conn in pool.free) and len(pool.free) == 2
@@ -0,0 +1,122 @@
+"""
+Motor de reserva (fallback.py): popularidad y géneros de anime.csv para los
+perfiles que el modelo no cubre.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import fallback
+from fallback import FallbackIndex
+
+ANIME = pd.DataFrame({
+    "anime_id": [30, 10, 20, 40, 50, 60, 10],
+    "genre": ["Action, Comedy", "Action", "Romance, Drama", "Comedy", None, "Drama", "Action"],
+    "type": ["TV", "Movie", "TV", None, "OVA", "TV", "Movie"],
+    "rating": [8.0, 7.0, 9.0, 5.0, np.nan, 6.0, 7.0],
+    "members": [5000, 100000, 20, 3000, 10, 8000, 100000],
+})
+
+
+@pytest.fixture(scope="module")
+def index():
+    return FallbackIndex.build(ANIME)
+
+
+def test_build(index):
+    np.testing.assert_array_equal(index.item_ids, [10, 20, 30, 40, 50, 60])  # ordenados y sin duplicados
+    assert list(index.genre_names) == ["Action", "Comedy", "Drama", "Romance"]
+    assert index.genres[2].toarray().tolist() == [[1, 1, 0, 0]]
+    assert index.genres[4].nnz == 0
+    assert list(index.type_names) == ["Movie", "OVA", "TV"]
+    assert index.types.tolist() == [0, 2, 2, -1, 1, 2]  # sin tipo: -1
+    np.testing.assert_array_equal(index.members, [100000, 20, 5000, 3000, 10, 8000])
+    assert index.popularity.min() == 0 and index.popularity.max() == 1
+    np.testing.assert_array_equal(np.argsort(-index.popularity, kind="stable"), index.popular)
+    # La nota de 20 (9.0) casi no cuenta: solo tiene 20 miembros
+    assert index.popularity[2] > index.popularity[1]
+
+
+def test_recommend_follows_the_liked_genres(index):
+    ids, scores = index.recommend({10: 10}, top_n=3)
+    assert ids[0] == 30  # el único otro con Action
+    assert 10 not in ids and np.all(np.diff(scores) <= 0)
+    assert np.all((scores >= 0) & (scores <= 1))
+    liked = dict(zip(ids.tolist(), scores))
+    ids, scores = index.recommend({10: 1}, top_n=5)  # no le gusta Action: 30 baja
+    disliked = dict(zip(ids.tolist(), scores))
+    assert ids[0] != 30 and disliked[30] < liked[30]
+
+
+def test_recommend_exclude_and_allowed(index):
+    ids, _ = index.recommend({10: 10}, top_n=10, exclude=[30])
+    assert not {10, 30} & set(ids.tolist()) and len(ids) == 4
+    allowed = index.filters.mask(types=["TV"])
+    ids, _ = index.recommend({10: 10}, top_n=10, allowed=allowed)
+    assert set(ids.tolist()) == {20, 30, 60}
+
+
+def test_unknown_profile_gets_the_most_popular(index):
+    ids, scores = index.recommend({999: 8}, top_n=3)
+    np.testing.assert_array_equal(ids, index.item_ids[index.popular[:3]])
+    np.testing.assert_allclose(scores, index.popularity[index.popular[:3]])
+    # Solo animes sin géneros: tampoco hay gusto que seguir
+    ids, _ = index.recommend({50: 9}, top_n=10)
+    assert 50 not in ids and len(ids) == 5
+    assert len(index.recommend({999: 8}, top_n=0)[0]) == 0
+
+
+def test_neutral_ratings_fall_back_to_popularity(index):
+    ids, _ = index.recommend({10: fallback.RATING_NEUTRAL}, top_n=5)
+    expected = [a for a in index.item_ids[index.popular] if a != 10]
+    np.testing.assert_array_equal(ids, expected)
+
+
+def test_save_load(index, tmp_path):
+    path = str(tmp_path / "fallback.npz")
+    index.save(path)
+    loaded = FallbackIndex.load(path)
+    np.testing.assert_array_equal(loaded.item_ids, index.item_ids)
+    assert (loaded.genres != index.genres).nnz == 0
+    np.testing.assert_array_equal(loaded.types, index.types)
+    for profile in ({10: 10}, {20: 9, 40: 2}, {999: 5}):
+        np.testing.assert_array_equal(loaded.recommend(profile, 4)[0], index.recommend(profile, 4)[0])
+
+
+def test_load_without_filter_data(index, tmp_path):
+    """Índices de antes de los filtros: sin tipos ni miembros, pero recomiendan igual"""
+    path = str(tmp_path / "old.npz")
+    np.savez(path, item_ids=index.item_ids, genre_names=index.genre_names, indptr=index.genres.indptr,
+             indices=index.genres.indices, popularity=index.popularity, popular=index.popular)
+    old = FallbackIndex.load(path)
+    assert old.filters is None
+    np.testing.assert_array_equal(old.recommend({10: 10}, 3)[0], index.recommend({10: 10}, 3)[0])
+
+
+def test_uncovered_profile_is_all_fallback(model_mod, loaded):
+    assert loaded.fallback is not None
+    recs = model_mod.get_recommendations({999999999: 9}, top_n=5, model=loaded)
+    assert list(recs["source"]) == ["fallback"] * 5
+    np.testing.assert_array_equal(recs["anime_id"], loaded.fallback.item_ids[loaded.fallback.popular[:5]])
+    assert recs["name"].notna().all()
+
+
+def test_covered_profile_uses_the_model(model_mod, loaded):
+    profile = {int(a): 9 for a in loaded.item_ids[:5]}
+    recs = model_mod.get_recommendations(profile, top_n=5, model=loaded)
+    assert list(recs["source"]) == ["model"] * 5
+
+
+def test_low_coverage_profile_is_blended(model_mod, loaded):
+    profile = {int(loaded.item_ids[0]): 9, 999999999: 9, 999999998: 8, 999999997: 7}  # cobertura 0.25
+    recs = model_mod.get_recommendations(profile, top_n=10, model=loaded)
+    share = 1 - 0.25 / model_mod.FALLBACK_MIN_COVERAGE
+    assert list(recs["source"]).count("fallback") == int(round(10 * share))
+    assert list(recs["source"][:4]) == ["model", "fallback", "model", "fallback"]  # repartidas, no al final
+    assert recs["anime_id"].is_unique
+
+
+def test_api_marks_the_source(client):
+    res = client.post("/obtener-recomendaciones?limit=3", json={"999999999": 8})
+    assert res.status_code == 200
+    assert [r["source"] for r in res.get_json()] == ["fallback"] * 3
@@ -0,0 +1,118 @@
+"""
+Filtros y paginación de las recomendaciones (filters.py, top_k, get_recommendations
+y /obtener-recomendaciones): máscaras precalculadas y páginas que encajan.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from fallback import FallbackIndex
+from filters import ItemFilters
+from scoring import top_k
+
+ANIME = pd.DataFrame({
+    "anime_id": [1, 2, 3, 4, 5],
+    "genre": ["Action, Horror", "Comedy", "Horror", "Action", None],
+    "type": ["TV", "Movie", "TV", "OVA", None],
+    "rating": [7.0, 8.0, 6.0, 7.5, 5.0],
+    "members": [100, 5000, 300, 2000, 10],
+})
+
+
+@pytest.fixture(scope="module")
+def filters():
+    # Índice de un modelo: 4 y 5 no están, 9 no está en el catálogo
+    return ItemFilters([1, 2, 3, 9], FallbackIndex.build(ANIME))
+
+
+def test_no_filter(filters):
+    assert filters.mask() is None
+    assert filters.mask(exclude_genres=[], types=[], min_members=0) is None
+
+
+def test_masks(filters):
+    assert filters.mask(exclude_genres=["Horror"]).tolist() == [False, True, False, True]
+    assert filters.mask(types=["TV"]).tolist() == [True, False, True, False]
+    assert filters.mask(types=["tv", " movie "]).tolist() == [True, True, True, False]
+    assert filters.mask(min_members=300).tolist() == [False, True, True, False]
+    assert filters.mask(exclude_genres=["action"], types=["TV", "Movie"], min_members=200).tolist() == \
+        [False, True, True, False]
+
+
+@pytest.mark.parametrize("where", [{"exclude_genres": ["Mecha"]}, {"types": ["Serie"]}])
+def test_unknown_values(filters, where):
+    with pytest.raises(ValueError, match="desconegut"):
+        filters.mask(**where)
+
+
+def test_top_k_pages_with_ties():
+    scores = np.array([0.5, 0.9, 0.5, 0.5, 0.1, 0.5, 0.9])
+    item_ids = np.array([70, 60, 50, 40, 30, 20, 10])
+    candidates = np.ones(7, dtype=bool)
+    full, _ = top_k(scores, candidates, item_ids, 7)
+    assert full.tolist() == [10, 60, 20, 40, 50, 70, 30]  # empates: anime_id ascendente
+    for n in range(1, 7):
+        assert top_k(scores, candidates, item_ids, n)[0].tolist() == full[:n].tolist()
+    allowed = item_ids != 20
+    assert top_k(scores, candidates, item_ids, 3, allowed)[0].tolist() == [10, 60, 40]
+
+
+@pytest.fixture(scope="module")
+def profiles(trained):
+    ids = np.load(trained["ids_path"])
+    return {
+        "covered": {int(a): r for a, r in zip(ids[:6], (9, 8, 10, 3, 7, 6))},
+        # 1 de 5 en el modelo: mitad y algo del modelo de reserva, repartida por la lista
+        "low_coverage": {int(ids[3]): 9, 999999991: 8, 999999992: 7, 999999993: 9, 999999994: 6},
+        "uncovered": {999999999: 8},
+    }
+
+
+@pytest.mark.parametrize("name", ["covered", "low_coverage", "uncovered"])
+@pytest.mark.parametrize("page", [3, 7])
+def test_pages_concatenate_to_the_full_list(model_mod, loaded, profiles, name, page):
+    profile = profiles[name]
+    full = model_mod.get_recommendations(profile, top_n=30, model=loaded)
+    pages = pd.concat([model_mod.get_recommendations(profile, top_n=page, offset=offset, model=loaded)
+                       for offset in range(0, 30, page)], ignore_index=True).head(30)
+    assert pages["anime_id"].tolist() == full["anime_id"].tolist()
+    assert pages["source"].tolist() == full["source"].tolist()
+    np.testing.assert_allclose(pages["score"].to_numpy(float), full["score"].to_numpy(float))
+    if name == "low_coverage":
+        assert {"model", "fallback"} == set(full["source"])
+
+
+def test_filters_apply_before_top_k(model_mod, loaded, profiles):
+    profile = profiles["covered"]
+    recs = model_mod.get_recommendations(profile, top_n=15, model=loaded, types=["TV"], exclude_genres=["Horror"])
+    assert len(recs) == 15
+    fb = loaded.fallback
+    rows = np.searchsorted(fb.item_ids, recs["anime_id"].to_numpy())
+    assert set(fb.type_names[fb.types[rows]]) == {"TV"}
+    horror = list(fb.genre_names).index("Horror")
+    assert fb.genres[rows][:, horror].nnz == 0
+    few = model_mod.get_recommendations(profile, top_n=5, model=loaded, min_members=10**9)
+    assert few.empty
+
+
+def test_negative_offset(model_mod, loaded, profiles):
+    with pytest.raises(ValueError):
+        model_mod.get_recommendations(profiles["covered"], offset=-1, model=loaded)
+
+
+def test_api_pages(client, profiles):
+    profile = {str(a): r for a, r in profiles["low_coverage"].items()}
+    full = client.post("/obtener-recomendaciones?limit=12", json=profile).get_json()
+    pages = [client.post(f"/obtener-recomendaciones?limit=4&offset={o}", json=profile).get_json()
+             for o in (0, 4, 8)]
+    assert [r["anime_id"] for page in pages for r in page] == [r["anime_id"] for r in full]
+    filtered = client.post("/obtener-recomendaciones?limit=5&type=tv", json=profile).get_json()
+    assert len(filtered) == 5
+
+
+@pytest.mark.parametrize("query", ["limit=0", "limit=101", "offset=-1", "offset=x", "min_members=-5",
+                                   "type=Serie", "exclude_genres=NoExiste"])
+def test_api_bad_options(client, profiles, query):
+    profile = {str(a): r for a, r in profiles["covered"].items()}
+    res = client.post(f"/obtener-recomendaciones?{query}", json=profile)
+    assert res.status_code == 400 and "error" in res.get_json()
@@ -0,0 +1,45 @@
+"""
+Generador de datos sintéticos de los benchmarks (bench/generate_data.py):
+reproducible con la misma semilla y con la forma del dataset de Kaggle.
+"""
+import filecmp
+import os
+
+import numpy as np
+import pandas as pd
+
+from generate_data import NOT_RATED, TYPES, generate
+
+
+def test_same_seed_same_files(tmp_path):
+    a, b, c = (str(tmp_path / name) for name in "abc")
+    summary = generate(a, 5000, n_items=80, n_users=120, seed=3)
+    generate(b, 5000, n_items=80, n_users=120, seed=3)
+    generate(c, 5000, n_items=80, n_users=120, seed=4)
+    for name in ("anime.csv", "rating.csv"):
+        assert filecmp.cmp(os.path.join(a, name), os.path.join(b, name), shallow=False)
+        assert not filecmp.cmp(os.path.join(a, name), os.path.join(c, name), shallow=False)
+    assert {k: summary[k] for k in ("items", "users", "seed")} == {"items": 80, "users": 120, "seed": 3}
+
+
+def test_dataset_shape(data_dir):
+    anime = pd.read_csv(os.path.join(data_dir, "anime.csv"))
+    ratings = pd.read_csv(os.path.join(data_dir, "rating.csv"))
+
+    assert list(anime.columns) == ["anime_id", "name", "genre", "type", "episodes", "rating", "members"]
+    assert list(ratings.columns) == ["user_id", "anime_id", "rating"]
+    assert len(anime) == 200 and anime["anime_id"].is_unique and anime["name"].is_unique
+    assert set(anime["type"]) <= set(TYPES)
+    assert ratings["anime_id"].isin(anime["anime_id"]).all()
+    assert ratings["user_id"].between(1, 600).all()
+
+    # Sin pares repetidos, notas de 1 a 10 o -1 (visto sin nota) en la proporción NOT_RATED
+    assert not ratings.duplicated(["user_id", "anime_id"]).any()
+    assert set(ratings["rating"]) <= set(range(1, 11)) | {-1}
+    assert abs((ratings["rating"] == -1).mean() - NOT_RATED) < 0.02
+    # Cada usuario valora como mucho la mitad del catálogo
+    assert len(ratings) <= 30_000 and ratings["user_id"].value_counts().max() <= 100
+
+    # Popularidad muy desigual (larga cola), como en el dataset real
+    per_item = np.sort(ratings["anime_id"].value_counts().to_numpy())[::-1]
+    assert per_item[:20].sum() > 3 * per_item[-20:].sum()
@@ -0,0 +1,119 @@
+"""
+Actualizaciones incrementales (update_model, model/incremental.py): el modelo
+actualizado es el mismo que recalculando todas las correlaciones, y el patch
+se consolida en una matriz nueva cuando crece demasiado.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from incremental import PatchedMatrix, load_training_ratings
+from neighbors import build_topk_index
+from retrain_jobs import LOCK_FILE
+from sparse_corr import build_rating_matrix, pearson_corr_sparse
+
+MIN_PERIODS = 5
+
+
+def random_delta(rng, user_ids, item_ids, size=150):
+    """Valoraciones de usuarios existentes (notas nuevas y cambiadas) y de usuarios nuevos"""
+    return pd.DataFrame({"user_id": rng.choice(np.concatenate([user_ids, [10**6, 10**6 + 1]]), size),
+                         "anime_id": rng.choice(item_ids, size),
+                         "rating": rng.integers(1, 11, size)}).drop_duplicates(["user_id", "anime_id"])
+
+
+@pytest.fixture
+def stats_model(model_mod, restore_model, train_kwargs):
+    """Modelo entrenado con estadísticas propio del test (update_model las modifica)"""
+    model_mod.train_model(keep_stats=True, use_cache=False, **train_kwargs)
+    return model_mod.read_model_info()
+
+
+def test_patched_matrix():
+    rng = np.random.default_rng(0)
+    base = rng.random((12, 12)).astype("float32")
+    positions = np.array([1, 4, 5, 10])
+    block = rng.random((4, 4)).astype("float32")
+    expected = base.copy()
+    expected[np.ix_(positions, positions)] = block
+
+    m = PatchedMatrix(base, positions, block)
+    np.testing.assert_array_equal(np.asarray(m), expected)
+    np.testing.assert_array_equal(m[:, [4, 0, 10]], expected[:, [4, 0, 10]])
+    np.testing.assert_array_equal(m[[5, 2], 1:6], expected[[5, 2], 1:6])
+    np.testing.assert_array_equal(m[3:11], expected[3:11])
+    np.testing.assert_array_equal(m[4:6, 5], expected[4:6, 5])
+
+
+@pytest.mark.parametrize("max_fraction, compacted", [(1.0, False), (0.0, True)])
+def test_incremental_update_equals_full_recompute(model_mod, stats_model, monkeypatch, max_fraction, compacted):
+    monkeypatch.setattr(model_mod, "PATCH_MAX_FRACTION", max_fraction)
+    info = stats_model
+    R, user_ids, item_ids = load_training_ratings(info["stats_path"])
+    R = R.tocoo()
+    expected = pd.DataFrame({"user_id": user_ids[R.row], "anime_id": item_ids[R.col], "rating": R.data})
+
+    # Dos deltas seguidos: el segundo parte del patch (o de la matriz consolidada) del primero
+    rng = np.random.default_rng(2)
+    for _ in range(2):
+        delta = random_delta(rng, user_ids, item_ids)
+        summary = model_mod.update_model(delta)
+        assert summary["items"] > 0 and summary["version"] != info["model_version"]
+        assert summary["compacted"] is compacted
+        expected = pd.concat([expected, delta]).drop_duplicates(["user_id", "anime_id"], keep="last")
+
+    info = model_mod.read_model_info()
+    assert model_mod.read_stats_meta(info["stats_path"]) == {"version": info["model_version"], "state": "ok"}
+    # Consolidado: matriz propia de la versión, sin patch
+    version_dir = model_mod.MODEL_REGISTRY.version_dir(info["model_version"])
+    assert ("patch_path" not in info) is compacted
+    assert (os.path.dirname(info["artifact_path"]) == version_dir) is compacted
+    assert model_mod.MODEL_REGISTRY.check(info, full=True) == []
+
+    R_full, _, full_ids = build_rating_matrix(expected["user_id"], expected["anime_id"], expected["rating"])
+    full = pearson_corr_sparse(R_full, MIN_PERIODS)
+    updated = np.asarray(model_mod.load_model(info, frame=False))
+
+    np.testing.assert_array_equal(full_ids, item_ids)
+    np.testing.assert_allclose(updated, full, atol=1e-6, equal_nan=True)
+
+    neighbors = model_mod.load_neighbors(info)
+    reference = build_topk_index(full, item_ids, neighbors.k)
+    np.testing.assert_array_equal(neighbors.indptr, reference.indptr)
+    for pos in range(len(item_ids)):
+        np.testing.assert_allclose(np.sort(neighbors.neighbors(pos)[1]), np.sort(reference.neighbors(pos)[1]),
+                                   atol=1e-6)
+
+
+def test_update_requires_stats(model_mod, restore_model, train_kwargs):
+    model_mod.train_model(keep_stats=False, **train_kwargs)
+    with pytest.raises(ValueError, match="estadístiques"):
+        model_mod.update_model(pd.DataFrame({"user_id": [1], "anime_id": [1], "rating": [5]}))
+
+
+def test_ratings_delta_endpoint(client, admin, api_module, stats_model):
+    ratings = [{"user_id": 10**6, "anime_id": int(a), "rating": 9}
+               for a in load_training_ratings(stats_model["stats_path"])[2][:20]]
+    res = client.post("/ratings-delta", json={**admin, "ratings": ratings})
+    assert res.status_code == 200, res.get_json()
+    assert res.get_json()["version"] == api_module.model_api().MODEL_STORE.get().version
+    # El lock se suelta al acabar
+    assert not os.path.exists(os.path.join(api_module.RETRAIN_JOBS.jobs_dir, LOCK_FILE))
+
+    assert client.post("/ratings-delta", json={**admin, "ratings": "x"}).status_code == 400
+    assert client.post("/ratings-delta", json={"username": "admin", "password": "no",
+                                               "ratings": ratings}).status_code == 403
+
+
+def test_ratings_delta_is_exclusive(client, admin, api_module, stats_model, monkeypatch):
+    # Con el lock cogido (un reentrenamiento u otra actualización en otro worker) no se toca el modelo
+    monkeypatch.setattr(api_module.model_api(), "update_model",
+                        lambda delta: pytest.fail("update_model no debería ejecutarse"))
+    ratings = [{"user_id": 10**6, "anime_id": 1, "rating": 9}]
+    with api_module.RETRAIN_JOBS.exclusive("otra") as acquired:
+        assert acquired
+        res = client.post("/ratings-delta", json={**admin, "ratings": ratings})
+        assert res.status_code == 409
+        assert client.post("/retrain", json=admin).status_code == 409
@@ -0,0 +1,57 @@
+"""
+Lectura de rating.csv por trozos con cache binaria (model/ingest.py).
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+
+from ingest import RATING_DTYPES, load_ratings
+
+
+def write_csv(path, rows):
+    pd.DataFrame(rows, columns=["user_id", "anime_id", "rating"]).to_csv(path, index=False)
+
+
+def test_cleans_like_pandas_across_chunks(data_dir, ratings, tmp_path):
+    # Trozos pequeños: los duplicados quedan en trozos distintos
+    df = load_ratings(os.path.join(data_dir, "rating.csv"), str(tmp_path), chunksize=997)
+
+    assert df.dtypes.astype(str).to_dict() == RATING_DTYPES
+    pdt.assert_frame_equal(df, ratings.reset_index(drop=True).astype(RATING_DTYPES))
+
+
+def test_drops_unrated_and_keeps_first_duplicate(tmp_path):
+    csv = str(tmp_path / "rating.csv")
+    write_csv(csv, [(1, 10, 8), (1, 11, -1), (2, 10, 5), (1, 10, 3), (2, 12, 7)])
+    df = load_ratings(csv, str(tmp_path / "cache"), chunksize=2)
+    assert df.values.tolist() == [[1, 10, 8], [2, 10, 5], [2, 12, 7]]
+
+
+def test_cache_is_reused_until_the_csv_changes(tmp_path, monkeypatch):
+    csv, cache = str(tmp_path / "rating.csv"), str(tmp_path / "cache")
+    write_csv(csv, [(1, 10, 8), (2, 10, 5)])
+    first = load_ratings(csv, cache)
+    assert len(os.listdir(cache)) == 1
+
+    # Con la cache válida no se vuelve a parsear el CSV
+    def no_csv(*args, **kwargs):
+        raise AssertionError("no debería leer el CSV")
+    monkeypatch.setattr(pd, "read_csv", no_csv)
+    pdt.assert_frame_equal(load_ratings(csv, cache), first)
+    monkeypatch.undo()
+
+    # Si cambia el CSV se rehace la cache y se borra la anterior
+    write_csv(csv, [(1, 10, 8), (2, 10, 5), (3, 11, 9)])
+    os.utime(csv, ns=(os.stat(csv).st_atime_ns, os.stat(csv).st_mtime_ns + 10**9))
+    assert len(load_ratings(csv, cache)) == 3
+    assert len(os.listdir(cache)) == 1 and not any(name.endswith(".tmp") for name in os.listdir(cache))
+
+
+def test_empty_csv(tmp_path):
+    csv = str(tmp_path / "rating.csv")
+    write_csv(csv, [(1, 10, -1)])
+    df = load_ratings(csv, str(tmp_path / "cache"))
+    assert df.empty and list(df.columns) == list(RATING_DTYPES)
+    assert df["rating"].dtype == np.int8
@@ -0,0 +1,60 @@
+"""Formato memmap de la matriz densa (save_matrix_memmap / load_model)"""
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def mapped(array):
+    """Si el array es (una vista de) un np.memmap, sin copiar los datos"""
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = array.base
+    return False
+
+
+def test_save_and_load_memmap(tmp_path, model_mod):
+    values = np.random.default_rng(0).uniform(-1, 1, (30, 30)).astype("float32")
+    values[3, 4] = np.nan
+    ids = np.arange(100, 130)
+    header = model_mod.save_matrix_memmap(values, ids, str(tmp_path / "m.f32"), str(tmp_path / "ids.npy"),
+                                          block_rows=7)
+    assert header["shape"] == [30, 30] and header["dtype"] == "float32"
+
+    frame = model_mod.load_model(header)
+    assert isinstance(frame, pd.DataFrame)
+    assert mapped(frame.to_numpy())
+    np.testing.assert_array_equal(frame.to_numpy(), values)
+    np.testing.assert_array_equal(frame.columns.to_numpy(), ids)
+    with pytest.raises(ValueError):
+        frame.to_numpy()[0, 0] = 1.0  # mapado en solo lectura: se comparte entre procesos
+
+
+def test_move_reuses_the_memmap_file(tmp_path, model_mod):
+    part = tmp_path / "m.f32.part"
+    values = np.memmap(part, dtype="float32", mode="w+", shape=(5, 5))
+    values[:] = np.arange(25).reshape(5, 5)
+    header = model_mod.save_matrix_memmap(values, np.arange(5), str(tmp_path / "m.f32"), str(tmp_path / "ids.npy"),
+                                          move=True)
+    assert not part.exists()
+    np.testing.assert_array_equal(model_mod.load_model(header).to_numpy(), np.arange(25).reshape(5, 5))
+
+
+def test_float16_matrix(tmp_path, model_mod):
+    values = np.random.default_rng(1).uniform(-1, 1, (20, 20)).astype("float32")
+    header = model_mod.save_matrix_memmap(values, np.arange(20), str(tmp_path / "m.f16"), str(tmp_path / "ids.npy"),
+                                          dtype="float16")
+    assert (tmp_path / "m.f16").stat().st_size == 20 * 20 * 2
+    np.testing.assert_allclose(model_mod.load_model(header).to_numpy(), values, atol=1e-3)
+
+
+@pytest.mark.parametrize("artifact_format", ["float16", "pickle"])
+def test_other_formats_recommend_like_memmap(artifact_format, model_mod, loaded, restore_model, train_kwargs):
+    profile = {int(a): r for a, r in zip(loaded.item_ids[:5], (9, 8, 3, 10, 6))}
+    expected = model_mod.get_recommendations(profile, top_n=10, model=loaded, exact=True)
+
+    model_mod.train_model(artifact_format=artifact_format, keep_stats=False, **train_kwargs)
+    other = model_mod.MODEL_STORE.reload()
+    assert other.info["format"] == ("pickle" if artifact_format == "pickle" else "memmap")
+    got = model_mod.get_recommendations(profile, top_n=10, model=other, exact=True)
+    np.testing.assert_allclose(got["score"], expected["score"], atol=0.05)
@@ -0,0 +1,86 @@
+"""ModelStore: el modelo se carga una vez y se recarga solo si cambia current_model.json"""
+import os
+
+import numpy as np
+import pytest
+
+from model_store import ModelStore
+from neighbors import NeighborIndex
+
+
+class FakeLoaders:
+    """Cargadores de ModelStore que cuentan las lecturas y pueden fallar"""
+
+    def __init__(self):
+        self.version = "v1"
+        self.fail = False
+        self.reads = 0
+
+    def read_info(self):
+        self.reads += 1
+        if self.fail:
+            raise ValueError("current_model.json a medias")
+        return {"model_version": self.version}
+
+    def load_neighbors(self, info):
+        ids = np.array([1, 2, 3])
+        return NeighborIndex(ids, np.zeros(4, dtype="int64"), np.empty(0, dtype="int32"),
+                             np.empty(0, dtype="float32"), 1)
+
+    def store(self, watch_path=None):
+        return ModelStore(self.read_info, None, lambda: {1: "Uno"}, self.load_neighbors, watch_path=watch_path)
+
+
+@pytest.fixture
+def watched(tmp_path):
+    path = tmp_path / "current_model.json"
+    path.write_text("{}")
+    loaders = FakeLoaders()
+    store = loaders.store(str(path))
+    store.CHECK_INTERVAL = 0
+    return loaders, store, path
+
+
+def touch(path):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+
+def test_model_is_loaded_once():
+    loaders = FakeLoaders()
+    store = loaders.store()
+    first = store.get()
+    assert all(store.get() is first for _ in range(20))
+    assert loaders.reads == 1
+    assert first.version == "v1" and first.has_item(2) and not first.has_item(4)
+
+
+def test_reloads_when_current_model_changes(watched):
+    loaders, store, path = watched
+    assert store.get().version == "v1"
+    assert store.get().version == "v1" and loaders.reads == 1  # sin cambios no se relee
+
+    loaders.version = "v2"
+    touch(path)
+    assert store.get().version == "v2"
+
+
+def test_failed_reload_keeps_serving_the_loaded_model(watched):
+    loaders, store, path = watched
+    old = store.get()
+
+    loaders.fail = True
+    touch(path)
+    assert store.get() is old
+    assert store.get() is old and loaders.reads == 3  # se reintenta en cada intervalo
+
+    loaders.fail, loaders.version = False, "v2"
+    assert store.get().version == "v2"
+
+
+def test_first_load_failure_reaches_the_caller(watched):
+    loaders, store, _ = watched
+    loaders.fail = True
+    with pytest.raises(ValueError):
+        store.get()
+    assert not store.is_loaded()
@@ -0,0 +1,98 @@
+"""
+Métricas y logs (monitoring/): contadores, histogramas, formato de Prometheus
+y /metrics de la API.
+"""
+import json
+import logging
+import re
+
+import numpy as np
+import pytest
+
+from monitoring.logs import JsonFormatter, TextFormatter
+from monitoring.metrics import Registry
+
+
+def test_counter_and_gauge():
+    reg = Registry()
+    requests = reg.counter("t_requests_total", "Peticiones", ["code"])
+    requests.inc(code=200)
+    requests.inc(2, code=200)
+    requests.inc(code=500)
+    size = reg.gauge("t_size", "Tamaño")
+    size.set(3.5)
+
+    text = reg.render()
+    assert "# TYPE t_requests_total counter" in text
+    assert 't_requests_total{code="200"} 3' in text and 't_requests_total{code="500"} 1' in text
+    assert "t_size 3.5" in text and size.value() == 3.5
+    with pytest.raises(ValueError):
+        requests.inc(status=200)  # etiquetas equivocadas
+
+
+def test_same_name_returns_the_same_metric():
+    reg = Registry()
+    assert reg.counter("t_total", "x") is reg.counter("t_total", "x")
+    with pytest.raises(ValueError):
+        reg.histogram("t_total", "x")
+
+
+def test_histogram_buckets_are_cumulative():
+    reg = Registry()
+    hist = reg.histogram("t_seconds", "Duración", ["path"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        hist.observe(value, path="a")
+    text = reg.render()
+    assert 't_seconds_bucket{path="a",le="0.1"} 2' in text
+    assert 't_seconds_bucket{path="a",le="1.0"} 3' in text
+    assert 't_seconds_bucket{path="a",le="+Inf"} 4' in text
+    assert 't_seconds_count{path="a"} 4' in text
+    assert hist.snapshot(path="a") == {"count": 4, "sum": pytest.approx(3.65)}
+    assert hist.snapshot(path="b") is None
+
+
+def test_timer_as_context_and_decorator():
+    reg = Registry()
+    hist = reg.histogram("t_seconds", "Duración", ["op"])
+    with hist.time(op="bloque") as timer:
+        pass
+    assert timer.seconds is not None and hist.snapshot(op="bloque")["count"] == 1
+
+    @hist.time(op="funcion")
+    def work():
+        return 42
+    assert work() == 42 and work() == 42
+    assert hist.snapshot(op="funcion")["count"] == 2
+
+
+def test_collectors_and_label_escaping():
+    reg = Registry()
+    reg.add_collector(lambda: [("t_entries", "gauge", "Entradas", [({"name": 'a"b\\c'}, 7)])])
+    assert 't_entries{name="a\\"b\\\\c"} 7' in reg.render()
+
+
+def test_log_formatters():
+    record = logging.LogRecord("animatch.model", logging.INFO, "", 0, "Model carregat", (), None)
+    record.version = "v1"
+    record.seconds = 0.123456
+    assert TextFormatter().format(record).endswith("INFO animatch.model: Model carregat version=v1 seconds=0.1235")
+    data = json.loads(JsonFormatter().format(record))
+    assert data["msg"] == "Model carregat" and data["version"] == "v1" and data["level"] == "INFO"
+
+
+def test_metrics_endpoint(client, trained):
+    profile = {str(a): 8 for a in np.load(trained["ids_path"])[:3]}
+    client.post("/obtener-recomendaciones", json=profile)
+    client.get("/search-anime?q=na")
+
+    res = client.get("/metrics")
+    assert res.status_code == 200 and res.mimetype == "text/plain"
+    text = res.get_data(as_text=True)
+    for name in ("animatch_http_request_seconds", "animatch_recommend_seconds", "animatch_train_stage_seconds",
+                 "animatch_name_index_names"):
+        assert f"# TYPE {name} " in text
+    assert re.search(r'animatch_http_request_seconds_count\{endpoint="obtener_recomendaciones"[^}]*\} \d+', text)
+    # Cada línea de muestra es "nombre{etiquetas} valor"
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            assert re.fullmatch(r'[a-zA-Z_:][\w:]*(\{.*\})? (-?[\d.e+-]+|NaN|[+-]Inf)', line), line
@@ -0,0 +1,148 @@
+"""
+Índice de nombres de anime (api/name_index.py): exacto, contiene, erratas y autocompletar.
+"""
+import os
+import random
+
+import pandas as pd
+import pytest
+
+from name_index import MAX_RESULTS, NameIndex
+
+NAMES = ["Naruto", "Naruto Shippuden", "Boruto: Naruto Next Generations", "Shingeki no Kyojin",
+         "Shingeki no Kyojin Season 2", "Fullmetal Alchemist", "Fullmetal Alchemist: Brotherhood",
+         "Steins;Gate", "One Piece", "Death Note"]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return NameIndex([{"id": i + 1, "name": name} for i, name in enumerate(NAMES)])
+
+
+def ids(candidates):
+    return [c["id"] for c in candidates]
+
+
+def test_exact_ignores_case_and_spaces(index):
+    assert index.resolve("  naruto ") == (1, [])
+    assert index.resolve("DEATH NOTE") == (10, [])
+
+
+def test_single_match_by_substring(index):
+    assert index.resolve("brotherhood") == (7, [])
+    assert index.resolve("gate") == (8, [])
+
+
+def test_several_matches_shortest_first(index):
+    aid, cands = index.resolve("shingeki")
+    assert aid is None and ids(cands) == [4, 5]
+    aid, cands = index.resolve("narut")
+    assert aid is None and ids(cands) == [1, 2, 3]
+
+
+def test_typos_always_ask(index):
+    # Una errata desde 6 letras, dos desde 10; nunca se elige solo
+    assert index.resolve("fullmetl") == (None, [{"id": 6, "name": "Fullmetal Alchemist"},
+                                                 {"id": 7, "name": "Fullmetal Alchemist: Brotherhood"}])
+    assert ids(index.resolve("shingkei no kyojn")[1]) == [4, 5]   # intercambio + letra que falta
+    assert ids(index.resolve("deth note")[1]) == [10]
+    assert index.resolve("nruto") == (None, [])                     # menos de 6 letras: sin erratas
+
+
+def test_no_match(index):
+    assert index.resolve("xyzxyzxyz") == (None, [])
+    assert index.resolve("") == (None, [])
+    assert NameIndex([]).resolve("naruto") == (None, [])
+
+
+def test_containing_equals_brute_force():
+    rng = random.Random(3)
+    words = ["ab", "abc", "bca", "cab", "a b", "x"]
+    names = [" ".join(rng.choice(words) for _ in range(rng.randint(1, 4))) for _ in range(300)]
+    index = NameIndex([{"id": i, "name": name} for i, name in enumerate(names)])
+    for q in ["a", "ab", "abc", "b c", "ca", "cab ab", "x a", "zz", "c ab x"]:
+        assert index.containing(q) == [i for i, name in enumerate(names) if q in name]
+
+
+def test_many_matches_are_capped():
+    index = NameIndex([{"id": i, "name": f"Gundam {i:03d}"} for i in range(50)])
+    aid, cands = index.resolve("gundam")
+    assert aid is None and ids(cands) == list(range(MAX_RESULTS))
+
+
+def test_from_csv(tmp_path):
+    path = tmp_path / "anime.csv"
+    path.write_text("anime_id,name,members\n1,Naruto,100\nx,Roto,5\n2,,7\n3,Bleach,\n", encoding="utf-8")
+    index = NameIndex.from_csv(str(path))
+    assert len(index) == 2 and index.members == [100, 0]
+    assert index.resolve("bleach") == (3, [])
+    assert len(NameIndex.from_csv(str(tmp_path / "no_existe.csv"))) == 0
+
+
+def test_profile_by_name(client, data_dir):
+    anime = pd.read_csv(os.path.join(data_dir, "anime.csv"))
+    name = anime["name"][~anime["name"].duplicated(keep=False)].iloc[0]
+    aid = int(anime.loc[anime["name"] == name, "anime_id"].iloc[0])
+
+    by_name = client.post("/obtener-recomendaciones", json={name.upper(): 9})
+    assert by_name.status_code == 200
+    assert by_name.get_json() == client.post("/obtener-recomendaciones", json={str(aid): 9}).get_json()
+
+    res = client.post("/obtener-recomendaciones", json={"Movie": 9})
+    assert res.status_code == 409
+    assert 1 < len(res.get_json()["conflicts"]["Movie"]) <= MAX_RESULTS
+    assert client.post("/obtener-recomendaciones", json={"Xyzzy Qwerty": 9}).status_code == 404
+
+
+# AUTOCOMPLETAR (search_prefix, /search-anime)
+
+@pytest.fixture(scope="module")
+def popular():
+    members = [900, 500, 300, 1000, 200, 50, 800, 700, 950, 600]
+    return NameIndex([{"id": i + 1, "name": name} for i, name in enumerate(NAMES)], members)
+
+
+def test_prefix_of_any_word_most_popular_first(popular):
+    assert ids(popular.search_prefix("naru")) == [1, 2, 3]      # "Boruto: Naruto ..." por la segunda palabra
+    assert ids(popular.search_prefix("kyo")) == [4, 5]
+    assert ids(popular.search_prefix("fullmetal alchemist:")) == [7]
+    assert popular.search_prefix("Death")[0] == {"id": 10, "name": "Death Note", "members": 600}
+    assert popular.search_prefix("ruto") == []                   # no empieza ninguna palabra
+    assert popular.search_prefix("  ") == [] and popular.search_prefix("s", limit=0) == []
+
+
+def test_short_prefixes_equal_the_sorted_search():
+    rng = random.Random(7)
+    syllables = ["ka", "ki", "na", "no", "shi", "to", "ru", "a", "b"]
+    names = [" ".join("".join(rng.choice(syllables) for _ in range(rng.randint(1, 3)))
+                      for _ in range(rng.randint(1, 3))) for _ in range(400)]
+    index = NameIndex([{"id": i, "name": name} for i, name in enumerate(names)],
+                      [rng.randint(0, 50) for _ in names])
+    for q in ["k", "n", "ka", "sh", "shi", "a", "b", "x"]:
+        fast = index.search_prefix(q)
+        # Con limit > MAX_RESULTS no se usa el resultado precalculado
+        assert fast == index.search_prefix(q, limit=MAX_RESULTS + 1)[:MAX_RESULTS]
+        expected = sorted((i for i, name in enumerate(names) if any(w.startswith(q) for w in name.split())),
+                          key=lambda i: (-index.members[i], len(names[i]), names[i]))
+        assert ids(fast) == expected[:MAX_RESULTS]
+
+
+def test_search_anime_endpoint(client, data_dir):
+    anime = pd.read_csv(os.path.join(data_dir, "anime.csv"))
+    res = client.get("/search-anime?q=movie&limit=5")
+    assert res.status_code == 200
+    found = res.get_json()
+    assert len(found) == 5
+    members = [a["members"] for a in found]
+    assert members == sorted(members, reverse=True)
+    assert members[0] == anime.loc[anime["name"].str.lower().str.split().map(
+        lambda words: any(w.startswith("movie") for w in words)), "members"].max()
+
+    # Cacheable: ETag y 304 si no ha cambiado
+    assert res.headers["ETag"] and "max-age" in res.headers["Cache-Control"]
+    again = client.get("/search-anime?q=movie&limit=5", headers={"If-None-Match": res.headers["ETag"]})
+    assert again.status_code == 304
+
+    assert len(client.get("/search-anime?q=a&limit=500").get_json()) <= 50
+    assert client.get("/search-anime?q=a&limit=muchos").status_code == 400
+    assert client.get("/search-anime").get_json() == []
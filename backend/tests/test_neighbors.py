@@ -0,0 +1,88 @@
+"""Índice compacto de top-K vecinos (neighbors.py)"""
+import numpy as np
+
+from neighbors import NeighborIndex, build_topk_index, replace_columns
+
+
+def random_corr(n=40, seed=0, nan_fraction=0.3):
+    rng = np.random.default_rng(seed)
+    values = rng.uniform(-1, 1, (n, n))
+    values = (values + values.T) / 2
+    values[rng.random((n, n)) < nan_fraction] = np.nan
+    np.fill_diagonal(values, 1.0)
+    return values.astype("float32")
+
+
+def brute_force(values, pos, k):
+    """(posiciones, pesos) de los k mayores de la columna pos, sin NaN ni el propio item"""
+    col = values[:, pos].astype("float64")
+    candidates = [p for p in range(len(col)) if p != pos and not np.isnan(col[p])]
+    best = sorted(candidates, key=lambda p: -col[p])[:k]
+    return np.array(best), col[best]
+
+
+def test_small_matrix():
+    values = np.array([[1.0, 0.5, np.nan, -0.2],
+                       [0.5, 1.0, 0.9, 0.1],
+                       [np.nan, 0.9, 1.0, np.nan],
+                       [-0.2, 0.1, np.nan, 1.0]], dtype="float32")
+    index = build_topk_index(values, np.array([10, 20, 30, 40]), 2)
+    assert index.k == 2
+    np.testing.assert_array_equal(index.neighbors(0)[0], [1, 3])
+    np.testing.assert_array_equal(index.neighbors(1)[0], [2, 0])
+    np.testing.assert_array_equal(index.neighbors(2)[0], [1])  # solo un vecino sin NaN
+    np.testing.assert_allclose(index.neighbors(3)[1], [0.1, -0.2])
+
+
+def test_lists_are_the_k_largest_of_each_column():
+    values = random_corr()
+    index = build_topk_index(values, np.arange(100, 140), 7, block_size=16)
+    for pos in range(len(values)):
+        expected_pos, expected_w = brute_force(values, pos, 7)
+        idx, w = index.neighbors(pos)
+        np.testing.assert_allclose(w, expected_w, rtol=1e-6)
+        assert set(idx) == set(expected_pos)
+
+
+def test_k_is_capped_to_the_other_items():
+    index = build_topk_index(random_corr(5, nan_fraction=0), np.arange(5), 100)
+    assert index.k == 4
+    assert all(len(index.neighbors(p)[0]) == 4 for p in range(5))
+
+
+def test_save_load_and_matrix(tmp_path):
+    values = random_corr()
+    index = build_topk_index(values, np.arange(40), 5)
+    path = str(tmp_path / "neighbors.npz")
+    index.save(path)
+    loaded = NeighborIndex.load(path)
+    assert loaded.k == 5
+    for name in ("item_ids", "indptr", "indices", "weights"):
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(index, name))
+
+    M, B = index.matrix(), index.matrix(binary=True)
+    assert M.shape == (40, 40) and M.nnz == len(index.weights)
+    np.testing.assert_array_equal(B.data, 1)
+    idx, w = index.neighbors(3)
+    np.testing.assert_allclose(M[3].toarray()[0, idx], w)
+
+
+def test_replace_columns_equals_rebuilding():
+    values = random_corr()
+    index = build_topk_index(values, np.arange(40), 6)
+    cols = np.array([0, 7, 7, 8, 39])  # extremos, repetidas y contiguas
+    changed = values.copy()
+    block = np.ix_(cols, cols)
+    changed[block] = np.random.default_rng(5).uniform(-1, 1, (len(cols), len(cols)))
+
+    updated = replace_columns(index, changed, cols, block_size=2)
+    expected = build_topk_index(changed, np.arange(40), 6)
+    np.testing.assert_array_equal(updated.indptr, expected.indptr)
+    for pos in range(40):
+        np.testing.assert_allclose(np.sort(updated.neighbors(pos)[1]), np.sort(expected.neighbors(pos)[1]))
+
+
+def test_trained_model_has_the_index(loaded, model_mod):
+    assert loaded.neighbors is not None
+    assert loaded.neighbors.k == min(model_mod.TOPK_NEIGHBORS, len(loaded.item_ids) - 1)
+    np.testing.assert_array_equal(loaded.neighbors.item_ids, np.load(loaded.info["ids_path"]))
@@ -0,0 +1,129 @@
+"""
+Entrenamiento por pasos (pipeline.py): filtros con parámetros, StageCache y
+train_model recalculando solo los pasos cuyas entradas cambian.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as sp
+
+from pipeline import StageCache, filter_items, filter_users, ratings_frame, ratings_outputs
+
+
+@pytest.fixture(scope="module")
+def small_ratings():
+    rng = np.random.default_rng(0)
+    n = 2000
+    return pd.DataFrame({"user_id": rng.integers(0, 100, n) ** 2 // 50,  # usuarios con muchas valoraciones
+                         "anime_id": rng.zipf(1.5, n) % 80,
+                         "rating": rng.integers(1, 11, n)})
+
+
+def test_filter_items(small_ratings):
+    out = filter_items(small_ratings, 20)
+    counts = small_ratings["anime_id"].value_counts()
+    assert set(out["anime_id"]) == set(counts[counts >= 20].index)
+    assert len(out) == counts[counts >= 20].sum()
+
+
+def test_filter_users(small_ratings):
+    out = filter_users(small_ratings, 5, max_quantile=0.9)
+    counts = small_ratings["user_id"].value_counts()
+    kept = counts[counts >= 5]
+    cap = int(kept.quantile(0.9))
+    assert set(out["user_id"]) == set(kept[kept <= cap].index)
+    assert out["user_id"].value_counts().max() <= cap
+    assert out["user_id"].nunique() < filter_users(small_ratings, 5, max_quantile=1.0)["user_id"].nunique()
+
+
+def test_ratings_outputs_round_trip(small_ratings):
+    back = ratings_frame(ratings_outputs(small_ratings))
+    pd.testing.assert_frame_equal(back, small_ratings.reset_index(drop=True))
+
+
+def test_key():
+    assert StageCache.key("a", x=1, y="z") == StageCache.key("a", y="z", x=1)
+    assert StageCache.key("a", x=1) != StageCache.key("a", x=2)
+    assert StageCache.key("a", x=1) != StageCache.key("b", x=1)
+
+
+def test_run_reads_the_cache(tmp_path):
+    cache = StageCache(str(tmp_path))
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"v": np.arange(5), "m": sp.csr_matrix(np.eye(3))}
+
+    assert not cache.has("paso", {"p": 1})
+    first, key = cache.run("paso", {"p": 1}, compute)
+    assert cache.has("paso", {"p": 1})
+    again, key2 = cache.run("paso", {"p": 1}, compute)
+    assert calls == [1] and key2 == key
+    np.testing.assert_array_equal(again["v"], first["v"])
+    assert (again["m"] != first["m"]).nnz == 0
+    cache.run("paso", {"p": 1}, compute, refresh=True)
+    assert calls == [1, 1]
+    cache.run("paso", {"p": 2}, compute)
+    assert calls == [1, 1, 1]
+    assert not any(name.endswith(".tmp") for name in os.listdir(tmp_path))
+
+
+def test_run_keeps_the_newest_outputs(tmp_path):
+    cache = StageCache(str(tmp_path), keep=2)
+    for p in range(4):
+        cache.run("paso", {"p": p}, lambda: {"v": np.zeros(1)})
+        os.utime(os.path.join(str(tmp_path), f"paso_{StageCache.key('paso', p=p)}"), (p, p))
+    cache.run("otro", {"p": 0}, lambda: {"v": np.zeros(1)})
+    assert not cache.has("paso", {"p": 0}) and not cache.has("paso", {"p": 1})
+    assert cache.has("paso", {"p": 2}) and cache.has("paso", {"p": 3}) and cache.has("otro", {"p": 0})
+
+
+def test_disabled_cache_writes_nothing(tmp_path):
+    cache = StageCache(str(tmp_path / "cache"), enabled=False)
+    calls = []
+    for _ in range(2):
+        cache.run("paso", {"p": 1}, lambda: calls.append(1) or {"v": np.zeros(1)})
+    assert calls == [1, 1] and not cache.has("paso", {"p": 1})
+    assert not os.path.exists(tmp_path / "cache")
+
+
+def counting(monkeypatch, module, name, calls):
+    original = getattr(module, name)
+
+    def wrapper(*args, **kwargs):
+        calls.append(name)
+        return original(*args, **kwargs)
+    monkeypatch.setattr(module, name, wrapper)
+
+
+def test_changing_min_periods_only_reruns_correlations(model_mod, train_kwargs, restore_model, monkeypatch):
+    calls = []
+    for name in ("load_ratings", "filter_items", "filter_users", "build_rating_matrix", "pearson_corr_sparse"):
+        counting(monkeypatch, model_mod, name, calls)
+    kwargs = dict(train_kwargs, min_periods=train_kwargs["min_periods"] + 1, keep_stats=False)
+
+    timings = model_mod.train_model(**kwargs)
+    assert calls == ["pearson_corr_sparse"]
+    assert set(model_mod.TRAIN_STAGES) <= set(timings)
+    info = model_mod.read_model_info()
+    params = model_mod.MODEL_REGISTRY.manifest(info["model_version"])["params"]
+    assert params["min_periods_corr"] == kwargs["min_periods"]
+    assert params["min_ratings_item"] == kwargs["min_ratings_item"]
+    cached = np.array(model_mod.load_model(info, frame=False))
+
+    calls.clear()
+    model_mod.train_model(use_cache=False, **kwargs)
+    assert calls == ["load_ratings", "filter_items", "filter_users", "build_rating_matrix", "pearson_corr_sparse"]
+    fresh = np.array(model_mod.load_model(model_mod.read_model_info(), frame=False))
+    np.testing.assert_array_equal(cached, fresh)
+
+
+def test_changing_the_user_filter_keeps_the_item_filter(model_mod, train_kwargs, restore_model, monkeypatch):
+    calls = []
+    for name in ("load_ratings", "filter_items", "filter_users"):
+        counting(monkeypatch, model_mod, name, calls)
+    model_mod.train_model(**dict(train_kwargs, keep_stats=False, max_user_quantile=0.95))
+    assert calls == ["filter_users"]
@@ -0,0 +1,128 @@
+"""
+Caché de recomendaciones por perfil (api/rec_cache.py): LRU y caducidad en
+memoria y en sqlite, aciertos y fallos, y su uso en /obtener-recomendaciones.
+"""
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import rec_cache
+from rec_cache import MemoryBackend, RecCache, SqliteBackend, cache_from_env, profile_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rec_cache, "time", SimpleNamespace(time=clock.time))
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_backend(request, tmp_path):
+    def make(max_entries=3, ttl=60):
+        if request.param == "memory":
+            return MemoryBackend(max_entries, ttl)
+        return SqliteBackend(str(tmp_path / "cache" / "rec.sqlite"), max_entries, ttl)
+    return make
+
+
+def test_get_set_clear(make_backend, clock):
+    cache = make_backend()
+    assert cache.get("a") is None
+    cache.set("a", [{"anime_id": 1, "score": 0.5}])
+    assert cache.get("a") == [{"anime_id": 1, "score": 0.5}]
+    cache.set("a", [])
+    assert cache.get("a") == [] and len(cache) == 1
+    cache.clear()
+    assert cache.get("a") is None and len(cache) == 0
+
+
+def test_least_recently_used_is_evicted(make_backend, clock):
+    cache = make_backend(max_entries=3)
+    for key in "abc":
+        cache.set(key, key)
+        clock.now += 1
+    cache.get("a")  # "b" pasa a ser la usada hace más tiempo
+    clock.now += 1
+    cache.set("d", "d")
+    assert [cache.get(key) for key in "abcd"] == ["a", None, "c", "d"]
+    assert len(cache) == 3 and cache.evictions == 1
+
+
+def test_entries_expire(make_backend, clock):
+    cache = make_backend(ttl=60)
+    cache.set("a", 1)
+    clock.now += 59
+    assert cache.get("a") == 1
+    clock.now += 2
+    assert cache.get("a") is None and cache.evictions == 1 and len(cache) == 0
+
+
+def test_sqlite_is_shared_between_processes(tmp_path, clock):
+    path = str(tmp_path / "rec.sqlite")
+    SqliteBackend(path).set("a", {"x": 1})
+    assert SqliteBackend(path).get("a") == {"x": 1}
+
+
+def test_rec_cache_counts_hits_and_misses(clock):
+    cache = RecCache(MemoryBackend())
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return ["rec"]
+
+    assert cache.get_or_compute({1: 8, 2: 5}, 10, "v1", compute) == ["rec"]
+    assert cache.get_or_compute({2: 5.0, 1: 8.0}, 10, "v1", compute) == ["rec"]
+    cache.get_or_compute({1: 8, 2: 5}, 10, "v2", compute)                          # otra versión
+    cache.get_or_compute({1: 8, 2: 5}, 10, "v1", compute, {"offset": 10})         # otra página
+    assert len(calls) == 3
+    assert cache.stats() == {"backend": "MemoryBackend", "hits": 1, "misses": 3, "evictions": 0, "size": 3}
+
+
+def test_profile_key_options():
+    profile = {1: 8}
+    assert profile_key(profile, 10, "v1", {}) == profile_key(profile, 10, "v1")
+    assert profile_key(profile, 10, "v1", {"types": ("TV",), "offset": 5}) == \
+        profile_key(profile, 10, "v1", {"offset": 5, "types": ("TV",)})
+    assert profile_key(profile, 10, "v1", {"types": ("TV",)}) != profile_key(profile, 10, "v1", {"types": ("OVA",)})
+    assert profile_key(profile, 10, "v1") != profile_key(profile, 11, "v1")
+
+
+def test_cache_from_env(tmp_path, monkeypatch):
+    monkeypatch.setenv("ANIMATCH_REC_CACHE", "off")
+    assert cache_from_env(str(tmp_path)) is None
+    monkeypatch.setenv("ANIMATCH_REC_CACHE", "sqlite")
+    monkeypatch.setenv("ANIMATCH_REC_CACHE_SIZE", "7")
+    cache = cache_from_env(str(tmp_path))
+    assert isinstance(cache.backend, SqliteBackend) and cache.backend.max_entries == 7
+    assert cache.backend.path == str(tmp_path / "rec_cache.sqlite")
+    monkeypatch.delenv("ANIMATCH_REC_CACHE")
+    assert isinstance(cache_from_env(str(tmp_path)).backend, MemoryBackend)
+
+
+def test_recommendations_endpoint_uses_the_cache(client, api_module, trained):
+    assert api_module.REC_CACHE is not None
+    api_module.reload_model()
+    profile = {str(a): 8 for a in np.load(trained["ids_path"])[:3]}
+    before = client.get("/cache-stats").get_json()
+
+    first = client.post("/obtener-recomendaciones?limit=5", json=profile).get_json()
+    assert client.post("/obtener-recomendaciones?limit=5", json=profile).get_json() == first
+    client.post("/obtener-recomendaciones?limit=5&offset=5", json=profile)
+    stats = client.get("/cache-stats").get_json()
+    assert (stats["hits"] - before["hits"], stats["misses"] - before["misses"]) == (1, 2)
+    assert stats["size"] == 2
+
+    # Con otro modelo activo lo cacheado ya no vale
+    api_module.reload_model()
+    assert client.get("/cache-stats").get_json()["size"] == 0
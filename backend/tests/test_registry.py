@@ -0,0 +1,179 @@
+"""
+Registro de versiones del modelo (registry.py) y matriz quant8 (quantized.py):
+manifest, comprobación de ficheros, activate/rollback/prune y lectura por bloques.
+"""
+import json
+import os
+
+import numpy as np
+import pytest
+
+import quantized
+import registry
+from quantized import BlockMatrix, save_matrix_quantized
+from registry import ModelRegistry
+
+
+@pytest.fixture
+def reg(tmp_path):
+    """Registro en tmp_path; current_model.json es un fichero más del directorio"""
+    current = tmp_path / "current_model.json"
+
+    def read_info():
+        with open(current) as f:
+            return json.load(f)
+
+    def write_info(info):
+        current.write_text(json.dumps(info))
+
+    return ModelRegistry(str(tmp_path / "versions"), read_info, write_info)
+
+
+def add_version(reg, version, content=b"pesos", activate=True, extra=None):
+    """Versión con un fichero de modelo (y el manifest); activate la deja como actual"""
+    reg.create(version)
+    path = os.path.join(reg.version_dir(version), "model.bin")
+    with open(path, "wb") as f:
+        f.write(content)
+    info = {"model_version": version, "artifact_path": path, "missing_path": "/no/existe", **(extra or {})}
+    manifest = reg.write_manifest(version, info, params={"min_periods_corr": 5})
+    if activate:
+        reg._write_info(info)
+    return manifest
+
+
+def test_create_never_reuses_a_version(reg):
+    reg.create("v1")
+    with pytest.raises(FileExistsError):
+        reg.create("v1")
+
+
+def test_manifest(reg):
+    m = add_version(reg, "v1", b"12345")
+    assert m["version"] == "v1" and m["model_type"] == "corr" and m["params"] == {"min_periods_corr": 5}
+    assert set(m["files"]) == {"artifact"}  # las rutas que no existen no entran
+    assert m["files"]["artifact"]["bytes"] == 5 == m["bytes"]
+    assert m["files"]["artifact"]["crc32"] == registry.file_checksum(m["info"]["artifact_path"])
+    assert reg.manifest("v1") == m
+    assert reg.manifest("v2") is None
+    reg.create("v2")  # sin manifest: entrenamiento sin acabar
+    assert [v["version"] for v in reg.versions()] == ["v1"]
+
+
+def test_manifest_reuses_checksums(reg, monkeypatch):
+    m = add_version(reg, "v1")
+    calls = []
+    monkeypatch.setattr(registry, "file_checksum", lambda path: calls.append(path) or "00000000")
+    again = reg.write_manifest("v1", m["info"], reuse=m["files"])
+    assert calls == [] and again["files"] == m["files"]
+
+
+def test_check(reg):
+    m = add_version(reg, "v1", b"abcdef")
+    path = m["info"]["artifact_path"]
+    assert reg.check(m["info"], full=True) == []
+    with open(path, "wb") as f:
+        f.write(b"abcdeX")  # mismo tamaño: solo lo detecta el checksum
+    assert reg.check(m["info"]) == []
+    assert "checksum" in reg.check(m["info"], full=True)[0]
+    with open(path, "wb") as f:
+        f.write(b"abc")
+    assert "mida" in reg.check(m["info"])[0]
+    os.remove(path)
+    assert "no existeix" in reg.check(m["info"])[0]
+    assert reg.check({"model_version": "antiga"}) == []  # versiones sin manifest
+
+
+def test_activate_and_rollback(reg):
+    for v in ("v1", "v2", "v3"):
+        add_version(reg, v)
+    assert reg.current_version() == "v3"
+    assert reg.rollback()["version"] == "v2" and reg.current_version() == "v2"
+    assert reg.rollback()["version"] == "v1"
+    with pytest.raises(ValueError, match="anterior"):
+        reg.rollback()
+    assert reg.activate("v3")["version"] == "v3"
+    assert reg.rollback("v1")["version"] == "v1"
+    with pytest.raises(ValueError, match="No existeix"):
+        reg.activate("v9")
+
+
+def test_activate_refuses_damaged_versions(reg):
+    add_version(reg, "v1")
+    m = add_version(reg, "v2")
+    reg.activate("v1")
+    with open(m["info"]["artifact_path"], "ab") as f:
+        f.write(b"!")
+    with pytest.raises(ValueError, match="malmesa"):
+        reg.activate("v2")
+    assert reg.current_version() == "v1"
+
+
+def test_prune_keeps_the_current_and_the_newest(reg):
+    for v in ("v1", "v2", "v3", "v4", "v5"):
+        add_version(reg, v, activate=False)
+    reg.activate("v2")
+    assert reg.prune(keep=2) == ["v1", "v3"]
+    assert [m["version"] for m in reg.versions()] == ["v2", "v4", "v5"]
+    assert not os.path.exists(reg.version_dir("v1"))
+    assert reg.prune(keep=2) == []
+
+
+def test_prune_keeps_versions_with_files_in_use(reg):
+    base = add_version(reg, "v1", activate=False)
+    # v2 como las de update_model: usa la matriz de v1
+    add_version(reg, "v2", extra={"matrix_path": base["info"]["artifact_path"]})
+    assert reg.prune(keep=0) == []
+    assert reg.manifest("v1") is not None
+
+
+def test_current_version_without_model(reg):
+    assert reg.current_version() is None
+
+
+def random_corr(n=70, seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.uniform(-1, 1, (n, n)).astype("float32")
+    values[rng.random((n, n)) < 0.2] = np.nan
+    return values
+
+
+@pytest.mark.parametrize("codec", ["zlib", "zstd"])
+def test_quant8_round_trip(tmp_path, codec):
+    if codec == "zstd" and quantized.zstandard is None:
+        pytest.skip("zstandard no está instalado")
+    values = random_corr()
+    header = save_matrix_quantized(values, np.arange(70), str(tmp_path / "m.q8"), str(tmp_path / "b.npy"),
+                                   str(tmp_path / "ids.npy"), block_cols=16, codec=codec)
+    assert header["format"] == "quant8" and header["codec"] == codec and header["shape"] == [70, 70]
+    m = BlockMatrix.from_info(header)
+    assert m.shape == (70, 70) and len(m) == 70
+    full = np.asarray(m)
+    np.testing.assert_array_equal(np.isnan(full), np.isnan(values))
+    np.testing.assert_allclose(full, values, atol=0.5 / 127, equal_nan=True)
+    np.testing.assert_array_equal(m[:, [3, 40, 69]], full[:, [3, 40, 69]])
+    np.testing.assert_array_equal(m[:, 17], full[:, 17])
+    np.testing.assert_array_equal(m[5, [0, 33]], full[5, [0, 33]])
+    np.testing.assert_array_equal(np.load(tmp_path / "ids.npy"), np.arange(70))
+
+
+def test_quant8_cache_is_bounded(tmp_path):
+    header = save_matrix_quantized(random_corr(), np.arange(70), str(tmp_path / "m.q8"),
+                                   str(tmp_path / "b.npy"), str(tmp_path / "ids.npy"), block_cols=8, codec="zlib")
+    m = BlockMatrix(header["artifact_path"], header["blocks_path"], header["shape"], "zlib", 8, cache_blocks=2)
+    np.asarray(m)
+    assert len(m._cache) == 2
+
+
+@pytest.mark.parametrize("artifact_format", ["float16", "quant8"])
+def test_compressed_formats_match_memmap(model_mod, train_kwargs, loaded, restore_model, artifact_format):
+    expected = np.asarray(loaded.values, dtype="float32")
+    timings = model_mod.train_model(artifact_format=artifact_format, topk=0, **train_kwargs)
+    assert timings
+    info = model_mod.read_model_info()
+    manifest = model_mod.MODEL_REGISTRY.manifest(info["model_version"])
+    assert manifest["params"]["artifact_format"] == artifact_format
+    assert model_mod.MODEL_REGISTRY.check(info, full=True) == []
+    assert os.path.getsize(info["artifact_path"]) < os.path.getsize(restore_model["artifact_path"])
+    values = np.asarray(model_mod.load_model(info, frame=False), dtype="float32")
+    np.testing.assert_allclose(values, expected, atol=1e-2, equal_nan=True)
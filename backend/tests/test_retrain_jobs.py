@@ -0,0 +1,124 @@
+"""
+Reentrenamientos en segundo plano (api/retrain_jobs.py): un solo trabajo a la
+vez entre procesos (jobs/running.lock) y estado consultable desde cualquiera.
+"""
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import retrain_jobs
+from retrain_jobs import LOCK_FILE, UNKNOWN_OWNER_MAX_AGE, RetrainJobs
+
+
+def dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def wait_finished(jobs, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = jobs.get(job_id)
+        if job["status"] != "running":
+            return job
+        time.sleep(0.01)
+    raise AssertionError("el trabajo no ha terminado")
+
+
+def write_lock(jobs_dir, **owner):
+    os.makedirs(jobs_dir, exist_ok=True)
+    with open(os.path.join(jobs_dir, LOCK_FILE), "w") as f:
+        json.dump(owner, f)
+
+
+@pytest.fixture
+def jobs_dir(tmp_path):
+    return str(tmp_path / "jobs")
+
+
+def test_job_runs_and_releases_the_lock(jobs_dir):
+    stages = []
+
+    def train(progress):
+        progress("correlations", 0.5)
+        stages.append(jobs.get(job["job_id"])["stage"])
+        return {"total": 1.0}
+
+    jobs = RetrainJobs(jobs_dir, train, lambda: SimpleNamespace(version="v2"))
+    job = jobs.start("ana")
+    assert job["status"] == "running" and job["requested_by"] == "ana"
+
+    done = wait_finished(jobs, job["job_id"])
+    assert stages == ["correlations"]
+    assert done["status"] == "done" and done["progress"] == 1.0
+    assert done["model_version"] == "v2" and done["timings"] == {"total": 1.0}
+    assert not os.path.exists(os.path.join(jobs_dir, LOCK_FILE))
+    assert jobs.running_job() is None
+
+
+def test_only_one_job_at_a_time(jobs_dir):
+    release = threading.Event()
+    jobs = RetrainJobs(jobs_dir, lambda progress: release.wait(5), lambda: None)
+    first = jobs.start()
+    try:
+        assert jobs.start() is None
+        assert jobs.running_job()["job_id"] == first["job_id"]
+    finally:
+        release.set()
+    wait_finished(jobs, first["job_id"])
+    assert jobs.start() is not None
+
+
+def test_failed_job_reports_the_error(jobs_dir):
+    def train(progress):
+        raise RuntimeError("sin datos")
+
+    jobs = RetrainJobs(jobs_dir, train, lambda: None)
+    done = wait_finished(jobs, jobs.start()["job_id"])
+    assert done["status"] == "error" and done["error"] == "sin datos"
+    assert not os.path.exists(os.path.join(jobs_dir, LOCK_FILE))
+
+
+def test_lock_of_a_dead_process_is_broken(jobs_dir):
+    pid = dead_pid()
+    write_lock(jobs_dir, job_id="huerfano", pid=pid, created_at=time.time())
+    with open(os.path.join(jobs_dir, "huerfano.json"), "w") as f:
+        json.dump({"job_id": "huerfano", "status": "running", "pid": pid, "started_at": time.time()}, f)
+
+    jobs = RetrainJobs(jobs_dir, lambda progress: None, lambda: None)
+    assert jobs.get("huerfano")["status"] == "interrupted"
+    job = jobs.start()
+    assert job is not None
+    wait_finished(jobs, job["job_id"])
+
+
+def test_lock_of_a_live_process_is_kept(jobs_dir):
+    write_lock(jobs_dir, job_id="otro", pid=os.getppid(), created_at=time.time())
+    assert RetrainJobs(jobs_dir, lambda progress: None, lambda: None).start() is None
+
+
+def test_unknown_owner_is_alive_until_the_lock_is_old(jobs_dir, monkeypatch):
+    # Como en Windows sin acceso a la API del kernel: no se sabe si el pid vive
+    monkeypatch.setattr(retrain_jobs, "_pid_alive", lambda pid: None)
+    jobs = RetrainJobs(jobs_dir, lambda progress: None, lambda: None)
+
+    write_lock(jobs_dir, job_id="otro", pid=dead_pid(), created_at=time.time())
+    assert jobs.start() is None
+
+    write_lock(jobs_dir, job_id="otro", pid=dead_pid(), created_at=time.time() - UNKNOWN_OWNER_MAX_AGE - 1)
+    job = jobs.start()
+    assert job is not None
+    wait_finished(jobs, job["job_id"])
+
+
+def test_pid_alive():
+    assert retrain_jobs._pid_alive(os.getpid()) is True
+    assert retrain_jobs._pid_alive(dead_pid()) is False
+    assert retrain_jobs._pid_alive(None) is False
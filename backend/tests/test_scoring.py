@@ -0,0 +1,82 @@
+"""Motor de puntuación vectorizado (scoring.py) frente al bucle original con pandas"""
+import numpy as np
+import pandas as pd
+
+from neighbors import build_topk_index
+from scoring import score_batch, score_profile, score_profile_topk, top_k
+
+
+def old_recommendations(corrMatrix, myRatings, top_n):
+    """El get_recommendations original (bucle por anime del perfil con pandas)"""
+    simCandidates = pd.Series(dtype="float64")
+    for anime_id, rating in myRatings.items():
+        if anime_id not in corrMatrix.columns:
+            continue
+        sims = corrMatrix[anime_id].dropna()
+        sims = sims.map(lambda x: x * rating)
+        simCandidates = pd.concat([simCandidates, sims])
+    simCandidates = simCandidates.groupby(simCandidates.index).sum()
+    simCandidates = simCandidates.drop(myRatings.keys(), errors="ignore")
+    return simCandidates.sort_values(ascending=False).head(top_n)
+
+
+def random_profiles(item_ids, sizes, seed=1):
+    rng = np.random.default_rng(seed)
+    return [{int(a): int(r) for a, r in zip(rng.choice(item_ids, size, replace=False), rng.integers(1, 11, size))}
+            for size in sizes]
+
+
+def test_exact_scoring_equals_old_loop(pandas_corr):
+    values, item_ids = pandas_corr.to_numpy(), pandas_corr.columns.to_numpy()
+    for myRatings in random_profiles(item_ids, (1, 3, 10, 30)):
+        myRatings[999_999] = 8  # anime que no está en el modelo: se ignora
+        expected = old_recommendations(pandas_corr, myRatings, 20)
+        ids, scores = score_profile(values, item_ids, myRatings, 20)
+
+        np.testing.assert_allclose(scores, expected.to_numpy(), rtol=1e-9)
+        np.testing.assert_array_equal(ids, expected.index.to_numpy())
+
+
+def test_topk_with_every_neighbor_equals_exact(pandas_corr):
+    values, item_ids = pandas_corr.to_numpy(), pandas_corr.columns.to_numpy()
+    index = build_topk_index(values, item_ids, len(item_ids))
+    for myRatings in random_profiles(item_ids, (1, 5, 20), seed=2):
+        ids, scores = score_profile(values, item_ids, myRatings, 15)
+        topk_ids, topk_scores = score_profile_topk(index, myRatings, 15)
+
+        np.testing.assert_array_equal(topk_ids, ids)
+        np.testing.assert_allclose(topk_scores, scores, rtol=1e-6)
+
+
+def test_profile_outside_the_model_has_no_candidates(pandas_corr):
+    ids, scores = score_profile(pandas_corr.to_numpy(), pandas_corr.columns.to_numpy(), {999_999: 7}, 10)
+    assert ids.size == 0 and scores.size == 0
+
+
+def test_top_k_breaks_ties_by_id_and_applies_allowed():
+    item_ids = np.array([10, 20, 30, 40, 50])
+    scores = np.array([1.0, 3.0, 3.0, 2.0, 5.0])
+    candidates = np.array([True, True, True, True, False])
+
+    ids, top = top_k(scores, candidates, item_ids, 3)
+    np.testing.assert_array_equal(ids, [20, 30, 40])
+    np.testing.assert_array_equal(top, [3.0, 3.0, 2.0])
+
+    allowed = np.array([True, False, True, True, True])
+    ids, _ = top_k(scores, candidates, item_ids, 3, allowed)
+    np.testing.assert_array_equal(ids, [30, 40, 10])
+    assert top_k(scores, candidates, item_ids, 0)[0].size == 0
+
+
+def test_score_batch_equals_one_profile_at_a_time(loaded):
+    profiles = random_profiles(loaded.item_ids, (1, 4, 12, 30), seed=3) + [{999_999: 5}]
+    for exact in (False, True):
+        batch = list(score_batch(loaded, profiles, 10, exact=exact, chunk_size=2))
+        assert len(batch) == len(profiles)
+        for myRatings, (ids, scores) in zip(profiles, batch):
+            if exact:
+                expected = score_profile(loaded.values, loaded.item_ids, myRatings, 10)
+            else:
+                expected = score_profile_topk(loaded.neighbors, myRatings, 10)
+            np.testing.assert_array_equal(ids, expected[0])
+            np.testing.assert_allclose(scores, expected[1], rtol=1e-5)
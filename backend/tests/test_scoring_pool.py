@@ -0,0 +1,86 @@
+"""
+Pool de hilos para puntuar (api/scoring_pool.py): el timeout solo cuenta la
+espera por un hilo libre, y el tamaño se reparte entre los workers.
+"""
+import threading
+import time
+
+import pytest
+
+import scoring_pool
+from scoring_pool import ScoringBusy, ScoringPool, pool_from_env
+
+
+@pytest.fixture
+def pool():
+    pool = ScoringPool(max_workers=1, timeout=0.1)
+    yield pool
+    pool.shutdown()
+
+
+def test_runs_in_the_pool(pool):
+    assert pool.run(lambda x, y=0: (x + y, threading.current_thread().name), 1, y=2)[0] == 3
+    assert pool.run(threading.current_thread).name.startswith("scoring")
+    with pytest.raises(ZeroDivisionError):
+        pool.run(lambda: 1 / 0)
+    assert pool.run(lambda: "sigue") == "sigue"  # el error no se queda el hilo
+
+
+def test_compute_time_does_not_count(pool):
+    # Tarda más que el timeout, pero había un hilo libre: no es ScoringBusy
+    assert pool.run(lambda: time.sleep(0.3) or "hecho") == "hecho"
+
+
+def test_busy_when_no_thread_frees_in_time(pool):
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return "lento"
+
+    result = []
+    worker = threading.Thread(target=lambda: result.append(pool.run(slow)))
+    worker.start()
+    started.wait(5)
+    t0 = time.monotonic()
+    with pytest.raises(ScoringBusy):
+        pool.run(lambda: "rápido")
+    assert time.monotonic() - t0 < 1
+
+    release.set()
+    worker.join(5)
+    assert result == ["lento"]
+    assert pool.run(lambda: "rápido") == "rápido"
+
+
+def test_waiting_request_runs_when_a_thread_frees(pool):
+    pool.timeout = 2
+    release = threading.Event()
+    worker = threading.Thread(target=pool.run, args=(lambda: release.wait(5),))
+    worker.start()
+    threading.Timer(0.1, release.set).start()
+    assert pool.run(lambda: "después") == "después"
+    worker.join(5)
+
+
+def test_reset_after_fork(pool):
+    pool.run(lambda: None)
+    pool.reset()
+    assert pool.run(lambda: "nuevo") == "nuevo"
+
+
+@pytest.mark.parametrize("env, expected", [
+    ({}, 8),
+    ({"ANIMATCH_WORKERS": "3"}, 2),
+    ({"ANIMATCH_WORKERS": "16"}, 1),
+    ({"ANIMATCH_WORKERS": "3", "ANIMATCH_SCORING_THREADS": "5"}, 5),
+])
+def test_pool_size_per_worker(monkeypatch, env, expected):
+    monkeypatch.setattr(scoring_pool.os, "cpu_count", lambda: 8)
+    for name in ("ANIMATCH_WORKERS", "ANIMATCH_SCORING_THREADS", "ANIMATCH_SCORING_TIMEOUT"):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    pool = pool_from_env()
+    assert pool.max_workers == expected and pool.timeout == 10.0
@@ -0,0 +1,134 @@
+"""
+Animes similares (similarity.py, similar_items y GET /similar): la búsqueda
+IVF frente a la exacta, y el índice del modelo entrenado.
+"""
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+import similarity
+from similarity import SimilarityIndex, item_vectors, normalize_rows
+
+
+def clustered(n=3000, dim=16, n_clusters=60, seed=0):
+    """Vectores normalizados agrupados alrededor de n_clusters centros"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim))
+    return normalize_rows(centers[rng.integers(0, n_clusters, n)] + 0.3 * rng.standard_normal((n, dim)))
+
+
+def brute_force(vectors, pos, k):
+    sims = vectors @ vectors[pos]
+    sims[pos] = -np.inf
+    return np.argsort(-sims, kind="stable")[:k]
+
+
+@pytest.fixture(scope="module")
+def index():
+    vectors = clustered()
+    return SimilarityIndex.build(np.arange(1000, 1000 + len(vectors)), vectors), vectors
+
+
+@pytest.fixture
+def ivf(monkeypatch):
+    # Con catálogos pequeños se recorre todo; para probar las listas se desactiva
+    monkeypatch.setattr(similarity, "EXACT_MAX_ITEMS", 0)
+
+
+def test_normalize_rows():
+    out = normalize_rows([[3.0, 4.0], [0.0, 0.0]])
+    assert out.dtype == np.float32
+    np.testing.assert_allclose(out, [[0.6, 0.8], [0.0, 0.0]])
+
+
+def test_exact_query_is_the_brute_force(index):
+    idx, vectors = index
+    for pos in (0, 17, 2999):
+        found, sims = idx.query(pos, 10, exact=True)
+        assert pos not in found
+        np.testing.assert_array_equal(found, brute_force(vectors, pos, 10))
+        np.testing.assert_allclose(sims, vectors[found] @ vectors[pos], rtol=1e-5)
+        assert np.all(np.diff(sims) <= 0)
+
+
+def test_ivf_recall_against_exact(index, ivf):
+    idx, vectors = index
+    hits = 0
+    positions = np.random.default_rng(1).choice(len(vectors), 100, replace=False)
+    for pos in positions:
+        found, _ = idx.query(pos, 10)
+        assert pos not in found and len(found) == 10
+        hits += len(set(found.tolist()) & set(idx.query(pos, 10, exact=True)[0].tolist()))
+    assert hits / (10 * len(positions)) >= 0.9
+
+
+def test_probing_every_list_is_exact(index, ivf):
+    idx, _ = index
+    for pos in (3, 400):
+        np.testing.assert_array_equal(idx.query(pos, 10, n_probe=len(idx.centroids))[0],
+                                      idx.query(pos, 10, exact=True)[0])
+
+
+def test_k_is_capped_to_the_other_items():
+    idx = SimilarityIndex.build(np.array([1, 2, 3]), clustered(3, n_clusters=2))
+    found, sims = idx.query(0, 10)
+    assert sorted(found.tolist()) == [1, 2] and len(sims) == 2
+    single = SimilarityIndex.build(np.array([7]), clustered(1, n_clusters=1))
+    assert len(single.query(0, 5)[0]) == 0
+
+
+def test_position_vectors_and_save_load(index, tmp_path):
+    idx, vectors = index
+    assert idx.position(1000) == 0 and idx.position(1000 + 2999) == 2999
+    assert idx.position(999) is None and idx.position(10**6) is None
+    np.testing.assert_array_equal(idx.vectors, vectors)
+    path = str(tmp_path / "similar.npz")
+    idx.save(path)
+    loaded = SimilarityIndex.load(path)
+    np.testing.assert_array_equal(loaded.item_ids, idx.item_ids)
+    np.testing.assert_array_equal(loaded.vectors, vectors)
+    np.testing.assert_array_equal(loaded.query(5, 10)[0], idx.query(5, 10)[0])
+
+
+def test_item_vectors_follow_the_centered_ratings():
+    rng = np.random.default_rng(0)
+    R = rng.integers(1, 11, (50, 6)).astype("float64")
+    R[:, 1] = R[:, 0] + 2     # misma forma que la columna 0 con otra media
+    R[:, 2] = 12 - R[:, 0]    # la contraria
+    vectors = item_vectors(sp.csr_matrix(R), dim=5)
+    assert vectors.shape == (6, 5) and vectors.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1, rtol=1e-5)
+    assert vectors[0] @ vectors[1] == pytest.approx(1, abs=1e-4)
+    assert vectors[0] @ vectors[2] == pytest.approx(-1, abs=1e-4)
+
+
+def test_similar_items_of_the_trained_model(model_mod, loaded):
+    anime_id = int(loaded.similar.item_ids[0])
+    items = model_mod.similar_items(anime_id, k=5, model=loaded)
+    assert list(items.columns) == ["anime_id", "name", "similarity"]
+    assert len(items) == 5 and anime_id not in items["anime_id"].tolist()
+    assert items["similarity"].is_monotonic_decreasing
+    exact = model_mod.similar_items(anime_id, k=5, model=loaded, exact=True)
+    assert items["anime_id"].tolist() == exact["anime_id"].tolist()  # catálogo pequeño: búsqueda exacta
+    with pytest.raises(KeyError):
+        model_mod.similar_items(-1, model=loaded)
+
+
+def test_similar_endpoint(client, loaded):
+    anime_id = int(loaded.similar.item_ids[3])
+    res = client.get(f"/similar/{anime_id}?k=4")
+    assert res.status_code == 200
+    body = res.get_json()
+    assert body["anime_id"] == anime_id and body["name"] == loaded.names.get(anime_id)
+    assert len(body["similar"]) == 4
+    assert set(body["similar"][0]) == {"anime_id", "name", "similarity"}
+    assert len(client.get(f"/similar/{anime_id}?k=500").get_json()["similar"]) == min(100, len(loaded.similar) - 1)
+
+
+@pytest.mark.parametrize("query", ["k=0", "k=-3", "k=abc"])
+def test_similar_endpoint_bad_k(client, loaded, query):
+    assert client.get(f"/similar/{int(loaded.similar.item_ids[0])}?{query}").status_code == 400
+
+
+def test_similar_endpoint_unknown_anime(client, loaded):
+    assert client.get("/similar/999999999").status_code == 404
@@ -0,0 +1,92 @@
+"""
+Correlaciones con matrices dispersas (model/sparse_corr.py) frente al cálculo
+de referencia con pivot_table + DataFrame.corr, y el cálculo en paralelo
+(pearson_corr_parallel) frente al secuencial.
+"""
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+from sparse_corr import (STAT_NAMES, build_rating_matrix, corr_from_stats, open_stats_files,
+                         pearson_corr_parallel, pearson_corr_sparse)
+
+MIN_PERIODS = 5
+
+
+@pytest.fixture(scope="module")
+def rating_matrix(ratings):
+    return build_rating_matrix(ratings["user_id"], ratings["anime_id"], ratings["rating"])
+
+
+def test_build_rating_matrix(ratings, rating_matrix):
+    R, user_ids, item_ids = rating_matrix
+    assert R.shape == (len(user_ids), len(item_ids)) and R.nnz == len(ratings)
+    np.testing.assert_array_equal(user_ids, np.sort(ratings["user_id"].unique()))
+    np.testing.assert_array_equal(item_ids, np.sort(ratings["anime_id"].unique()))
+
+    row = ratings.iloc[0]
+    u, i = np.searchsorted(user_ids, row["user_id"]), np.searchsorted(item_ids, row["anime_id"])
+    assert R[u, i] == row["rating"]
+
+
+def test_sparse_corr_equals_pandas(rating_matrix, pandas_corr):
+    R, _, item_ids = rating_matrix
+    corr = pearson_corr_sparse(R, MIN_PERIODS)
+
+    assert corr.dtype == np.float32
+    np.testing.assert_array_equal(item_ids, pandas_corr.columns.to_numpy())
+    np.testing.assert_allclose(corr, pandas_corr.to_numpy(), atol=1e-5, equal_nan=True)
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 64])
+def test_block_size_does_not_change_result(rating_matrix, block_size):
+    R = rating_matrix[0]
+    np.testing.assert_array_equal(pearson_corr_sparse(R, MIN_PERIODS, block_size=block_size),
+                                  pearson_corr_sparse(R, MIN_PERIODS))
+
+
+def test_min_periods():
+    # Los ítems 0 y 1 solo coinciden en 2 usuarios, 0 y 2 en 3
+    R = sp.csr_matrix(np.array([[5, 3, 1],
+                                [7, 6, 2],
+                                [9, 0, 6],
+                                [0, 8, 0]], dtype="float32"))
+    corr = pearson_corr_sparse(R, min_periods=3)
+    assert np.isnan(corr[0, 1]) and np.isnan(corr[1, 0])
+    assert corr[0, 2] == pytest.approx(np.corrcoef([5, 7, 9], [1, 2, 6])[0, 1], abs=1e-6)
+    assert corr[0, 0] == pytest.approx(1.0)
+
+
+def test_stats_files_rebuild_the_correlation(rating_matrix, tmp_path):
+    R = rating_matrix[0]
+    corr = pearson_corr_sparse(R, MIN_PERIODS, block_size=16, stats_dir=str(tmp_path))
+
+    stats = open_stats_files(str(tmp_path))
+    assert set(stats) == set(STAT_NAMES)
+    binary = (R != 0).astype("int32")
+    np.testing.assert_array_equal(stats["n"], (binary.T @ binary).toarray())
+    # Solo se guardan n, sx, sxx y sxy: sy y syy son las traspuestas (como en incremental.py)
+    full = {**stats, "sy": stats["sx"].T, "syy": stats["sxx"].T}
+    np.testing.assert_allclose(corr_from_stats(full, MIN_PERIODS), corr, atol=1e-6, equal_nan=True)
+
+
+def test_parallel_equals_serial(rating_matrix, tmp_path):
+    R = rating_matrix[0]
+    serial = pearson_corr_sparse(R, MIN_PERIODS, stats_dir=str(tmp_path / "serial"))
+    parallel, block_times = pearson_corr_parallel(R, MIN_PERIODS, str(tmp_path / "corr.bin"), workers=2,
+                                                  block_size=32, stats_dir=str(tmp_path / "parallel"))
+
+    assert len(block_times) == -(-R.shape[1] // 32)
+    assert not parallel.flags.writeable
+    np.testing.assert_array_equal(parallel, serial)
+    # El directorio temporal de operandos se borra al acabar
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["corr.bin", "parallel", "serial"]
+    for name, values in open_stats_files(str(tmp_path / "parallel")).items():
+        np.testing.assert_array_equal(values, open_stats_files(str(tmp_path / "serial"))[name])
+
+
+def test_train_with_workers_equals_serial(model_mod, restore_model, train_kwargs):
+    serial = np.asarray(model_mod.load_model(restore_model))
+    model_mod.train_model(workers=2, **train_kwargs)
+    info = model_mod.read_model_info()
+    np.testing.assert_array_equal(np.asarray(model_mod.load_model(info)), serial)
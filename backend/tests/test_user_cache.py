@@ -0,0 +1,110 @@
+"""
+Valoraciones guardadas del usuario y sus recomendaciones cacheadas
+(api/user_cache.py, /user-ratings y /user-recommendations) con una BD falsa.
+"""
+import numpy as np
+import pytest
+
+from rec_cache import profile_key
+from user_cache import UserRecCache, canonical_profile, ratings_hash
+
+
+def test_profile_fingerprints_ignore_order_and_types():
+    a, b = {20: 9, 1: 7}, {"1": 7.0, "20": 9.0}
+    assert canonical_profile(a) == canonical_profile(b) == [(1, 7.0), (20, 9.0)]
+    assert ratings_hash(a) == ratings_hash(b) != ratings_hash({1: 7, 20: 8})
+    assert profile_key(a, 10, "v1") == profile_key(b, 10, "v1") != profile_key(a, 10, "v2")
+
+
+def test_user_rec_cache():
+    cache = UserRecCache(max_users=2)
+    cache.put(1, "v1", "h1", 10, ["a"])
+    cache.put(1, "v1", "h1", 5, ["b"])
+    assert cache.get(1, "v1", "h1", 10) == ["a"] and cache.get(1, "v1", "h1", 5) == ["b"]
+    assert cache.get(1, "v2", "h1", 10) is None and cache.get(1, "v1", "h2", 10) is None
+
+    # Notas nuevas: lo de las anteriores se descarta
+    cache.put(1, "v1", "h2", 10, ["c"])
+    assert cache.get(1, "v1", "h1", 5) is None
+
+    # Como mucho max_users: sale el usado hace más tiempo
+    cache.put(2, "v1", "h", 10, ["d"])
+    cache.get(1, "v1", "h2", 10)
+    cache.put(3, "v1", "h", 10, ["e"])
+    assert len(cache) == 2 and cache.get(2, "v1", "h", 10) is None
+
+    cache.invalidate(1)
+    assert cache.get(1, "v1", "h2", 10) is None and len(cache) == 1
+    cache.clear()
+    assert len(cache) == 0
+
+
+@pytest.fixture
+def saved(client, api_module, monkeypatch):
+    """Valoraciones guardadas en un dict en lugar de en MySQL"""
+    db = {}
+    monkeypatch.setattr(api_module.AnimatchDAO, "upsert_ratings",
+                        staticmethod(lambda user_id, ratings, conn=None:
+                                     db.setdefault(user_id, {}).update(ratings) or True))
+    monkeypatch.setattr(api_module.AnimatchDAO, "get_ratings",
+                        staticmethod(lambda user_id, conn=None: dict(db.get(user_id, {}))))
+    api_module.USER_RECS.clear()
+    return db
+
+
+@pytest.fixture(scope="module")
+def anime_ids(trained):
+    return [int(a) for a in np.load(trained["ids_path"])[:6]]
+
+
+def test_saved_ratings_and_cached_recommendations(client, admin, saved, anime_ids):
+    assert client.post("/user-recommendations", json=admin).status_code == 404
+
+    res = client.post("/user-ratings", json={**admin, "ratings": {str(a): 8 for a in anime_ids[:3]}})
+    assert res.status_code == 200 and res.get_json()["saved"] == 3
+    assert saved[1] == {a: 8 for a in anime_ids[:3]}
+
+    first = client.post("/user-recommendations", json={**admin, "top_n": 5}).get_json()
+    assert first["cached"] is False and len(first["recommendations"]) == 5
+    expected = client.post("/obtener-recomendaciones?limit=5", json={str(a): 8 for a in anime_ids[:3]}).get_json()
+    assert [r["anime_id"] for r in first["recommendations"]] == [r["anime_id"] for r in expected]
+
+    again = client.post("/user-recommendations", json={**admin, "top_n": 5}).get_json()
+    assert again["cached"] is True and again["recommendations"] == first["recommendations"]
+    assert client.post("/user-recommendations", json={**admin, "top_n": 6}).get_json()["cached"] is False
+
+    # Guardar notas nuevas invalida lo calculado
+    res = client.post("/user-ratings", json={**admin, "ratings": {str(anime_ids[3]): 2}})
+    assert len(res.get_json()["ratings"]) == 4
+    assert client.post("/user-recommendations", json={**admin, "top_n": 5}).get_json()["cached"] is False
+
+
+def test_model_change_invalidates(client, admin, saved, api_module, anime_ids):
+    client.post("/user-ratings", json={**admin, "ratings": {str(a): 7 for a in anime_ids[:2]}})
+    client.post("/user-recommendations", json=admin)
+    assert len(api_module.USER_RECS) == 1
+    api_module.reload_model()
+    assert len(api_module.USER_RECS) == 0
+
+
+@pytest.mark.parametrize("body, status", [
+    ({"username": "admin", "password": "mal"}, 401),
+    ({"username": "nadie", "password": "x"}, 401),
+    ({"ratings": {}}, 400),
+    ({"ratings": {"Xyzzy Qwerty": 8}}, 404),
+])
+def test_save_ratings_errors(client, admin, saved, body, status):
+    assert client.post("/user-ratings", json={**admin, **body}).status_code == status
+    assert not saved
+
+
+def test_ratings_out_of_range(client, admin, saved, anime_ids):
+    res = client.post("/user-ratings", json={**admin, "ratings": {str(anime_ids[0]): 11}})
+    assert res.status_code == 400 and not saved
+
+
+def test_recommendations_errors(client, admin, saved, api_module, monkeypatch):
+    assert client.post("/user-recommendations", json={**admin, "top_n": 0}).status_code == 400
+    assert client.post("/user-recommendations", json={**admin, "top_n": "x"}).status_code == 400
+    monkeypatch.setattr(api_module.AnimatchDAO, "get_ratings", staticmethod(lambda user_id, conn=None: None))
+    assert client.post("/user-recommendations", json=admin).status_code == 500
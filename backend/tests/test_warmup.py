@@ -0,0 +1,79 @@
+"""
+Arranque rápido (api/api.py): importar la API no carga el modelo ni sus
+librerías, y la precarga (ANIMATCH_WARMUP) se refleja en /health/ready.
+"""
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def warmup(api_module, monkeypatch):
+    """Estado de la precarga propio del test"""
+    state = {"status": "off", "seconds": None, "model_version": None, "error": None}
+    monkeypatch.setattr(api_module, "WARMUP", state)
+    return state
+
+
+def test_import_does_not_load_heavy_libraries():
+    code = ("import sys; sys.path[:0] = ['.', 'api']; import api; "
+            "print(','.join(m for m in ('pandas', 'numpy', 'scipy', 'model.model') if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True,
+                         env={**os.environ, "ANIMATCH_WARMUP": "off"}, check=True)
+    assert out.stdout.strip() == ""
+
+
+def test_liveness(client):
+    assert client.get("/health").get_json() == {"status": "ok"}
+    assert client.get("/health/live").status_code == 200
+
+
+def test_without_warmup_is_ready(client, warmup):
+    res = client.get("/health/ready")
+    assert res.status_code == 200 and res.get_json()["ready"] is True
+
+
+def test_sync_preload(client, api_module, warmup, trained):
+    api_module.start_warmup("sync")
+    assert warmup["status"] == "done" and warmup["model_version"] == trained["model_version"]
+    assert warmup["seconds"] is not None and api_module.NAME_INDEX is not None
+    body = client.get("/health/ready").get_json()
+    assert body["ready"] is True and body["model_version"] == trained["model_version"]
+
+
+def test_background_preload(client, api_module, warmup, monkeypatch):
+    release = threading.Event()
+    load = api_module.load_name_index
+    monkeypatch.setattr(api_module, "load_name_index", lambda: release.wait(5) and load())
+
+    api_module.start_warmup("background")
+    # Mientras carga se sirve, pero no está listo
+    assert client.get("/health").status_code == 200
+    assert client.get("/health/ready").status_code == 503
+    release.set()
+    next(t for t in threading.enumerate() if t.name == "warmup").join(5)
+    assert client.get("/health/ready").status_code == 200
+
+
+def test_failed_preload_is_not_ready(client, api_module, warmup, monkeypatch):
+    def broken():
+        raise OSError("anime.csv ilegible")
+    monkeypatch.setattr(api_module, "load_name_index", broken)
+    api_module.preload()
+    res = client.get("/health/ready")
+    assert res.status_code == 503 and res.get_json()["error"] == "anime.csv ilegible"
+
+
+def test_preload_without_model(client, api_module, warmup, monkeypatch):
+    # Sin modelo entrenado la API arranca igual (se entrena después)
+    def missing():
+        raise FileNotFoundError("No s'ha trobat current_model.json")
+    monkeypatch.setattr(api_module, "get_model_cached", missing)
+    api_module.preload()
+    assert warmup["status"] == "done" and warmup["model_version"] is None
+    assert client.get("/health/ready").status_code == 200